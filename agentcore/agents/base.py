@@ -16,8 +16,11 @@
 # - CasperAgent: 女性エージェント
 # - JudgeComponent: 多数決＋LLM統合分析による判定統合
 #
+# インスタンスは agents/pool.py のプールで再利用されるため、
+# MAGIAgent / JudgeComponent は reset() で会話履歴を初期化できます。
+#
 # 使用するStrands SDK機能:
-# - BedrockModel: Amazon BedrockのLLMモデルラッパー
+# - BedrockModel: Amazon BedrockのLLMモデルラッパー（agents/models.py で共有）
 # - Agent: LLMエージェントの基本単位
 # - structured_output(): 構造化出力（同期版）
 # - stream_async(): ストリーミング出力（非同期版）
@@ -46,6 +49,12 @@
 #    - 用途: 最終判定のサマリー・論点・推奨事項を生成
 #    - LLM呼び出し回数: 1回
 #
+# 4. JudgeComponent.integrate_with_analysis_stream() / integrate_chat_stream()
+#    - 呼び出し: self.agent.stream_async(prompt, structured_output_model=...)
+#    - 処理: 3. と同じ統合分析を非同期ストリーミングで実行
+#    - 用途: backend.py の非同期ジェネレータから呼ぶ（イベントループをブロックしない）
+#    - LLM呼び出し回数: 1回
+#
 # =============================================================================
 # 全体のLLM呼び出しフロー（backend.py視点）
 # =============================================================================
@@ -55,7 +64,7 @@
 # 1. MELCHIOR-1.analyze_stream() → 【LLM呼び出し 1回目】
 # 2. BALTHASAR-2.analyze_stream() → 【LLM呼び出し 2回目】
 # 3. CASPER-3.analyze_stream() → 【LLM呼び出し 3回目】
-# 4. JudgeComponent.integrate_with_analysis() → 【LLM呼び出し 4回目】
+# 4. JudgeComponent.integrate_with_analysis_stream() → 【LLM呼び出し 4回目】
 #
 # 合計: 4回のLLM呼び出し
 #
@@ -64,13 +73,20 @@
 # =============================================================================
 
 from strands import Agent
-from strands.models.bedrock import BedrockModel
 from pydantic import BaseModel, Field
 from typing import AsyncGenerator
+from functools import cached_property
+import copy
 
 # strandsのConversationManager　会話を管理するクラス
 from strands.agent.conversation_manager import SlidingWindowConversationManager
 
+# 全ロールで共有する BedrockModel（agents/models.py）
+from agents.models import DEFAULT_MODEL_ID, cached_system_prompt, get_shared_model
+from pipeline.hedging import HEDGE_STATE_KEY, HedgeBudget
+from pipeline.metrics import CALL_METRICS_STATE_KEY, CallMetrics
+from pipeline.telemetry import span
+
 
 # =============================================================================
 # Pydanticモデル（構造化出力用）
@@ -146,11 +162,15 @@ class FinalVerdict(BaseModel):
         summary: 統合サマリー
         vote_count: 投票数 {'賛成': n, '反対': m}
         agent_verdicts: 各エージェントの判定リスト
+        degraded: 一部のエージェントの判定が欠けた状態（期限切れなど）での判定か
+        missing_agents: 判定が欠けたエージェント名のリスト
     """
     verdict: str = Field(description="承認 | 否決 | 保留")
     summary: str = Field(description="統合サマリー")
     vote_count: dict = Field(description="投票数 {'賛成': n, '反対': m}")
     agent_verdicts: list[AgentVerdict] = Field(description="各エージェントの判定")
+    degraded: bool = Field(default=False, description="一部のエージェントの判定が欠けた状態での判定か")
+    missing_agents: list[str] = Field(default_factory=list, description="判定が欠けたエージェント名")
 
 
 
@@ -172,6 +192,20 @@ class ChatResponse(BaseModel):
     response: str = Field(description="3エージェントの視点を統合した回答")
     format: str = Field(description="回答形式: explicit（視点を明示）または natural（自然な統合）")
 
+
+class DegradedChatResponse(ChatResponse):
+    """
+    一部のエージェントの回答が欠けた状態での統合回答
+
+    LLM の出力形式（ChatResponse）には含めず、backend が欠けを付け足すときだけ使います。
+
+    Attributes:
+        degraded: 一部のエージェントの回答が欠けた状態での回答か
+        missing_agents: 回答が欠けたエージェント名のリスト
+    """
+    degraded: bool = Field(default=True, description="一部のエージェントの回答が欠けた状態での回答か")
+    missing_agents: list[str] = Field(default_factory=list, description="回答が欠けたエージェント名")
+
 # =============================================================================
 # JudgeSummary（JUDGE統合分析結果）
 # =============================================================================
@@ -189,6 +223,68 @@ class JudgeSummary(BaseModel):
     key_points: list[str] = Field(description="主要な論点を3つ程度の箇条書きで")
     recommendation: str = Field(description="最終的な推奨事項（100文字程度）")
 
+# =============================================================================
+# 会話状態のリセット
+# =============================================================================
+
+def _reset_conversation(agent: Agent) -> None:
+    """
+    Strands Agent の会話履歴を初期状態に戻す
+
+    プールから再利用されるインスタンスで、前のリクエストの履歴が
+    次のリクエストに漏れないようにするために使います。
+
+    Args:
+        agent: リセット対象のStrands Agent
+    """
+    agent.messages.clear()
+
+    # SlidingWindowConversationManager は削除済みメッセージ数を保持している
+    manager = getattr(agent, "conversation_manager", None)
+    if manager is not None and hasattr(manager, "removed_message_count"):
+        manager.removed_message_count = 0
+
+
+def _restore_conversation(agent: Agent, messages: list[dict] | None) -> None:
+    """
+    Strands Agent の会話履歴を保存済みの履歴で置き換える
+
+    会話モードのセッション（pipeline/sessions.py）から履歴を戻すときに使います。
+    Strands は履歴を直接書き換えることがあるため、コピーを渡して
+    保存済みの履歴が変わらないようにします。
+
+    Args:
+        agent: 対象のStrands Agent
+        messages: 保存済みのメッセージリスト（None なら空の履歴）
+    """
+    _reset_conversation(agent)
+    if messages:
+        agent.messages.extend(copy.deepcopy(messages))
+
+
+def _latest_usage(result) -> dict:
+    """
+    Strands の AgentResult から今回の呼び出しのトークン数（Usage）を取り出す
+
+    エージェントのメトリクスはインスタンスの生存期間で累積されるため、
+    最後の呼び出し（latest_agent_invocation）の分だけを使います。
+    """
+    invocation = result.metrics.latest_agent_invocation
+    return invocation.usage if invocation is not None else result.metrics.accumulated_usage
+
+
+def _invocation_state(hedge: HedgeBudget | None, call_metrics: CallMetrics) -> dict:
+    """
+    stream_async() に渡す invocation_state を作る
+
+    ヘッジ予算は invocation_state 経由でモデル（agents/models.py の HedgedModel）に、
+    計測値は LimitedModel（実行枠の待ち時間）に届く。
+    """
+    state = {CALL_METRICS_STATE_KEY: call_metrics}
+    if hedge is not None:
+        state[HEDGE_STATE_KEY] = hedge
+    return state
+
 # =============================================================================
 # MAGIエージェント基底クラス
 # =============================================================================
@@ -205,14 +301,16 @@ class MAGIAgent:
         name: エージェント名
         persona: ペルソナ説明文
         model_id: 使用するBedrockモデルID
-        agent: Strands Agentインスタンス
+        agent: 判定モード用の Strands Agent インスタンス（最初のアクセス時に生成）
+        chat_agent: 会話モード用の Strands Agent インスタンス（最初のアクセス時に生成）
 
     Methods:
         analyze(): 同期版の分析（Step 1で実装）
         analyze_stream(): 非同期ストリーミング版の分析（Step 2で実装）
+        reset(): 会話履歴をリセット（プール返却時に使用）
     """
 
-    def __init__(self,name: str,persona: str,model_id: str = "jp.anthropic.claude-haiku-4-5-20251001-v1:0"):
+    def __init__(self,name: str,persona: str,model_id: str = DEFAULT_MODEL_ID):
         """
         エージェントを初期化
 
@@ -225,16 +323,21 @@ class MAGIAgent:
         self.persona = persona
         self.model_id = model_id
 
+        # agent（判定モード）と chat_agent（会話モード）は最初に使うときに作る
+        # 1リクエストで使うのはどちらか一方のため、使わないモードの Agent
+        # （システムプロンプト・会話マネージャー）を作らずに済む
+
+    @cached_property
+    def agent(self) -> Agent:
+        """判定モード用の Strands Agent（最初のアクセス時に生成）"""
         # ---------------------------------------------------------------------
-        # BedrockModelの作成
+        # 共有BedrockModelの取得
         # ---------------------------------------------------------------------
         # ※ここではLLMを呼び出していない（モデルの設定のみ）
         # Amazon BedrockのLLMモデルをラップするクラス
-        # region_name: AWSリージョン（東京リージョンを使用）
-        model = BedrockModel(
-            model_id=model_id,
-            region_name="ap-northeast-1"  # 東京リージョン
-        )
+        # 全ロール・agent/chat_agent で同じインスタンス（＝同じboto3クライアントと
+        # コネクションプール）を共有する。設定は agents/models.py を参照
+        model = get_shared_model(self.model_id)
 
         # ---------------------------------------------------------------------
         # 判定モード用Agentの作成
@@ -247,9 +350,9 @@ class MAGIAgent:
         #   デフォルトのコンソール出力を無効化
         #   これにより、stream_async()のイベントを自分で制御できる
         #   Windowsでの文字化け・絵文字エラーも回避できる
-        self.agent = Agent(
+        return Agent(
                 model=model,
-                system_prompt=self._build_system_prompt(),
+                system_prompt=cached_system_prompt(self._build_system_prompt()),
                 callback_handler=None,  # ストリーミング時はデフォルトコールバックを無効化
                 conversation_manager=SlidingWindowConversationManager(
                     window_size=20,  # 会話履歴のウィンドウサイズ
@@ -257,6 +360,9 @@ class MAGIAgent:
                 )
         )
 
+    @cached_property
+    def chat_agent(self) -> Agent:
+        """会話モード用の Strands Agent（最初のアクセス時に生成）"""
         # ---------------------------------------------------------------------
         # 会話モード用Agentの作成
         # ---------------------------------------------------------------------
@@ -269,9 +375,9 @@ class MAGIAgent:
         #   - 会話履歴を管理し、過去のやり取りを記憶
         #   - window_size=20: 直近20ターンの会話を保持
         #   - should_truncate_results=True: 古い履歴は切り詰め（メモリ節約）
-        self.chat_agent = Agent(
-            model=model,
-            system_prompt=self._build_chat_prompt(),
+        return Agent(
+            model=get_shared_model(self.model_id),
+            system_prompt=cached_system_prompt(self._build_chat_prompt()),
             callback_handler=None,  # ストリーミング時はデフォルトコールバックを無効化
             conversation_manager=SlidingWindowConversationManager(
                 window_size=20,  # 会話履歴のウィンドウサイズ
@@ -279,7 +385,29 @@ class MAGIAgent:
             )
         )
 
+    def reset(self) -> None:
+        """
+        判定モード・会話モード両方の会話履歴をリセット
 
+        プール（agents/pool.py）へ返却する際に呼ばれます。
+        まだ作っていない Agent はリセットのために作りません。
+        """
+        for name in ("agent", "chat_agent"):
+            if name in self.__dict__:
+                _reset_conversation(self.__dict__[name])
+
+    def export_chat_history(self) -> list[dict]:
+        """
+        会話モードの履歴を取り出す（セッションへの保存用）
+
+        プールへの返却時は履歴のリストが空にされるだけなので、
+        ここで取り出したメッセージはそのまま保持できます。
+        """
+        return list(self.chat_agent.messages)
+
+    def import_chat_history(self, messages: list[dict] | None) -> None:
+        """会話モードの履歴をセッションの履歴で置き換える"""
+        _restore_conversation(self.chat_agent, messages)
 
     def _build_system_prompt(self) -> str:
         """
@@ -364,7 +492,7 @@ class MAGIAgent:
     # Step 2: 非同期ストリーミング版分析メソッド
     # =========================================================================
 
-    async def analyze_stream(self, question: str) -> AsyncGenerator[dict, None]:
+    async def analyze_stream(self, question: str, hedge: HedgeBudget | None = None) -> AsyncGenerator[dict, None]:
         """
         問いかけを分析し、思考プロセスをリアルタイムで返す（非同期ストリーミング版）
 
@@ -380,18 +508,26 @@ class MAGIAgent:
         4. complete → {"type": "complete"}
         5. result → {"type": "verdict", "data": {...}}
 
+        全イベントに "agent": self.name を付与します。
+        3エージェントを並列実行してイベントが交互に届いても、
+        どのエージェントのイベントかを判別できるようにするためです。
+
         Args:
             question: 分析対象の問いかけ
+            hedge: ヘッジ予算（指定時のみ、最初のトークンが遅い呼び出しを重複発行。
+                pipeline/hedging.py を参照）
 
         Yields:
-            dict: イベント辞書
+            dict: イベント辞書（全イベントに "agent": self.name を付与）
                 - {"type": "init"}: 初期化
                 - {"type": "loop_start"}: ループ開始
                 - {"type": "thinking", "content": str}: 思考プロセス（リアルタイム）
                 - {"type": "reasoning", "content": str}: 推論（Interleaved Thinking時）
                 - {"type": "tool_use", "name": str}: ツール使用
                 - {"type": "complete"}: 完了
-                - {"type": "verdict", "data": dict}: 最終判定（AgentVerdict形式）
+                - {"type": "verdict", "data": AgentVerdict}: 最終判定
+                - {"type": "metrics", "data": dict}: 今回の呼び出しの計測値
+                  （待ち時間・TTFT・レイテンシ・トークン数、pipeline/metrics.py を参照）
         """
         prompt = f"以下の問いかけを分析してください: {question}"
 
@@ -425,42 +561,46 @@ class MAGIAgent:
         #   - {"type": "reasoning", "content": str}: 推論
         #   - {"type": "tool_use", "name": str}: ツール使用
         #   - {"type": "complete"}: 完了
-        #   - {"type": "verdict", "data": dict}: 判定結果
+        #   - {"type": "verdict", "data": AgentVerdict}: 判定結果
         # ---------------------------------------------------------------------
+        call_metrics = CallMetrics()
         async for event in self.agent.stream_async(
             prompt,
+            invocation_state=_invocation_state(hedge, call_metrics),
             structured_output_model=AgentVerdict
         ):
+            call_metrics.observe(event)
+
             # -----------------------------------------------------------------
             # SDKイベント → カスタムイベントに変換
             # -----------------------------------------------------------------
 
             # init_event_loop: エージェント呼び出し開始時に発火
             if event.get("init_event_loop"):
-                yield {"type": "init"}
+                yield {"type": "init", "agent": self.name}
 
             # start_event_loop: イベントループ開始時に発火
             if event.get("start_event_loop"):
-                yield {"type": "loop_start"}
+                yield {"type": "loop_start", "agent": self.name}
 
             # data: テキストチャンク（LLMからのリアルタイム出力）
             # ※ここで思考プロセスがストリーミングで届く
             if "data" in event:
-                yield {"type": "thinking", "content": event["data"]}
+                yield {"type": "thinking", "agent": self.name, "content": event["data"]}
 
             # reasoning: 推論イベント（Interleaved Thinking有効時のみ）
             if event.get("reasoning") and "reasoningText" in event:
-                yield {"type": "reasoning", "content": event["reasoningText"]}
+                yield {"type": "reasoning", "agent": self.name, "content": event["reasoningText"]}
 
             # current_tool_use: ツール使用情報
             if "current_tool_use" in event:
                 tool_info = event["current_tool_use"]
                 if tool_info.get("name"):
-                    yield {"type": "tool_use", "name": tool_info["name"]}
+                    yield {"type": "tool_use", "agent": self.name, "name": tool_info["name"]}
 
             # complete: サイクル完了時に発火
             if event.get("complete"):
-                yield {"type": "complete"}
+                yield {"type": "complete", "agent": self.name}
 
             # result: 最終結果イベント（ストリーミング終了時）
             # ※ここで構造化された判定結果を取得
@@ -468,15 +608,16 @@ class MAGIAgent:
                 result = event["result"]
                 # SDK 1.21.0以降: structured_output 属性で判定結果を取得
                 if hasattr(result, "structured_output") and result.structured_output:
-                    # model_dump(): Pydanticモデルを辞書に変換
-                    yield {"type": "verdict", "data": result.structured_output.model_dump()}
+                    # AgentVerdict をそのまま渡す（辞書への変換は invoke の出口で1回だけ）
+                    yield {"type": "verdict", "agent": self.name, "data": result.structured_output}
+                yield {"type": "metrics", "agent": self.name, "data": call_metrics.to_dict(_latest_usage(result))}
 
 
     # =========================================================================
     # 会話モード用メソッド
     # =========================================================================
 
-    async def respond_stream(self, question: str) -> AsyncGenerator[dict, None]:
+    async def respond_stream(self, question: str, hedge: HedgeBudget | None = None) -> AsyncGenerator[dict, None]:
         """
         会話モード: 判定なしで自由に回答（ストリーミング版）
 
@@ -487,11 +628,13 @@ class MAGIAgent:
 
         Args:
             question: ユーザーからの質問
+            hedge: ヘッジ予算（analyze_stream() を参照）
 
         Yields:
-            dict: イベント辞書
+            dict: イベント辞書（全イベントに "agent": self.name を付与）
                 - {"type": "thinking", "content": str}: 思考プロセス
-                - {"type": "response", "data": dict}: 回答（AgentResponse形式）
+                - {"type": "response", "data": AgentResponse}: 回答
+                - {"type": "metrics", "data": dict}: 今回の呼び出しの計測値（analyze_stream() を参照）
         """
         prompt = f"以下の質問に、あなたの視点から回答してください: {question}"
 
@@ -501,21 +644,26 @@ class MAGIAgent:
         #
         # SDKイベント → カスタムイベント変換:
         #   - event["data"] → {"type": "thinking", "content": str}
-        #   - event["result"].structured_output → {"type": "response", "data": dict}
+        #   - event["result"].structured_output → {"type": "response", "data": AgentResponse}
         #
+        call_metrics = CallMetrics()
         async for event in self.chat_agent.stream_async(
             prompt,
+            invocation_state=_invocation_state(hedge, call_metrics),
             structured_output_model=AgentResponse
         ):
+            call_metrics.observe(event)
+
             # thinking: テキストチャンク
             if "data" in event:
-                yield {"type": "thinking", "content": event["data"]}
+                yield {"type": "thinking", "agent": self.name, "content": event["data"]}
 
             # result: 最終結果
             if "result" in event:
                 result = event["result"]
                 if hasattr(result, "structured_output") and result.structured_output:
-                    yield {"type": "response", "data": result.structured_output.model_dump()}
+                    yield {"type": "response", "agent": self.name, "data": result.structured_output}
+                yield {"type": "metrics", "agent": self.name, "data": call_metrics.to_dict(_latest_usage(result))}
 
 
 
@@ -658,23 +806,35 @@ class JudgeComponent:
     - あなたの役割はその判定を踏まえた分析と推奨事項の提示です
     """
 
-    def __init__(self, model_id: str = "jp.anthropic.claude-haiku-4-5-20251001-v1:0"):
+    def __init__(self, model_id: str = DEFAULT_MODEL_ID):
         """
         JUDGEコンポーネントを初期化
 
         Args:
             model_id: 使用するBedrockモデルID
         """
-        model = BedrockModel(
-            model_id=model_id,
-            region_name="ap-northeast-1"
-        )
+        self.model_id = model_id
+
+        # 3エージェントと同じ共有BedrockModelを使用
+        model = get_shared_model(model_id)
         self.agent = Agent(
             model=model,
-            system_prompt=self.SYSTEM_PROMPT,
+            system_prompt=cached_system_prompt(self.SYSTEM_PROMPT),
             callback_handler=None
         )
 
+    def reset(self) -> None:
+        """会話履歴をリセット（プール返却時に使用）"""
+        _reset_conversation(self.agent)
+
+    def export_history(self) -> list[dict]:
+        """会話履歴を取り出す（会話モードのセッションへの保存用）"""
+        return list(self.agent.messages)
+
+    def import_history(self, messages: list[dict] | None) -> None:
+        """会話履歴をセッションの履歴で置き換える"""
+        _restore_conversation(self.agent, messages)
+
     def _count_votes(self, verdicts: list[AgentVerdict]) -> tuple[int, int, str]:
         """
         投票をカウントして最終判定を決定
@@ -682,29 +842,68 @@ class JudgeComponent:
         Returns:
             tuple: (賛成数, 反対数, 最終判定)
         """
-        approve_count = 0
-        reject_count = 0
-        for v in verdicts:
-            if "賛成" in v.verdict:
-                approve_count += 1
-            elif "反対" in v.verdict:
-                reject_count += 1
-
-        if approve_count > reject_count:
-            final = "承認"
-        elif approve_count < reject_count:
-            final = "否決"
-        else:
-            final = "保留"
+        with span("magi.judge.vote_count", **{"magi.votes": len(verdicts)}) as current:
+            approve_count = 0
+            reject_count = 0
+            for v in verdicts:
+                if "賛成" in v.verdict:
+                    approve_count += 1
+                elif "反対" in v.verdict:
+                    reject_count += 1
+
+            if approve_count > reject_count:
+                final = "承認"
+            elif approve_count < reject_count:
+                final = "否決"
+            else:
+                final = "保留"
+            current.set_attributes({"magi.approve": approve_count, "magi.reject": reject_count, "magi.final": final})
 
         return approve_count, reject_count, final
 
-    def integrate(self, verdicts: list[AgentVerdict]) -> FinalVerdict:
+    def majority_decision(self, verdicts: list[AgentVerdict], total: int = 3) -> str | None:
+        """
+        多数決が確定したかを判定（クォーラム早期決定用）
+
+        過半数（3エージェントなら2票）が同じ側に揃った時点で、
+        残りの票に関係なく結果は覆らないため確定とみなします。
+
+        Args:
+            verdicts: 現時点で揃っている判定リスト
+            total: 投票するエージェントの総数
+
+        Returns:
+            "承認" | "否決"（確定時）、未確定なら None
+        """
+        approve_count, reject_count, _ = self._count_votes(verdicts)
+        if approve_count > total // 2:
+            return "承認"
+        if reject_count > total // 2:
+            return "否決"
+        return None
+
+    def vote_count(self, verdicts: list[AgentVerdict]) -> dict[str, int]:
+        """
+        現時点の投票数（クォーラム早期決定の decision / final 用）
+
+        Args:
+            verdicts: 現時点で揃っている判定リスト
+
+        Returns:
+            dict: {"賛成": n, "反対": m}（FinalVerdict.vote_count と同じ形式）
+        """
+        approve_count, reject_count, _ = self._count_votes(verdicts)
+        return {"賛成": approve_count, "反対": reject_count}
+
+    def integrate(self, verdicts: list[AgentVerdict], missing_agents: list[str] | None = None) -> FinalVerdict:
         """
         多数決で最終判定を決定（LLMなしの軽量版）
 
+        JUDGE の統合分析が期限に間に合わなかった場合のフォールバックにも使います。
+
         Args:
             verdicts: 各エージェントの判定リスト
+            missing_agents: 判定が欠けたエージェント名（期限切れなど）
 
         Returns:
             FinalVerdict: 統合された最終判定
@@ -715,9 +914,77 @@ class JudgeComponent:
             verdict=final,
             summary="各エージェントの意見を統合しました。",
             vote_count={"賛成": approve_count, "反対": reject_count},
-            agent_verdicts=verdicts
+            agent_verdicts=verdicts,
+            degraded=bool(missing_agents),
+            missing_agents=missing_agents or []
         )
 
+    def _build_analysis_prompt(
+        self,
+        question: str,
+        verdicts: list[AgentVerdict],
+        approve_count: int,
+        reject_count: int,
+        final: str,
+        missing_agents: list[str] | None = None
+    ) -> str:
+        """
+        統合分析（判定モード）用のプロンプトを構築
+
+        integrate_with_analysis() / integrate_with_analysis_stream() で共通。
+        判定が欠けたエージェントがある場合は、その旨をプロンプトに含めます。
+
+        Returns:
+            JUDGEに送信するプロンプト文字列
+        """
+        # 各エージェントの判定を文字列にフォーマット
+        verdicts_text = ""
+        for v in verdicts:
+            verdicts_text += f"""
+【{v.agent_name}】
+- 判定: {v.verdict}
+- 理由: {v.reasoning}
+- 確信度: {v.confidence}
+"""
+        if missing_agents:
+            verdicts_text += f"""
+※ 次のエージェントは制限時間内に判定を返しませんでした（揃った判定のみで集計）: {", ".join(missing_agents)}
+"""
+
+        return f"""以下の問いかけに対する3エージェントの判定を統合分析してください。
+
+## 問いかけ
+{question}
+
+## 各エージェントの判定
+{verdicts_text}
+
+## 多数決結果
+- 賛成: {approve_count}票
+- 反対: {reject_count}票
+- 最終判定: {final}
+
+上記を踏まえ、統合的な分析サマリー、主要な論点、推奨事項を作成してください。
+"""
+
+    def _format_summary(self, judge_summary: JudgeSummary) -> str:
+        """
+        JudgeSummary を FinalVerdict.summary 用の文字列に整形
+
+        Returns:
+            統合サマリー + 主要な論点 + 推奨事項
+        """
+        # key_pointsを箇条書きに変換
+        key_points_text = "\n".join([f"・{point}" for point in judge_summary.key_points])
+
+        return f"""{judge_summary.summary}
+
+【主要な論点】
+{key_points_text}
+
+【推奨事項】
+{judge_summary.recommendation}"""
+
     def integrate_with_analysis(self, question: str, verdicts: list[AgentVerdict]) -> FinalVerdict:
         """
         LLMを使って3エージェントの意見を統合分析
@@ -725,6 +992,9 @@ class JudgeComponent:
         多数決で最終判定（承認/否決/保留）を決定した後、
         LLMを使って統合的な分析サマリーを生成します。
 
+        ※ structured_output() はブロッキング呼び出しです。
+          非同期ジェネレータ内では integrate_with_analysis_stream() を使ってください。
+
         処理フロー:
         1. _count_votes() で多数決判定
         2. 各エージェントの判定をプロンプトに整形
@@ -750,31 +1020,7 @@ class JudgeComponent:
         # ---------------------------------------------------------------------
         # 2. LLMに統合分析を依頼
         # ---------------------------------------------------------------------
-        # 各エージェントの判定を文字列にフォーマット
-        verdicts_text = ""
-        for v in verdicts:
-            verdicts_text += f"""
-【{v.agent_name}】
-- 判定: {v.verdict}
-- 理由: {v.reasoning}
-- 確信度: {v.confidence}
-"""
-
-        prompt = f"""以下の問いかけに対する3エージェントの判定を統合分析してください。
-
-## 問いかけ
-{question}
-
-## 各エージェントの判定
-{verdicts_text}
-
-## 多数決結果
-- 賛成: {approve_count}票
-- 反対: {reject_count}票
-- 最終判定: {final}
-
-上記を踏まえ、統合的な分析サマリー、主要な論点、推奨事項を作成してください。
-"""
+        prompt = self._build_analysis_prompt(question, verdicts, approve_count, reject_count, final)
 
         # =====================================================================
         # 【LLM呼び出し④】JUDGE統合分析
@@ -790,37 +1036,87 @@ class JudgeComponent:
         # ---------------------------------------------------------------------
         # 3. 統合サマリーを作成
         # ---------------------------------------------------------------------
-        # key_pointsを箇条書きに変換
-        key_points_text = "\n".join([f"・{point}" for point in judge_summary.key_points])
+        return FinalVerdict(
+            verdict=final,
+            summary=self._format_summary(judge_summary),
+            vote_count={"賛成": approve_count, "反対": reject_count},
+            agent_verdicts=verdicts
+        )
 
-        full_summary = f"""{judge_summary.summary}
+    async def integrate_with_analysis_stream(
+        self,
+        question: str,
+        verdicts: list[AgentVerdict],
+        hedge: HedgeBudget | None = None,
+        missing_agents: list[str] | None = None
+    ) -> AsyncGenerator[dict, None]:
+        """
+        LLMを使って3エージェントの意見を統合分析（非同期ストリーミング版）
 
-【主要な論点】
-{key_points_text}
+        integrate_with_analysis() と同じ結果を返しますが、
+        stream_async(structured_output_model=JudgeSummary) を使うため
+        イベントループをブロックしません。JUDGEの思考プロセスも
+        judge_thinking イベントとしてリアルタイムで返します。
 
-【推奨事項】
-{judge_summary.recommendation}"""
+        Args:
+            question: 元の問いかけ（ユーザーの質問）
+            verdicts: 各エージェントの判定リスト（3つ）
+            hedge: ヘッジ予算（MAGIAgent.analyze_stream() を参照）
+            missing_agents: 判定が欠けたエージェント名（期限切れなど）。
+                指定時は最終判定を degraded として返す
 
-        return FinalVerdict(
+        Yields:
+            dict: イベント辞書
+                - {"type": "judge_thinking", "content": str}: JUDGEの思考プロセス
+                - {"type": "metrics", "agent": "JUDGE", "data": dict}: 今回の呼び出しの計測値
+                - {"type": "final", "data": FinalVerdict}: 最終判定
+        """
+        approve_count, reject_count, final = self._count_votes(verdicts)
+        prompt = self._build_analysis_prompt(
+            question, verdicts, approve_count, reject_count, final, missing_agents
+        )
+
+        # =====================================================================
+        # 【LLM呼び出し④】JUDGE統合分析（ストリーミング）
+        # =====================================================================
+        judge_summary = None
+        call_metrics = CallMetrics()
+        async for event in self.agent.stream_async(
+            prompt,
+            invocation_state=_invocation_state(hedge, call_metrics),
+            structured_output_model=JudgeSummary
+        ):
+            call_metrics.observe(event)
+            if "data" in event:
+                yield {"type": "judge_thinking", "content": event["data"]}
+
+            if "result" in event:
+                result = event["result"]
+                if hasattr(result, "structured_output") and result.structured_output:
+                    judge_summary = result.structured_output
+                yield {"type": "metrics", "agent": "JUDGE", "data": call_metrics.to_dict(_latest_usage(result))}
+
+        if judge_summary is None:
+            raise RuntimeError("JUDGEの統合分析結果を取得できませんでした")
+
+        final_verdict = FinalVerdict(
             verdict=final,
-            summary=full_summary,
+            summary=self._format_summary(judge_summary),
             vote_count={"賛成": approve_count, "反対": reject_count},
-            agent_verdicts=verdicts
+            agent_verdicts=verdicts,
+            degraded=bool(missing_agents),
+            missing_agents=missing_agents or []
         )
+        yield {"type": "final", "data": final_verdict}
 
-    def integrate_chat(self,question: str,responses: list[AgentResponse],format: str = "explicit") -> ChatResponse:
+    def _build_chat_prompt(self, question: str, responses: list[AgentResponse], format: str) -> str:
         """
-        会話モード: 3エージェントの回答を統合
+        会話統合用のプロンプトを構築
 
-        Args:
-            question: ユーザーからの質問
-            responses: 各エージェントの回答リスト
-            format: 回答形式
-                - "explicit": 各視点を明示的に含める
-                - "natural": 自然な1つの回答として統合
+        integrate_chat() / integrate_chat_stream() で共通。
 
         Returns:
-            ChatResponse: 統合された回答
+            JUDGEに送信するプロンプト文字列
         """
         # 各エージェントの回答を文字列にフォーマット
         responses_text = ""
@@ -831,7 +1127,7 @@ class JudgeComponent:
 """
 
         if format == "explicit":
-            prompt = f"""以下の質問に対する3エージェントの回答を統合してください。
+            return f"""以下の質問に対する3エージェントの回答を統合してください。
 各エージェントの視点を明示的に含めてください。
 
 ## 質問
@@ -845,7 +1141,7 @@ class JudgeComponent:
 のように、各視点を明示しながら統合してください。
 """
         else:  # natural
-            prompt = f"""以下の質問に対する3エージェントの回答を統合してください。
+            return f"""以下の質問に対する3エージェントの回答を統合してください。
 自然な1つの回答として統合してください（視点の明示は不要）。
 
 ## 質問
@@ -858,9 +1154,78 @@ class JudgeComponent:
 3つの視点を自然に織り交ぜた、読みやすい回答を作成してください。
 """
 
+    def integrate_chat(self,question: str,responses: list[AgentResponse],format: str = "explicit") -> ChatResponse:
+        """
+        会話モード: 3エージェントの回答を統合
+
+        ※ structured_output() はブロッキング呼び出しです。
+          非同期ジェネレータ内では integrate_chat_stream() を使ってください。
+
+        Args:
+            question: ユーザーからの質問
+            responses: 各エージェントの回答リスト
+            format: 回答形式
+                - "explicit": 各視点を明示的に含める
+                - "natural": 自然な1つの回答として統合
+
+        Returns:
+            ChatResponse: 統合された回答
+        """
+        prompt = self._build_chat_prompt(question, responses, format)
+
         # =====================================================================
         # 【LLM呼び出し】JUDGE会話統合
         # =====================================================================
         result = self.agent.structured_output(ChatResponse, prompt)
         return result
 
+    async def integrate_chat_stream(
+        self,
+        question: str,
+        responses: list[AgentResponse],
+        format: str = "explicit",
+        hedge: HedgeBudget | None = None
+    ) -> AsyncGenerator[dict, None]:
+        """
+        会話モード: 3エージェントの回答を統合（非同期ストリーミング版）
+
+        integrate_chat() と同じ結果を返しますが、イベントループをブロックしません。
+
+        Args:
+            question: ユーザーからの質問
+            responses: 各エージェントの回答リスト
+            format: 回答形式（"explicit" または "natural"）
+            hedge: ヘッジ予算（MAGIAgent.analyze_stream() を参照）
+
+        Yields:
+            dict: イベント辞書
+                - {"type": "judge_thinking", "content": str}: JUDGEの思考プロセス
+                - {"type": "metrics", "agent": "JUDGE", "data": dict}: 今回の呼び出しの計測値
+                - {"type": "chat_response", "data": ChatResponse}: 統合回答
+        """
+        prompt = self._build_chat_prompt(question, responses, format)
+
+        # =====================================================================
+        # 【LLM呼び出し】JUDGE会話統合（ストリーミング）
+        # =====================================================================
+        chat_response = None
+        call_metrics = CallMetrics()
+        async for event in self.agent.stream_async(
+            prompt,
+            invocation_state=_invocation_state(hedge, call_metrics),
+            structured_output_model=ChatResponse
+        ):
+            call_metrics.observe(event)
+            if "data" in event:
+                yield {"type": "judge_thinking", "content": event["data"]}
+
+            if "result" in event:
+                result = event["result"]
+                if hasattr(result, "structured_output") and result.structured_output:
+                    chat_response = result.structured_output
+                yield {"type": "metrics", "agent": "JUDGE", "data": call_metrics.to_dict(_latest_usage(result))}
+
+        if chat_response is None:
+            raise RuntimeError("JUDGEの統合回答を取得できませんでした")
+
+        yield {"type": "chat_response", "data": chat_response}
@@ -0,0 +1,326 @@
+# =============================================================================
+# fake_model.py - オフライン検証用のフェイクモデル
+# =============================================================================
+#
+# Bedrock を呼び出さずに MAGI システム全体（エージェント・JUDGE・バックエンド）を
+# 動かすためのモデルです。Strands の Model インターフェースを実装しているため、
+# BedrockModel の代わりにそのまま Agent に渡せます。
+#
+# 主要コンポーネント:
+# - FakeModel: ストリーミング応答と構造化出力を返すフェイクモデル
+#
+# できること:
+#   - 最初のトークンまでの時間（TTFT）・トークン間隔の再現（ゆらぎ付き）
+#   - スロットリングの注入（確率 / 同時実行数の上限超過）
+#   - ストリーム途中のエラーの注入（確率）
+#   - structured_output_model（AgentVerdict など）に合った toolUse の生成
+#     （スキーマから値を組み立てるため、モデル定義を変えても動く）
+#   - 受け取ったリクエスト（システムプロンプトのブロック・ツール定義）の記録
+#   - プロンプトキャッシュの再現（cachePoint までが同じなら2回目以降は読み込み）
+#   - 読み手がいなくなった後の生成の再現（BedrockModel と同じく、生成は読み手とは
+#     別に進み、cancel_signal がセットされるまで止まらない。generated_tokens で確認）
+#
+# 使い方:
+#   MAGI_MODEL_BACKEND=fake を設定すると get_shared_model() が FakeModel を返す
+#   （agents/models.py を参照）。パラメータは環境変数 MAGI_FAKE_* で指定します。
+#
+# 設定（環境変数）:
+#   MAGI_FAKE_TTFT: 最初のトークンまでの秒数（デフォルト: 0.05）
+#   MAGI_FAKE_TOKEN_DELAY: トークン間の秒数（デフォルト: 0.01）
+#   MAGI_FAKE_TOKENS: 思考プロセスとして返すトークン数（デフォルト: 20）
+#   MAGI_FAKE_JITTER: TTFT・トークン間隔のゆらぎ 0.0〜1.0（デフォルト: 0）
+#     各待ち時間を ×(1 ± jitter) の一様乱数で伸縮する
+#   MAGI_FAKE_ERROR_RATE: ストリーム途中でエラーにする確率 0.0〜1.0（デフォルト: 0）
+#   MAGI_FAKE_THROTTLE_RATE: スロットリングを返す確率 0.0〜1.0（デフォルト: 0）
+#   MAGI_FAKE_MAX_CONCURRENCY: これを超える同時呼び出しをスロットリング（デフォルト: 0 = 無制限）
+#   MAGI_FAKE_SEED: 乱数シード（デフォルト: なし）
+#
+# =============================================================================
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import uuid
+from collections import deque
+from typing import Any, AsyncGenerator
+
+from pydantic import BaseModel
+from strands.models.model import Model
+from strands.types.exceptions import ModelThrottledException
+
+
+# 判定の選択肢（AgentVerdict.verdict）
+_VERDICT_CHOICES = ("賛成", "反対")
+
+
+class FakeModelError(RuntimeError):
+    """注入したストリーム途中のエラー（Bedrock の ModelStreamErrorException 相当）"""
+
+
+class FakeModel(Model):
+    """
+    オフライン検証用のフェイクモデル
+
+    Attributes:
+        ttft: 最初のトークンまでの秒数
+        token_delay: トークン間の秒数
+        tokens: 思考プロセスとして返すトークン数
+        throttle_rate: スロットリングを返す確率
+        max_concurrency: これを超える同時呼び出しをスロットリング（0 は無制限）
+        jitter: TTFT・トークン間隔のゆらぎ（0〜1）
+        error_rate: ストリーム途中でエラーにする確率
+        calls: 呼び出し回数
+        throttled: スロットリングを返した回数
+        errors: エラーを返した回数
+        generated_tokens: 生成したテキストのトークン数（読み手がいなくなった後の分も含む）
+        aborted: cancel_signal で途中で止めた生成の数
+        requests: 最近受け取ったリクエスト（messages, tool_specs, system_prompt_content）
+    """
+
+    def __init__(
+        self,
+        model_id: str = "fake",
+        ttft: float = 0.05,
+        token_delay: float = 0.01,
+        tokens: int = 20,
+        throttle_rate: float = 0.0,
+        max_concurrency: int = 0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int | None = None
+    ):
+        self.config: dict[str, Any] = {"model_id": model_id}
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.throttle_rate = throttle_rate
+        self.max_concurrency = max_concurrency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+        self.calls = 0
+        self.throttled = 0
+        self.errors = 0
+        self.generated_tokens = 0
+        self.aborted = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests: deque[dict] = deque(maxlen=256)
+        self._cached_prefixes: set[str] = set()
+        self._producers: set[asyncio.Task] = set()
+
+    @classmethod
+    def from_env(cls, model_id: str = "fake") -> "FakeModel":
+        """環境変数 MAGI_FAKE_* から生成"""
+        seed = os.environ.get("MAGI_FAKE_SEED")
+        return cls(
+            model_id=model_id,
+            ttft=float(os.environ.get("MAGI_FAKE_TTFT", "0.05")),
+            token_delay=float(os.environ.get("MAGI_FAKE_TOKEN_DELAY", "0.01")),
+            tokens=int(os.environ.get("MAGI_FAKE_TOKENS", "20")),
+            throttle_rate=float(os.environ.get("MAGI_FAKE_THROTTLE_RATE", "0")),
+            max_concurrency=int(os.environ.get("MAGI_FAKE_MAX_CONCURRENCY", "0")),
+            jitter=float(os.environ.get("MAGI_FAKE_JITTER", "0")),
+            error_rate=float(os.environ.get("MAGI_FAKE_ERROR_RATE", "0")),
+            seed=int(seed) if seed else None,
+        )
+
+    # -------------------------------------------------------------------------
+    # Model インターフェース
+    # -------------------------------------------------------------------------
+
+    def update_config(self, **model_config: Any) -> None:
+        self.config.update(model_config)
+
+    def get_config(self) -> dict[str, Any]:
+        return self.config
+
+    async def structured_output(
+        self,
+        output_model: type[BaseModel],
+        prompt: Any,
+        system_prompt: str | None = None,
+        **kwargs: Any
+    ) -> AsyncGenerator[dict, None]:
+        await asyncio.sleep(self._delay(self.ttft))
+        yield {"output": output_model(**self._sample(output_model.model_json_schema()))}
+
+    async def stream(
+        self,
+        messages: list,
+        tool_specs: list | None = None,
+        system_prompt: str | None = None,
+        **kwargs: Any
+    ) -> AsyncGenerator[dict, None]:
+        """
+        Bedrock の ConverseStream と同じ形式のイベントを返す
+
+        tool_specs がある（structured_output_model 指定時）場合は、
+        思考プロセスのテキストに続けて最初のツールの toolUse を返します。
+        ツール結果を受け取った後の呼び出しでは短いテキストで終了します。
+
+        BedrockModel がワーカースレッドで HTTP のストリームを読むのと同じく、
+        生成は別のタスクで進みます。読み手がいなくなっても生成は続き、
+        cancel_signal（threading.Event）がセットされたら次のイベントの境目で止まります。
+        """
+        cancel_signal = kwargs.get("cancel_signal")
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def produce() -> None:
+            try:
+                async for event in self._generate(messages, tool_specs, system_prompt, **kwargs):
+                    if cancel_signal is not None and cancel_signal.is_set():
+                        self.aborted += 1
+                        return
+                    queue.put_nowait(event)
+            except Exception as e:
+                queue.put_nowait(e)
+            finally:
+                queue.put_nowait(None)
+
+        task = asyncio.create_task(produce())
+        self._producers.add(task)
+        task.add_done_callback(self._producers.discard)
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def _generate(
+        self,
+        messages: list,
+        tool_specs: list | None = None,
+        system_prompt: str | None = None,
+        **kwargs: Any
+    ) -> AsyncGenerator[dict, None]:
+        """stream() の生成側（読み手とは別のタスクで実行される）"""
+        system = kwargs.get("system_prompt_content") or ([{"text": system_prompt}] if system_prompt else [])
+        self.requests.append({"messages": messages, "tool_specs": tool_specs, "system_prompt_content": system})
+        self.calls += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            # スロットリングの注入
+            over_capacity = self.max_concurrency and self.in_flight > self.max_concurrency
+            if over_capacity or self._random.random() < self.throttle_rate:
+                self.throttled += 1
+                await asyncio.sleep(self._delay(self.ttft / 2))
+                raise ModelThrottledException("ThrottlingException: Too many requests (fake)")
+
+            # エラーを注入する場合は、途中まで返してから失敗させる
+            fail_at = self._random.randrange(self.tokens + 1) if self._random.random() < self.error_rate else None
+
+            await asyncio.sleep(self._delay(self.ttft))
+            yield {"messageStart": {"role": "assistant"}}
+
+            last = messages[-1] if messages else {"content": []}
+            answered = any("toolResult" in block for block in last.get("content", []))
+
+            if tool_specs and not answered:
+                # 思考プロセス → 構造化出力の toolUse
+                async for event in self._text_events(self.tokens, fail_at):
+                    yield event
+                spec = tool_specs[0]
+                payload = self._sample(spec["inputSchema"]["json"])
+                yield {"contentBlockStart": {"start": {"toolUse": {
+                    "toolUseId": f"tooluse_{uuid.uuid4().hex[:12]}",
+                    "name": spec["name"],
+                }}}}
+                yield {"contentBlockDelta": {"delta": {"toolUse": {"input": json.dumps(payload, ensure_ascii=False)}}}}
+                yield {"contentBlockStop": {}}
+                yield {"messageStop": {"stopReason": "tool_use"}}
+                output_tokens = self.tokens + 1
+            else:
+                async for event in self._text_events(1 if answered else self.tokens, fail_at):
+                    yield event
+                yield {"messageStop": {"stopReason": "end_turn"}}
+                output_tokens = 1 if answered else self.tokens
+
+            input_tokens = sum(len(json.dumps(m, ensure_ascii=False)) for m in messages) // 4
+            usage = {"inputTokens": input_tokens, "outputTokens": output_tokens, "totalTokens": 0}
+            usage.update(self._prompt_cache_usage(system, tool_specs))
+            yield {"metadata": {"usage": usage, "metrics": {"latencyMs": 0}}}
+        finally:
+            self.in_flight -= 1
+
+    # -------------------------------------------------------------------------
+    # 内部ヘルパー
+    # -------------------------------------------------------------------------
+
+    def _delay(self, seconds: float) -> float:
+        """待ち時間にゆらぎを加える"""
+        if not self.jitter:
+            return seconds
+        return seconds * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def _text_events(self, count: int, fail_at: int | None = None) -> AsyncGenerator[dict, None]:
+        """
+        count 個のテキストデルタを token_delay 間隔で返す
+
+        fail_at を指定すると、その個数（count 以上なら全部）を返した時点で
+        FakeModelError を送出します。
+        """
+        yield {"contentBlockStart": {"start": {}}}
+        for i in range(count):
+            if i == fail_at:
+                break
+            if i:
+                await asyncio.sleep(self._delay(self.token_delay))
+            self.generated_tokens += 1
+            yield {"contentBlockDelta": {"delta": {"text": "検討中。"}}}
+        if fail_at is not None:
+            self.errors += 1
+            raise FakeModelError("ModelStreamErrorException: stream interrupted (fake)")
+        yield {"contentBlockStop": {}}
+
+    def _prompt_cache_usage(self, system: list[dict], tool_specs: list | None) -> dict:
+        """
+        Bedrock のプロンプトキャッシュを再現したトークン数
+
+        最後の cachePoint までのプレフィックス（ツール定義 + システムプロンプト）が
+        初めてなら書き込み、2回目以降なら読み込みとして数えます。
+        cachePoint がなければ空の辞書（キャッシュ関連のフィールドなし）を返します。
+        """
+        points = [i for i, block in enumerate(system) if "cachePoint" in block]
+        if not points:
+            return {}
+        prefix = json.dumps([tool_specs or [], system[:points[-1]]], ensure_ascii=False, sort_keys=True)
+        tokens = len(prefix) // 4
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        if key in self._cached_prefixes:
+            return {"cacheReadInputTokens": tokens, "cacheWriteInputTokens": 0}
+        self._cached_prefixes.add(key)
+        return {"cacheReadInputTokens": 0, "cacheWriteInputTokens": tokens}
+
+    def _sample(self, schema: dict) -> dict:
+        """JSON スキーマ（pydantic の model_json_schema）から値を組み立てる"""
+        result: dict[str, Any] = {}
+        for name, prop in schema.get("properties", {}).items():
+            result[name] = self._sample_value(name, prop)
+        return result
+
+    def _sample_value(self, name: str, prop: dict) -> Any:
+        if "enum" in prop:
+            return self._random.choice(prop["enum"])
+        if name == "verdict":
+            return self._random.choice(_VERDICT_CHOICES)
+        if name == "format":
+            return "explicit"
+        kind = prop.get("type")
+        if kind == "number":
+            return round(self._random.uniform(0.5, 0.95), 2)
+        if kind == "integer":
+            return 1
+        if kind == "boolean":
+            return True
+        if kind == "array":
+            return [f"{name}-{i + 1}" for i in range(3)]
+        if kind == "object":
+            return {}
+        return f"フェイクモデルの{name}"
@@ -0,0 +1,612 @@
+# =============================================================================
+# models.py - 共有Bedrockモデル / クライアント
+# =============================================================================
+#
+# このモジュールは、MAGIシステムの全ロール（MELCHIOR, BALTHASAR, CASPER, JUDGE）が
+# 共有する BedrockModel を提供します。
+#
+# 背景:
+#   BedrockModel は生成時に boto3 の bedrock-runtime クライアントを作り、
+#   クライアントごとに独自のHTTPコネクションプールを持ちます。
+#   ロールごと・agent/chat_agent ごとに BedrockModel を作ると、
+#   同じコンテナ内の同時リクエストがそれぞれ別の接続を開くことになります。
+#
+#   ここではモデルIDごとに1つの BedrockModel（＝1つのクライアント）を作り、
+#   全ロールで共有します。boto3 クライアントはスレッドセーフなので、
+#   同時リクエストはウォームな接続を使い回せます。
+#
+# 主要関数:
+# - BedrockClientSettings: クライアント設定（プールサイズ・キープアライブ・リトライ）
+# - get_client_config(): botocore の Config を生成
+# - LimitedModel: 全モデル呼び出しを適応型リミッターに通すラッパー
+# - HedgedModel: 遅い呼び出しをヘッジ（重複発行）するラッパー
+# - CancellableModel: 読み手がいなくなったモデル呼び出しを止めるラッパー
+# - get_shared_model(): モデルIDごとの共有モデルを取得
+# - reset_shared_models(): 共有モデルを破棄（設定変更時・テスト用）
+# - warm_connections(): LLM を呼び出さずに共有クライアントの接続を温める
+# - connection_stats(): 共有クライアントのコネクションプールの状態
+# - prompt_cache_enabled() / cached_system_prompt(): プロンプトキャッシュのチェックポイント
+#
+# モデル呼び出しの流れ:
+#   Agent → HedgedModel（ヘッジ, pipeline/hedging.py）
+#         → LimitedModel（同時実行数の制御, pipeline/limiter.py）
+#         → CancellableModel（読み手がいなくなった呼び出しの停止）→ BedrockModel
+#   ヘッジで発行した重複リクエストも、それぞれリミッターの枠を使う。
+#   MAGI_MODEL_BACKEND=fake の場合は BedrockModel の代わりに FakeModel
+#   （agents/fake_model.py）を使い、Bedrock を呼び出さずに動作を確認できる。
+#
+# 設定（環境変数）:
+#   MAGI_MODEL_BACKEND: bedrock | fake（デフォルト: bedrock）
+#   MAGI_BEDROCK_REGION: リージョン（デフォルト: ap-northeast-1）
+#   MAGI_BEDROCK_MAX_POOL_CONNECTIONS: コネクションプールサイズ（デフォルト: 50）
+#   MAGI_BEDROCK_TCP_KEEPALIVE: TCPキープアライブ（デフォルト: true）
+#   MAGI_BEDROCK_MAX_ATTEMPTS: 最大試行回数（デフォルト: 3）
+#   MAGI_BEDROCK_RETRY_MODE: リトライモード standard | adaptive | legacy（デフォルト: standard）
+#   MAGI_BEDROCK_CONNECT_TIMEOUT: 接続タイムアウト秒（デフォルト: 5）
+#   MAGI_BEDROCK_READ_TIMEOUT: 読み取りタイムアウト秒（デフォルト: 120）
+#   MAGI_PROMPT_CACHE: システムプロンプトの後ろにキャッシュのチェックポイントを置く（デフォルト: false）
+#
+# =============================================================================
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, AsyncIterable
+
+import boto3
+from botocore.config import Config as BotocoreConfig
+from botocore.exceptions import BotoCoreError, ClientError, ConnectTimeoutError, ReadTimeoutError
+from strands.models.bedrock import BedrockModel
+from strands.models.model import Model
+from strands.types.exceptions import ModelThrottledException
+
+from pipeline.hedging import (
+    HEDGE_STATE_KEY,
+    STREAM_TIMER_STATE_KEY,
+    StreamTimer,
+    TTFTTracker,
+    hedged_stream,
+    timed_stream,
+)
+from pipeline.metrics import CALL_METRICS_STATE_KEY
+from pipeline.telemetry import CANCELLED_COUNTER
+from pipeline.limiter import (
+    OUTCOME_CANCELLED,
+    OUTCOME_ERROR,
+    OUTCOME_SUCCESS,
+    OUTCOME_THROTTLED,
+    OUTCOME_TIMEOUT,
+    AdaptiveLimiter,
+    get_limiter
+)
+
+
+# デフォルトのモデルID（Claude Haiku 4.5、日本リージョン推論プロファイル）
+DEFAULT_MODEL_ID = "jp.anthropic.claude-haiku-4-5-20251001-v1:0"
+
+# デフォルトのリージョン（東京リージョン）
+DEFAULT_REGION = "ap-northeast-1"
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """環境変数を真偽値として読む"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class BedrockClientSettings:
+    """
+    共有 bedrock-runtime クライアントの設定
+
+    Attributes:
+        region_name: AWSリージョン
+        max_pool_connections: HTTPコネクションプールのサイズ
+        tcp_keepalive: TCPキープアライブを有効にするか
+        max_attempts: 最大試行回数（初回を含む）
+        retry_mode: botocoreのリトライモード
+        connect_timeout: 接続タイムアウト（秒）
+        read_timeout: 読み取りタイムアウト（秒）
+    """
+    region_name: str = DEFAULT_REGION
+    max_pool_connections: int = 50
+    tcp_keepalive: bool = True
+    max_attempts: int = 3
+    retry_mode: str = "standard"
+    connect_timeout: float = 5.0
+    read_timeout: float = 120.0
+
+    @classmethod
+    def from_env(cls) -> "BedrockClientSettings":
+        """環境変数から設定を読み込む"""
+        return cls(
+            region_name=os.environ.get("MAGI_BEDROCK_REGION", DEFAULT_REGION),
+            max_pool_connections=int(os.environ.get("MAGI_BEDROCK_MAX_POOL_CONNECTIONS", "50")),
+            tcp_keepalive=_env_bool("MAGI_BEDROCK_TCP_KEEPALIVE", True),
+            max_attempts=int(os.environ.get("MAGI_BEDROCK_MAX_ATTEMPTS", "3")),
+            retry_mode=os.environ.get("MAGI_BEDROCK_RETRY_MODE", "standard"),
+            connect_timeout=float(os.environ.get("MAGI_BEDROCK_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.environ.get("MAGI_BEDROCK_READ_TIMEOUT", "120")),
+        )
+
+
+def get_client_config(settings: BedrockClientSettings) -> BotocoreConfig:
+    """
+    botocore の Config を生成
+
+    Args:
+        settings: クライアント設定
+
+    Returns:
+        BotocoreConfig: BedrockModel の boto_client_config に渡す設定
+    """
+    return BotocoreConfig(
+        max_pool_connections=settings.max_pool_connections,
+        tcp_keepalive=settings.tcp_keepalive,
+        retries={
+            "total_max_attempts": settings.max_attempts,
+            "mode": settings.retry_mode,
+        },
+        connect_timeout=settings.connect_timeout,
+        read_timeout=settings.read_timeout,
+    )
+
+
+# =============================================================================
+# プロンプトキャッシュ
+# =============================================================================
+#
+# 各ペルソナ・JUDGE のシステムプロンプトは毎回同じ内容を送っています。
+# MAGI_PROMPT_CACHE=true の場合、システムプロンプトの直後に
+# キャッシュのチェックポイント（cachePoint）を置き、Bedrock が
+# 「ツール定義（構造化出力）+ システムプロンプト」までの処理を再利用できるようにします。
+#
+#   system: [{"text": "あなたはMAGIシステムの..."}, {"cachePoint": {"type": "default"}}]
+#            └──────── 毎回同じ（キャッシュ対象）────┘
+#   messages: 問いかけ（毎回変わる）
+#
+# キャッシュの読み書きトークン数は、各エージェントの metrics イベント
+# （cache_read_tokens / cache_write_tokens）で確認できます。
+# モデルごとの最小トークン数に満たないプレフィックスはキャッシュされず、
+# どちらも 0 のままになります。
+
+def prompt_cache_enabled() -> bool:
+    """プロンプトキャッシュのチェックポイントを置くか（MAGI_PROMPT_CACHE）"""
+    return _env_bool("MAGI_PROMPT_CACHE", False)
+
+
+def cached_system_prompt(text: str) -> str | list[dict]:
+    """
+    Strands Agent に渡すシステムプロンプトを作る
+
+    Args:
+        text: システムプロンプト
+
+    Returns:
+        プロンプトキャッシュが無効なら text のまま、
+        有効ならチェックポイント付きのシステムプロンプトのブロック
+    """
+    if not prompt_cache_enabled():
+        return text
+    return [{"text": text}, {"cachePoint": {"type": "default"}}]
+
+
+# =============================================================================
+# キャンセルの伝播
+# =============================================================================
+#
+# BedrockModel.stream() は ConverseStream の HTTP レスポンスをワーカースレッドで
+# 読みます。クライアントの切断などで読み手（asyncio のタスク）がキャンセルされても
+# ワーカースレッドは止まらず、生成が最後まで続きます（誰も読まないトークンの料金が
+# かかる）。スレッドが止まるのは、stream() に渡した cancel_signal がセットされたとき
+# （次のチャンクの境目でレスポンスを閉じる）だけです。
+#
+# Strands は Agent 自身の cancel_signal を渡しますが、キャンセル時にはすぐ
+# クリアされるため、スレッドからは見えないことがあります。CancellableModel は
+# 呼び出しごとに専用の cancel_signal を渡し、ストリームが最後まで読まれずに
+# 閉じられた（キャンセル・ヘッジの負け・期限切れ・例外）ときにセットします。
+#
+#   読み手のタスク ─×（キャンセル）
+#        └─ CancellableModel: cancel_signal.set()
+#              └─ ワーカースレッド: 次のチャンクで response["stream"].close()
+
+class CancellableModel(Model):
+    """
+    最後まで読まれずに閉じられたモデル呼び出しを止めるラッパー
+
+    呼び出しごとの cancel_signal（threading.Event）を元のモデルに渡し、
+    ストリームが途中で閉じられたらセットします。止めた呼び出しは
+    magi.cancelled カウンター（magi.scope=model）に記録します。
+    それ以外の属性（config、client など）は元のモデルに委譲します。
+
+    Attributes:
+        model: 元のモデル（BedrockModel / FakeModel）
+        cancelled: 途中で止めた呼び出しの数
+    """
+
+    def __init__(self, model: Model):
+        self.model = model
+        self.cancelled = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.model, name)
+
+    @property
+    def stateful(self) -> bool:
+        return self.model.stateful
+
+    def update_config(self, **model_config: Any) -> None:
+        self.model.update_config(**model_config)
+
+    def get_config(self) -> Any:
+        return self.model.get_config()
+
+    def structured_output(self, output_model, prompt, system_prompt=None, **kwargs) -> AsyncGenerator[dict, None]:
+        return self.model.structured_output(output_model, prompt, system_prompt=system_prompt, **kwargs)
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs) -> AsyncGenerator[dict, None]:
+        cancel_signal = threading.Event()
+        kwargs["cancel_signal"] = cancel_signal
+        try:
+            async for event in self.model.stream(messages, tool_specs, system_prompt, **kwargs):
+                yield event
+        except Exception:
+            # 元のモデルのエラー（念のため止めるが、キャンセルとしては数えない）
+            cancel_signal.set()
+            raise
+        except BaseException:
+            # 読み手がいなくなった（CancelledError / GeneratorExit）: 生成を止める
+            # Agent.cancel() による中断も、Strands がストリームを閉じるのでここに来る
+            cancel_signal.set()
+            self.cancelled += 1
+            CANCELLED_COUNTER.add(1, {"magi.scope": "model"})
+            raise
+
+
+# =============================================================================
+# 同時実行数の制御
+# =============================================================================
+
+# タイムアウトとして扱う例外（リミッターの上限を下げる）
+_TIMEOUT_ERRORS = (TimeoutError, asyncio.TimeoutError, ReadTimeoutError, ConnectTimeoutError)
+
+
+class LimitedModel(Model):
+    """
+    モデル呼び出しを適応型リミッター（AdaptiveLimiter）に通すラッパー
+
+    ストリームの開始前に実行枠を確保し、ストリームが終わるまで保持します。
+    スロットリング・タイムアウトはリミッターの上限を下げ、成功は上限を上げます。
+    それ以外の属性（config など）は元のモデルに委譲します。
+
+    Attributes:
+        model: 元のモデル（BedrockModel / FakeModel）
+        limiter: 共有リミッター
+    """
+
+    def __init__(self, model: Model, limiter: AdaptiveLimiter):
+        self.model = model
+        self.limiter = limiter
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.model, name)
+
+    @property
+    def stateful(self) -> bool:
+        return self.model.stateful
+
+    def update_config(self, **model_config: Any) -> None:
+        self.model.update_config(**model_config)
+
+    def get_config(self) -> Any:
+        return self.model.get_config()
+
+    def structured_output(self, output_model, prompt, system_prompt=None, **kwargs) -> AsyncGenerator[dict, None]:
+        return self._limited(
+            self.model.structured_output(output_model, prompt, system_prompt=system_prompt, **kwargs),
+            kwargs.get("invocation_state")
+        )
+
+    def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs) -> AsyncGenerator[dict, None]:
+        return self._limited(
+            self.model.stream(messages, tool_specs, system_prompt, **kwargs),
+            kwargs.get("invocation_state")
+        )
+
+    async def _limited(self, events: AsyncIterable[dict], invocation_state: dict | None) -> AsyncGenerator[dict, None]:
+        """
+        実行枠を確保してからイベントを転送し、結果に応じて枠を返却
+
+        invocation_state に CallMetrics（pipeline/metrics.py）があれば、
+        実行枠を待った時間を記録します。StreamTimer（pipeline/hedging.py）があれば、
+        TTFT を枠の確保から数えるよう通知します。
+        """
+        wait = await self.limiter.acquire()
+        call_metrics = (invocation_state or {}).get(CALL_METRICS_STATE_KEY)
+        if call_metrics is not None:
+            call_metrics.add_queue_wait(wait)
+        timer = (invocation_state or {}).get(STREAM_TIMER_STATE_KEY)
+        if timer is not None:
+            timer.slot_acquired()
+        outcome = OUTCOME_ERROR
+        try:
+            async for event in events:
+                yield event
+            outcome = OUTCOME_SUCCESS
+        except ModelThrottledException:
+            outcome = OUTCOME_THROTTLED
+            raise
+        except _TIMEOUT_ERRORS:
+            outcome = OUTCOME_TIMEOUT
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = OUTCOME_CANCELLED
+            raise
+        finally:
+            self.limiter.release(outcome)
+
+
+# =============================================================================
+# ヘッジ
+# =============================================================================
+
+class HedgedModel(Model):
+    """
+    遅いモデル呼び出しをヘッジ（重複発行）するラッパー
+
+    invocation_state に HedgeBudget（pipeline/hedging.py）が入っている呼び出しだけ
+    ヘッジします。それ以外の呼び出しはそのまま転送し、TTFT だけを記録します
+    （ヘッジ遅延のパーセンタイル計算に使うため）。
+
+    元のモデルが LimitedModel の場合、TTFT は実行枠の確保から数え、
+    リミッターの枠が埋まっている間はヘッジしません。
+
+    Attributes:
+        model: 元のモデル（LimitedModel / BedrockModel / FakeModel）
+        ttft: このモデルの最近の TTFT
+        limiter: 元のモデルのリミッター（LimitedModel でなければ None）
+    """
+
+    def __init__(self, model: Model):
+        self.model = model
+        self.ttft = TTFTTracker()
+        self.limiter = model.limiter if isinstance(model, LimitedModel) else None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.model, name)
+
+    @property
+    def stateful(self) -> bool:
+        return self.model.stateful
+
+    def update_config(self, **model_config: Any) -> None:
+        self.model.update_config(**model_config)
+
+    def get_config(self) -> Any:
+        return self.model.get_config()
+
+    def structured_output(self, output_model, prompt, system_prompt=None, **kwargs) -> AsyncGenerator[dict, None]:
+        return self.model.structured_output(output_model, prompt, system_prompt=system_prompt, **kwargs)
+
+    def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs) -> AsyncGenerator[dict, None]:
+        budget = (kwargs.get("invocation_state") or {}).get(HEDGE_STATE_KEY)
+        if budget is None:
+            return timed_stream(*self._start(messages, tool_specs, system_prompt, kwargs), self.ttft)
+        return hedged_stream(
+            lambda: self._start(messages, tool_specs, system_prompt, kwargs),
+            self.ttft,
+            budget,
+            saturated=(lambda: self.limiter.saturated) if self.limiter is not None else None
+        )
+
+    def _start(self, messages, tool_specs, system_prompt, kwargs: dict) -> tuple[AsyncGenerator[dict, None], StreamTimer]:
+        """
+        元のモデルのストリームを1本開始し、TTFT 計測用のタイマーと一緒に返す
+
+        タイマーはストリームごとに別なので、invocation_state を複製して渡します
+        （中の CallMetrics などは共有のまま）。
+        """
+        timer = StreamTimer(queued=self.limiter is not None)
+        invocation_state = {**(kwargs.get("invocation_state") or {}), STREAM_TIMER_STATE_KEY: timer}
+        stream = self.model.stream(
+            messages, tool_specs, system_prompt, **{**kwargs, "invocation_state": invocation_state}
+        )
+        return stream, timer
+
+
+# =============================================================================
+# 共有モデル
+# =============================================================================
+
+# モデルID → 共有モデル
+_shared_models: dict[str, Model] = {}
+_shared_session: boto3.Session | None = None
+_settings: BedrockClientSettings | None = None
+_lock = threading.Lock()
+
+
+def get_settings() -> BedrockClientSettings:
+    """現在の共有クライアント設定を取得（初回は環境変数から読み込む）"""
+    global _settings
+    with _lock:
+        if _settings is None:
+            _settings = BedrockClientSettings.from_env()
+        return _settings
+
+
+def _create_model(model_id: str, settings: BedrockClientSettings) -> Model:
+    """MAGI_MODEL_BACKEND に従って元のモデルを生成（ロック内で呼ぶ）"""
+    global _shared_session
+    backend = os.environ.get("MAGI_MODEL_BACKEND", "bedrock").lower()
+    if backend == "fake":
+        from agents.fake_model import FakeModel
+        return FakeModel.from_env(model_id)
+    if backend != "bedrock":
+        raise ValueError(f"MAGI_MODEL_BACKEND は bedrock | fake のいずれかです: {backend}")
+
+    if _shared_session is None:
+        _shared_session = boto3.Session(region_name=settings.region_name)
+    return BedrockModel(
+        model_id=model_id,
+        boto_session=_shared_session,
+        boto_client_config=get_client_config(settings)
+    )
+
+
+def get_shared_model(model_id: str = DEFAULT_MODEL_ID) -> Model:
+    """
+    モデルIDごとの共有モデルを取得
+
+    ※ここではLLMを呼び出していない（モデルとクライアントの設定のみ）
+    初回呼び出し時に BedrockModel（＝bedrock-runtime クライアント）を作り、
+    以降は同じインスタンスを返します。全ロールの agent / chat_agent が
+    これを共有することで、HTTPコネクションプールも共有されます。
+    元のモデルを CancellableModel で包み、リミッターが有効（MAGI_LIMITER=on、デフォルト）な
+    場合は LimitedModel で包み、最外側を HedgedModel で包みます。
+
+    Args:
+        model_id: BedrockモデルID
+
+    Returns:
+        Model: 共有モデル
+    """
+    settings = get_settings()
+    limiter = get_limiter()
+    with _lock:
+        model = _shared_models.get(model_id)
+        if model is None:
+            model = CancellableModel(_create_model(model_id, settings))
+            if limiter is not None:
+                model = LimitedModel(model, limiter)
+            model = HedgedModel(model)
+            _shared_models[model_id] = model
+        return model
+
+
+def reset_shared_models(settings: BedrockClientSettings | None = None) -> None:
+    """
+    共有モデルを破棄し、次回の get_shared_model() で作り直す
+
+    既に生成済みのエージェントは古いモデルを持ち続けるため、
+    エージェントプールも合わせてクリアしてください。
+
+    Args:
+        settings: 新しいクライアント設定（省略時は次回に環境変数から読み込む）
+    """
+    global _shared_session, _settings
+    with _lock:
+        _shared_models.clear()
+        _shared_session = None
+        _settings = settings
+
+
+# =============================================================================
+# 接続のウォームアップ
+# =============================================================================
+#
+# アイドルの後の最初のリクエストは、DNS の解決・TLS ハンドシェイク・
+# 認証情報の取得（IMDS / コンテナの認証情報エンドポイント）の分だけ遅くなります。
+# warm_connections() は bedrock-runtime の ListAsyncInvokes（LLM を呼び出さない
+# 軽い署名付きリクエスト）を送り、共有クライアントのコネクションプールに
+# 確立済みの接続を用意します。権限がなく AccessDenied が返っても、
+# 接続と認証情報は温まるため成功として扱います。
+
+def _base_model(model: Model) -> Model:
+    """HedgedModel / LimitedModel / CancellableModel を外した元のモデル"""
+    while isinstance(model, (HedgedModel, LimitedModel, CancellableModel)):
+        model = model.model
+    return model
+
+
+def _warm_once(client) -> str:
+    """ListAsyncInvokes を1回送り、結果（ok またはエラーコード）を返す"""
+    try:
+        client.list_async_invokes(maxResults=1)
+        return "ok"
+    except ClientError as e:
+        # 応答が返った＝接続・認証情報の取得は済んでいる
+        return e.response.get("Error", {}).get("Code", "ClientError")
+
+
+def warm_connections(connections: int = 1, model_id: str = DEFAULT_MODEL_ID) -> dict:
+    """
+    LLM を呼び出さずに共有クライアントの接続を温める
+
+    同期処理です（ネットワーク待ちあり）。イベントループからは
+    asyncio.to_thread() で呼び出してください。
+
+    Args:
+        connections: 同時に温める接続の数（コネクションプールのサイズまで）
+        model_id: 対象の共有モデルのID
+
+    Returns:
+        dict: {"backend", "warmed"（成功したか）, "status"（ok / エラーコード / 例外名）, "connections", "ms"}
+    """
+    model = _base_model(get_shared_model(model_id))
+    started_at = time.perf_counter()
+    if not isinstance(model, BedrockModel):
+        # FakeModel などネットワークを使わないモデル
+        return {"backend": type(model).__name__, "warmed": True, "status": "ok", "connections": 0, "ms": 0.0}
+
+    connections = max(1, min(connections, get_settings().max_pool_connections))
+    try:
+        if connections == 1:
+            statuses = [_warm_once(model.client)]
+        else:
+            # 同時に送らないと同じ接続が使い回され、1本しか温まらない
+            with ThreadPoolExecutor(max_workers=connections) as executor:
+                statuses = list(executor.map(lambda _: _warm_once(model.client), range(connections)))
+        status = next((s for s in statuses if s != "ok"), "ok")
+        warmed = True
+    except (BotoCoreError, OSError) as e:
+        # 接続できない・認証情報がない
+        status = type(e).__name__
+        warmed = False
+    return {
+        "backend": "bedrock",
+        "warmed": warmed,
+        "status": status,
+        "connections": connections,
+        "ms": round((time.perf_counter() - started_at) * 1000, 1),
+    }
+
+
+def connection_stats() -> dict:
+    """
+    共有クライアントのコネクションプールの状態
+
+    botocore の内部（urllib3 の PoolManager）を参照するため、
+    取得できない場合は None を返します。
+
+    Returns:
+        dict: {モデルID: {"backend", "pools": [{"host", "created", "requests", "idle"}] | None}}
+    """
+    with _lock:
+        models = dict(_shared_models)
+    stats = {}
+    for model_id, model in models.items():
+        model = _base_model(model)
+        if not isinstance(model, BedrockModel):
+            stats[model_id] = {"backend": type(model).__name__, "pools": []}
+            continue
+        try:
+            manager = model.client._endpoint.http_session._manager
+            pools = [
+                {
+                    "host": pool.host,
+                    "created": pool.num_connections,
+                    "requests": pool.num_requests,
+                    # キューは空き枠（None）で埋められているため、接続の数だけ数える
+                    "idle": sum(conn is not None for conn in list(pool.pool.queue)) if pool.pool is not None else 0,
+                }
+                for pool in (manager.pools[key] for key in manager.pools.keys())
+            ]
+        except (AttributeError, KeyError):
+            pools = None
+        stats[model_id] = {"backend": "bedrock", "pools": pools}
+    return stats
@@ -0,0 +1,390 @@
+# =============================================================================
+# pool.py - MAGIエージェントのウォームプール
+# =============================================================================
+#
+# このモジュールは、MAGIエージェント（MELCHIOR, BALTHASAR, CASPER）と
+# JudgeComponent のインスタンスをプロセス内で再利用するプールを提供します。
+#
+# 背景:
+#   各インスタンスは生成時に Strands Agent と BedrockModel を作るため、
+#   boto3クライアントの生成・TLSハンドシェイクが発生します。
+#   リクエストごとに作り直すと、その分がCPU時間と初回トークンまでの
+#   待ち時間に乗ってしまいます。
+#
+# 主要コンポーネント:
+# - AgentPool: 1種類のインスタンスを貸し出す汎用プール
+# - MAGIAgentPool: 3エージェント＋JUDGEのプールをまとめたもの
+# - get_agent_pool(): プロセス共有の MAGIAgentPool を取得
+#
+# 貸し出しの流れ:
+#   checkout() → 待機中のインスタンスを取り出す（なければ新規生成）
+#             → リクエストで使用
+#             → reset() で会話履歴を消去してプールへ返却
+#
+#   非同期のストリーミング処理からは acheckout() / acouncil() を使う。
+#   新規生成（Strands Agent・boto3 クライアントの作成）はワーカースレッドで行い、
+#   イベントループを止めない。
+#
+# 保持数の上限（max_size）:
+#   待機中の数と、prewarm() が生成中の数（予約分）の合計を、同じロックの中で
+#   確認・更新する。prewarm() が同時に呼ばれたり、返却と重なったりしても
+#   max_size を超えて保持しない。
+#
+# 健全性による破棄（返却せずに捨てる条件）:
+#   - 使用中に例外が発生した（通信エラー、キャンセルなど）
+#   - 使用回数が max_uses に達した
+#   - 生成から max_age 秒を超えた
+#
+# 設定（環境変数）:
+#   MAGI_POOL_SIZE: 1種類あたりの最大保持数（デフォルト: 4）
+#   MAGI_POOL_MAX_USES: 1インスタンスの最大使用回数（デフォルト: 200）
+#   MAGI_POOL_MAX_AGE: 1インスタンスの最大寿命・秒（デフォルト: 3600）
+#
+# =============================================================================
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager
+from typing import AsyncGenerator, Callable, Generator, Generic, TypeVar
+
+from agents.base import (
+    MAGIAgent,
+    MelchiorAgent,
+    BalthasarAgent,
+    CasperAgent,
+    JudgeComponent
+)
+
+
+T = TypeVar("T")
+
+
+class _PooledEntry(Generic[T]):
+    """プール内のインスタンスと、その使用状況"""
+
+    __slots__ = ("instance", "created_at", "uses")
+
+    def __init__(self, instance: T):
+        self.instance = instance
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+
+class AgentPool(Generic[T]):
+    """
+    インスタンスを貸し出す汎用プール
+
+    待機中のインスタンスがなければ factory() で新規生成します。
+    同時に max_size を超えて貸し出した分は、返却時に保持せず破棄します
+    （リクエストを待たせないため、上限到達時もブロックしません）。
+
+    スレッドセーフです（run_judge_mode_parallel() からも使用されます）。
+    イベントループ上では acheckout() を使うと、新規生成をスレッドで行います。
+
+    Attributes:
+        factory: インスタンスを生成する関数
+        max_size: 保持する待機インスタンスの上限
+        max_uses: 1インスタンスの最大使用回数
+        max_age: 1インスタンスの最大寿命（秒）
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], T],
+        max_size: int = 4,
+        max_uses: int = 200,
+        max_age: float = 3600.0
+    ):
+        self.factory = factory
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.max_age = max_age
+
+        self._idle: deque[_PooledEntry[T]] = deque()
+        self._lock = threading.Lock()
+        self._in_use = 0
+        # prewarm() が生成中の数（待機分として予約済み）
+        self._warming = 0
+
+        # 統計情報
+        self._created = 0
+        self._reused = 0
+        self._evicted = 0
+
+    def _is_expired(self, entry: _PooledEntry[T]) -> bool:
+        """使用回数・寿命の上限を超えたか"""
+        return (
+            entry.uses >= self.max_uses
+            or time.monotonic() - entry.created_at >= self.max_age
+        )
+
+    def _take_idle(self) -> _PooledEntry[T] | None:
+        """
+        待機中のインスタンスを取り出す
+
+        Returns:
+            _PooledEntry | None: 待機中のインスタンス（なければ新規生成分として数えて None）
+        """
+        with self._lock:
+            while self._idle:
+                entry = self._idle.pop()
+                if self._is_expired(entry):
+                    self._evicted += 1
+                    continue
+                self._in_use += 1
+                self._reused += 1
+                return entry
+            self._in_use += 1
+            self._created += 1
+            return None
+
+    def _create(self) -> _PooledEntry[T]:
+        """貸し出し用のインスタンスを新規生成（時間がかかるのでロックの外で呼ぶ）"""
+        try:
+            return _PooledEntry(self.factory())
+        except BaseException:
+            with self._lock:
+                self._in_use -= 1
+            raise
+
+    def _acquire(self) -> _PooledEntry[T]:
+        """待機中のインスタンスを取り出す（なければ新規生成）"""
+        return self._take_idle() or self._create()
+
+    async def _acquire_async(self) -> _PooledEntry[T]:
+        """待機中のインスタンスを取り出す（なければワーカースレッドで新規生成）"""
+        entry = self._take_idle()
+        if entry is not None:
+            return entry
+        creating = asyncio.ensure_future(asyncio.to_thread(self._create))
+        try:
+            return await asyncio.shield(creating)
+        except asyncio.CancelledError:
+            # 生成中のスレッドは止められないため、できあがったインスタンスはプールへ返す
+            creating.add_done_callback(self._release_created)
+            raise
+
+    def _release_created(self, creating: asyncio.Future) -> None:
+        """待ち手がキャンセルされた生成の結果を返却（生成失敗時は _create() が後始末済み）"""
+        if not creating.cancelled() and creating.exception() is None:
+            self._release(creating.result(), healthy=True)
+
+    def _release(self, entry: _PooledEntry[T], healthy: bool) -> None:
+        """インスタンスをリセットしてプールへ返却（不健全なら破棄）"""
+        entry.uses += 1
+        if healthy:
+            try:
+                entry.instance.reset()
+            except Exception:
+                healthy = False
+
+        with self._lock:
+            self._in_use -= 1
+            if healthy and not self._is_expired(entry) and len(self._idle) + self._warming < self.max_size:
+                self._idle.append(entry)
+            else:
+                self._evicted += 1
+
+    @contextmanager
+    def checkout(self) -> Generator[T, None, None]:
+        """
+        インスタンスを借りる
+
+        with ブロックを抜けると自動で返却されます。
+        ブロック内で例外（キャンセルを含む）が発生した場合は、
+        状態が不明なインスタンスを再利用しないよう破棄します。
+
+        Yields:
+            プールから取り出したインスタンス
+        """
+        entry = self._acquire()
+        healthy = False
+        try:
+            yield entry.instance
+            healthy = True
+        finally:
+            self._release(entry, healthy)
+
+    @asynccontextmanager
+    async def acheckout(self) -> AsyncGenerator[T, None]:
+        """
+        インスタンスを借りる（非同期版）
+
+        checkout() と同じですが、待機中のインスタンスがない場合の新規生成を
+        ワーカースレッドで行い、イベントループを止めません。
+
+        Yields:
+            プールから取り出したインスタンス
+        """
+        entry = await self._acquire_async()
+        healthy = False
+        try:
+            yield entry.instance
+            healthy = True
+        finally:
+            self._release(entry, healthy)
+
+    def prewarm(self, count: int | None = None) -> None:
+        """
+        インスタンスを事前生成して待機させる
+
+        同時に呼ばれても、待機中と生成中の合計が count（max_size）を超えないよう、
+        生成する分をロックの中で予約してから生成します。
+
+        Args:
+            count: 待機させる数（省略時は max_size まで）
+        """
+        target = self.max_size if count is None else min(count, self.max_size)
+        while True:
+            with self._lock:
+                if len(self._idle) + self._warming >= target:
+                    return
+                self._warming += 1
+                self._created += 1
+            try:
+                entry = _PooledEntry(self.factory())
+            except BaseException:
+                with self._lock:
+                    self._warming -= 1
+                raise
+            with self._lock:
+                self._warming -= 1
+                if len(self._idle) < self.max_size:
+                    self._idle.append(entry)
+                else:
+                    self._evicted += 1
+
+    def clear(self) -> None:
+        """待機中のインスタンスをすべて破棄"""
+        with self._lock:
+            self._evicted += len(self._idle)
+            self._idle.clear()
+
+    def stats(self) -> dict:
+        """
+        プールの統計情報
+
+        Returns:
+            dict: {"idle", "in_use", "created", "reused", "evicted", "max_size"}
+        """
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "created": self._created,
+                "reused": self._reused,
+                "evicted": self._evicted,
+                "max_size": self.max_size,
+            }
+
+
+class MAGIAgentPool:
+    """
+    3エージェント（MELCHIOR, BALTHASAR, CASPER）と JUDGE のプール
+
+    Attributes:
+        agent_pools: エージェントクラスごとのプール（MELCHIOR → BALTHASAR → CASPER の順）
+        judge_pool: JudgeComponent のプール
+    """
+
+    AGENT_CLASSES: tuple[type[MAGIAgent], ...] = (MelchiorAgent, BalthasarAgent, CasperAgent)
+
+    def __init__(self, max_size: int = 4, max_uses: int = 200, max_age: float = 3600.0):
+        self.agent_pools: list[AgentPool[MAGIAgent]] = [
+            AgentPool(cls, max_size=max_size, max_uses=max_uses, max_age=max_age)
+            for cls in self.AGENT_CLASSES
+        ]
+        self.judge_pool: AgentPool[JudgeComponent] = AgentPool(
+            JudgeComponent, max_size=max_size, max_uses=max_uses, max_age=max_age
+        )
+
+    @contextmanager
+    def council(self) -> Generator[tuple[list[MAGIAgent], JudgeComponent], None, None]:
+        """
+        3エージェント＋JUDGE をまとめて借りる
+
+        使用例:
+            with get_agent_pool().council() as (agents, judge):
+                ...
+
+        Yields:
+            tuple: ([MELCHIOR, BALTHASAR, CASPER], JudgeComponent)
+        """
+        with ExitStack() as stack:
+            agents = [stack.enter_context(pool.checkout()) for pool in self.agent_pools]
+            judge = stack.enter_context(self.judge_pool.checkout())
+            yield agents, judge
+
+    @asynccontextmanager
+    async def acouncil(self) -> AsyncGenerator[tuple[list[MAGIAgent], JudgeComponent], None]:
+        """
+        3エージェント＋JUDGE をまとめて借りる（非同期版）
+
+        新規生成が必要な場合はワーカースレッドで行います（AgentPool.acheckout()）。
+
+        使用例:
+            async with get_agent_pool().acouncil() as (agents, judge):
+                ...
+
+        Yields:
+            tuple: ([MELCHIOR, BALTHASAR, CASPER], JudgeComponent)
+        """
+        async with AsyncExitStack() as stack:
+            agents = [await stack.enter_async_context(pool.acheckout()) for pool in self.agent_pools]
+            judge = await stack.enter_async_context(self.judge_pool.acheckout())
+            yield agents, judge
+
+    def prewarm(self, count: int | None = None) -> None:
+        """全プールのインスタンスを事前生成"""
+        for pool in [*self.agent_pools, self.judge_pool]:
+            pool.prewarm(count)
+
+    def clear(self) -> None:
+        """全プールの待機インスタンスを破棄"""
+        for pool in [*self.agent_pools, self.judge_pool]:
+            pool.clear()
+
+    def stats(self) -> dict:
+        """
+        全プールの統計情報
+
+        Returns:
+            dict: {"MelchiorAgent": {...}, ..., "JudgeComponent": {...}}
+        """
+        stats = {
+            cls.__name__: pool.stats()
+            for cls, pool in zip(self.AGENT_CLASSES, self.agent_pools)
+        }
+        stats["JudgeComponent"] = self.judge_pool.stats()
+        return stats
+
+
+# =============================================================================
+# プロセス共有プール
+# =============================================================================
+
+_agent_pool: MAGIAgentPool | None = None
+_agent_pool_lock = threading.Lock()
+
+
+def get_agent_pool() -> MAGIAgentPool:
+    """
+    プロセス共有の MAGIAgentPool を取得
+
+    初回呼び出し時に環境変数の設定で生成します。
+
+    Returns:
+        MAGIAgentPool: 共有プール
+    """
+    global _agent_pool
+    with _agent_pool_lock:
+        if _agent_pool is None:
+            _agent_pool = MAGIAgentPool(
+                max_size=int(os.environ.get("MAGI_POOL_SIZE", "4")),
+                max_uses=int(os.environ.get("MAGI_POOL_MAX_USES", "200")),
+                max_age=float(os.environ.get("MAGI_POOL_MAX_AGE", "3600"))
+            )
+        return _agent_pool
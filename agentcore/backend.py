@@ -8,7 +8,11 @@
 #
 # 主要関数:
 # - run_judge_mode(): 同期版判定モード（Step 1）
+# - run_judge_mode_parallel(): 同期版判定モード（スレッドプール並列版）
 # - run_judge_mode_stream(): 非同期ストリーミング版判定モード（Step 2）
+# - run_chat_mode_stream(): 会話モード（ストリーミング版）
+# - run_batch_stream(): バッチモード（複数の問いかけを同時実行数の上限付きで実行）
+# - run_ping_stream(): pingモード（LLM を呼ばずに接続・エージェントプールを温める）
 # - main(): テスト実行用エントリーポイント
 #
 # 実行方法:
@@ -23,31 +27,108 @@
 # 1. MELCHIOR-1 の analyze() / analyze_stream() → 【LLM呼び出し 1回目】
 # 2. BALTHASAR-2 の analyze() / analyze_stream() → 【LLM呼び出し 2回目】
 # 3. CASPER-3 の analyze() / analyze_stream() → 【LLM呼び出し 3回目】
-# 4. JudgeComponent.integrate_with_analysis() → 【LLM呼び出し 4回目】
+# 4. JudgeComponent.integrate_with_analysis_stream() → 【LLM呼び出し 4回目】
 #    - 多数決で最終判定（承認/否決/保留）を決定
 #    - LLMで3エージェントの意見を統合分析（サマリー・論点・推奨事項）
 #
 # 合計: 4回のLLM呼び出し
 #
+# parallel=True の場合、1〜3 は同時に実行される（並列ファンアウト）。
+# 所要時間は「3エージェントの合計」ではなく「最も遅いエージェント」になる。
+#
 # =============================================================================
 
-from agents.base import (
-    MelchiorAgent,
-    BalthasarAgent,
-    CasperAgent,
-    JudgeComponent,
-    FinalVerdict,
-    AgentVerdict
-)
+from __future__ import annotations
 
 import asyncio
-from typing import AsyncGenerator
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncGenerator, AsyncIterator, Awaitable, Callable
+
+# エージェント（Strands）は起動を速くするため最初の利用時に読み込む（pipeline/startup.py を参照）
+# ここでは型注釈のためだけにインポートする
+if TYPE_CHECKING:
+    from agents.base import (
+        FinalVerdict,
+        AgentVerdict,
+        AgentResponse
+    )
+    from agents.pool import MAGIAgentPool
+
+from pipeline.cache import (
+    ResultCache,
+    get_result_cache,
+    make_cache_key,
+    make_cache_scope,
+    replay_cached_events
+)
+from pipeline.semantic_cache import SemanticResultCache, get_semantic_cache
+from pipeline.singleflight import SingleFlight, make_flight_key
+from pipeline.fanout import StreamMerger
+from pipeline.hedging import HedgeBudget
+from pipeline.deadline import RequestDeadline, stream_until
+from pipeline.coalesce import coalesce_thinking, get_coalesce_settings
+from pipeline.wire import encode_stream
+from pipeline.events import serialize_event, serialize_events
+from pipeline.metrics import attach_metrics
+from pipeline.telemetry import configure_telemetry_from_env, trace_request, traced_stream
+from pipeline.sessions import JUDGE_KEY, get_session_store
+from pipeline.disconnect import DisconnectMiddleware, current_disconnect_signal, until_disconnected
+from pipeline.startup import (
+    agents_ready,
+    ensure_agents_loaded,
+    keep_alive_stats,
+    load_agents,
+    mark_activity,
+    start_keep_alive,
+    start_warm_up,
+    startup_profile,
+    stop_keep_alive
+)
 
 # AgentCoreAppのインポート
-from bedrock_agentcore.runtime import BedrockAgentCoreApp
+with startup_profile.phase("import:runtime"):
+    from bedrock_agentcore.runtime import BedrockAgentCoreApp
+    from starlette.middleware import Middleware
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    """
+    サーバーの起動時: MAGI_WARMUP=on ならエージェントの読み込みを、
+    MAGI_KEEPALIVE_INTERVAL > 0 なら接続のキープアライブを別スレッドで始める
+    """
+    startup_profile.record("listen", 0.0)
+    start_warm_up()
+    start_keep_alive()
+    try:
+        yield
+    finally:
+        stop_keep_alive()
+
 
 # AgentCoreAppのインスタンス化
-app = BedrockAgentCoreApp()  
+# クライアントが切断したら実行中のパイプラインを止める（pipeline/disconnect.py を参照）
+app = BedrockAgentCoreApp(lifespan=_lifespan, middleware=[Middleware(DisconnectMiddleware)])
+
+# MAGI_OTEL_EXPORTER（console | memory）指定時のみ、ローカル用のエクスポーターを設定
+configure_telemetry_from_env()
+
+def get_agent_pool() -> MAGIAgentPool:
+    """
+    エージェントプールを取得（最初の呼び出しでエージェントを読み込む）
+
+    イベントループ上では、先に ensure_agents_loaded() を待ってから呼び出してください
+    （_dispatch() で行っています）。
+    """
+    load_agents()
+    from agents.pool import get_agent_pool as get_shared_agent_pool
+
+    return get_shared_agent_pool()
+
 
 # =============================================================================
 # Step 1: 同期版判定モード
@@ -61,7 +142,7 @@ def run_judge_mode(question: str) -> FinalVerdict:
     JudgeComponentで多数決により最終判定を出します。
 
     処理フロー:
-    1. 3エージェント作成（MELCHIOR, BALTHASAR, CASPER）
+    1. 3エージェントをプールから借りる（MELCHIOR, BALTHASAR, CASPER）
     2. 各エージェントで analyze() を実行
     3. 全員の判定を収集
     4. JUDGEで統合 → FinalVerdict
@@ -73,50 +154,735 @@ def run_judge_mode(question: str) -> FinalVerdict:
         FinalVerdict: 最終判定結果
     """
     # -------------------------------------------------------------------------
-    # 1. エージェント作成
+    # 1. エージェントをプールから借りる
     # -------------------------------------------------------------------------
-    # 各エージェントは固有のペルソナを持つ
-    melchior = MelchiorAgent()   # 科学者
-    balthasar = BalthasarAgent()  # 母親
-    casper = CasperAgent()        # 女性
+    # 各エージェントは固有のペルソナを持つ（MELCHIOR → BALTHASAR → CASPER の順）
+    # 生成済みのインスタンスを再利用し、with を抜けると会話履歴をリセットして返却
+    with get_agent_pool().council() as (agents, judge):
+        # ---------------------------------------------------------------------
+        # 2. 各エージェントで分析
+        # ---------------------------------------------------------------------
+        # リストにまとめてforループで処理
+        verdicts = []
+        for agent in agents:
+            # =================================================================
+            # 【LLM呼び出し】ここで agent.analyze() を実行
+            # =================================================================
+            # - 呼び出し先: agents/base.py の MAGIAgent.analyze()
+            # - 内部処理: self.agent.structured_output() で Bedrock Claude を呼び出し
+            # - 送信内容: question（ユーザーの問いかけ）+ システムプロンプト
+            # - 受信内容: AgentVerdict（判定結果の構造化データ）
+            verdict = agent.analyze(question)
+            verdicts.append(verdict)
+
+        # ---------------------------------------------------------------------
+        # 3. JUDGEで統合
+        # ---------------------------------------------------------------------
+        # ※ここではLLMを呼び出していない（多数決ロジックのみ）
+        # - 3エージェントの判定を集計
+        # - 賛成 > 反対 → 承認、賛成 < 反対 → 否決、同数 → 保留
+        final_verdict = judge.integrate(verdicts)
+
+        # ---------------------------------------------------------------------
+        # 4. 結果を返す
+        # ---------------------------------------------------------------------
+        return final_verdict
+
+
+# =============================================================================
+# Step 1.5: 同期版判定モード（スレッドプール並列版）
+# =============================================================================
+#
+# run_judge_mode() は analyze()（ブロッキング）を3回順番に呼ぶため、
+# 所要時間は3エージェントの合計になる。バッチスクリプトや非ストリーミング
+# 連携向けに、3つの structured_output() 呼び出しをスレッドプールで
+# 同時に発行する版を用意する。
+#
+# スレッドプールはプロセス内で共有し、呼び出しごとに作り直さない。
+# 同時実行数は環境変数 MAGI_JUDGE_MAX_WORKERS で設定できる。
+# =============================================================================
+
+# 共有スレッドプール（get_judge_executor() で遅延生成）
+_judge_executor: ThreadPoolExecutor | None = None
+_judge_executor_lock = threading.Lock()
+
+
+class AgentExecutionError(Exception):
+    """
+    1つ以上のエージェントの分析が失敗したことを表す例外
+
+    失敗したエージェントがあっても、他のエージェントの結果は失われません。
+    verdicts に成功分、errors に失敗分が格納されます。
+
+    Attributes:
+        verdicts: 成功したエージェントの判定（エージェント順）
+        errors: 失敗したエージェント名 → 例外
+    """
+
+    def __init__(self, verdicts: list[AgentVerdict], errors: dict[str, BaseException]):
+        self.verdicts = verdicts
+        self.errors = errors
+        failed = ", ".join(f"{name}: {error!r}" for name, error in errors.items())
+        super().__init__(f"{len(errors)}エージェントの分析に失敗しました（{failed}）")
+
+
+def get_judge_executor(max_workers: int | None = None) -> ThreadPoolExecutor:
+    """
+    run_judge_mode_parallel() で使う共有スレッドプールを取得
+
+    初回呼び出し時に生成し、以降は同じプールを再利用します。
+
+    Args:
+        max_workers: 最大スレッド数（初回生成時のみ有効）
+            省略時は環境変数 MAGI_JUDGE_MAX_WORKERS（デフォルト: 8）
+
+    Returns:
+        ThreadPoolExecutor: 共有スレッドプール
+    """
+    global _judge_executor
+    with _judge_executor_lock:
+        if _judge_executor is None:
+            if max_workers is None:
+                max_workers = int(os.environ.get("MAGI_JUDGE_MAX_WORKERS", "8"))
+            _judge_executor = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix="magi-judge"
+            )
+        return _judge_executor
+
+
+def run_judge_mode_parallel(question: str, executor: ThreadPoolExecutor | None = None) -> FinalVerdict:
+    """
+    同期判定モード（並列版）: 3エージェントを同時に実行 → JUDGE → 最終判定
+
+    run_judge_mode() と同じ結果を返しますが、3エージェントの analyze() を
+    スレッドプール上で同時に実行します。
+
+    - 判定の順序は到着順ではなくエージェント順（MELCHIOR → BALTHASAR → CASPER）
+    - 1エージェントが失敗しても残りの結果は待ってから AgentExecutionError を送出
+
+    Args:
+        question: 分析対象の問いかけ
+        executor: 使用するスレッドプール（省略時は get_judge_executor() の共有プール）
+
+    Returns:
+        FinalVerdict: 最終判定結果
+
+    Raises:
+        AgentExecutionError: 1つ以上のエージェントが失敗した場合
+    """
+    if executor is None:
+        executor = get_judge_executor()
+
+    with get_agent_pool().council() as (agents, judge):
+        # 【LLM呼び出し】3エージェントの analyze() を同時に発行
+        futures = [(agent.name, executor.submit(agent.analyze, question)) for agent in agents]
+
+        # エージェント順に結果を回収（全員の完了を待ってからエラーを判定）
+        verdicts: list[AgentVerdict] = []
+        errors: dict[str, BaseException] = {}
+        for name, future in futures:
+            try:
+                verdicts.append(future.result())
+            except Exception as e:
+                errors[name] = e
+
+        if errors:
+            raise AgentExecutionError(verdicts, errors)
+
+        # ※ここではLLMを呼び出していない（多数決ロジックのみ）
+        return judge.integrate(verdicts)
+
+
+# =============================================================================
+# エージェント実行ヘルパー（逐次 / 並列ファンアウト）
+# =============================================================================
+
+async def _stream_agents(
+    agents: list,
+    make_stream: Callable[[object], AsyncIterator[dict]],
+    parallel: bool = False,
+    deadline: RequestDeadline | None = None
+) -> AsyncGenerator[dict, None]:
+    """
+    3エージェントのストリームを実行し、イベントを1本にまとめて返す
+
+    逐次実行（parallel=False）:
+        agent_start → ... → agent_complete を1エージェントずつ繰り返す
+
+    並列実行（parallel=True）:
+        全エージェントの agent_start を先に送り、3つのストリームを同時に実行。
+        イベントは到着順に交互に届く（各イベントの "agent" で判別する）。
+        各エージェントの完了時に agent_complete を送る。
+
+    Args:
+        agents: 実行するエージェントのリスト
+        make_stream: エージェントからイベントストリームを作る関数
+            例: lambda agent: agent.analyze_stream(question)
+        parallel: True の場合は3エージェントを同時に実行
+        deadline: リクエストの期限（期限切れのエージェントは agent_timeout で打ち切る）
+
+    Yields:
+        dict: イベント辞書（agent_start / 各エージェントのイベント / agent_complete）
+    """
+    if not parallel:
+        for agent in agents:
+            yield {"type": "agent_start", "agent": agent.name}
+            async for event in _with_agent_deadline(agent.name, make_stream(agent), deadline):
+                yield event
+            yield {"type": "agent_complete", "agent": agent.name}
+        return
 
-    # -------------------------------------------------------------------------
-    # 2. 各エージェントで分析
-    # -------------------------------------------------------------------------
-    # リストにまとめてforループで処理
-    agents = [melchior, balthasar, casper]
-    verdicts = []
     for agent in agents:
-        # =================================================================
-        # 【LLM呼び出し】ここで agent.analyze() を実行
-        # =================================================================
-        # - 呼び出し先: agents/base.py の MAGIAgent.analyze()
-        # - 内部処理: self.agent.structured_output() で Bedrock Claude を呼び出し
-        # - 送信内容: question（ユーザーの問いかけ）+ システムプロンプト
-        # - 受信内容: AgentVerdict（判定結果の構造化データ）
-        verdict = agent.analyze(question)
-        verdicts.append(verdict)
+        yield {"type": "agent_start", "agent": agent.name}
 
-    # -------------------------------------------------------------------------
-    # 3. JUDGEで統合
-    # -------------------------------------------------------------------------
-    # ※ここではLLMを呼び出していない（多数決ロジックのみ）
-    # - 3エージェントの判定を集計
-    # - 賛成 > 反対 → 承認、賛成 < 反対 → 否決、同数 → 保留
-    judge = JudgeComponent()
-    final_verdict = judge.integrate(verdicts)
+    async with StreamMerger() as merger:
+        for agent in agents:
+            merger.add(agent.name, _with_agent_deadline(agent.name, make_stream(agent), deadline))
+
+        async for name, event in merger:
+            if event is None:
+                # このエージェントのストリームが終了
+                yield {"type": "agent_complete", "agent": name}
+            else:
+                yield event
+
+
+# =============================================================================
+# 期限（エージェント単位・リクエスト単位）
+# =============================================================================
+#
+# 1つのペルソナ呼び出しが応答しなくなってもリクエスト全体が止まらないよう、
+# 各エージェントと JUDGE に期限を設ける（pipeline/deadline.py を参照）。
+#
+# - エージェントが期限切れ → agent_timeout イベントを送り、そのエージェントを打ち切る。
+#   揃った判定だけで多数決を行い、最終判定を degraded（欠けあり）として返す
+# - JUDGE がリクエスト期限切れ → judge_timeout イベントを送り、
+#   LLMを使わない多数決（JudgeComponent.integrate()）で最終判定を返す
+# =============================================================================
+
+async def _with_agent_deadline(
+    name: str,
+    stream: AsyncIterator[dict],
+    deadline: RequestDeadline | None
+) -> AsyncGenerator[dict, None]:
+    """
+    エージェントのストリームに期限を適用
+
+    期限はこのジェネレータの開始時（＝エージェントの開始時）から数える。
+    期限を超えた場合は agent_timeout イベントを送って終了する。
+    """
+    if deadline is None:
+        async for event in stream:
+            yield event
+        return
+
+    when = deadline.agent_at()
+    try:
+        async for event in stream_until(stream, when):
+            yield event
+    except TimeoutError:
+        yield {"type": "agent_timeout", "agent": name, "elapsed": round(deadline.elapsed(), 3)}
+
+
+async def _judge_analysis(
+    question: str,
+    verdicts: list[AgentVerdict],
+    judge,
+    hedge: HedgeBudget | None = None,
+    deadline: RequestDeadline | None = None,
+    missing_agents: list[str] | None = None
+) -> AsyncGenerator[dict, None]:
+    """
+    JUDGEの統合分析（判定モード）をリクエスト期限つきで実行
+
+    期限を超えた場合は judge_timeout を送り、LLMを使わない多数決の結果を
+    degraded として返す。
+
+    Yields:
+        dict: judge_thinking / judge_timeout / final
+    """
+    stream = traced_stream(
+        "magi.judge.integrate",
+        judge.integrate_with_analysis_stream(question, verdicts, hedge=hedge, missing_agents=missing_agents),
+        **{"magi.agent": "JUDGE"}
+    )
+    try:
+        async for event in stream_until(stream, deadline.request_at if deadline else None):
+            yield event
+    except TimeoutError:
+        yield {"type": "judge_timeout", "elapsed": round(deadline.elapsed(), 3)}
+        final_verdict = judge.integrate(verdicts, missing_agents)
+        final_verdict.degraded = True
+        yield {"type": "final", "data": final_verdict}
+
+
+async def _judge_chat(
+    question: str,
+    responses: list[AgentResponse],
+    format: str,
+    judge,
+    hedge: HedgeBudget | None = None,
+    deadline: RequestDeadline | None = None,
+    missing_agents: list[str] | None = None
+) -> AsyncGenerator[dict, None]:
+    """
+    JUDGEの統合回答（会話モード）をリクエスト期限つきで実行
+
+    期限を超えた場合は judge_timeout を送り、各エージェントの回答を
+    並べたものを統合回答の代わりに返す。欠けがある場合は
+    chat_response の data に "degraded" / "missing_agents" を付与する。
+
+    Yields:
+        dict: judge_thinking / judge_timeout / chat_response
+    """
+    stream = traced_stream(
+        "magi.judge.chat",
+        judge.integrate_chat_stream(question, responses, format, hedge=hedge),
+        **{"magi.agent": "JUDGE"}
+    )
+    try:
+        async for event in stream_until(stream, deadline.request_at if deadline else None):
+            if event["type"] == "chat_response" and missing_agents:
+                # ChatResponse（LLMの出力形式）には degraded がないため、付け足した型に載せ替える
+                from agents.base import DegradedChatResponse
+
+                response = event["data"]
+                event = {
+                    **event,
+                    "data": DegradedChatResponse(
+                        response=response.response,
+                        format=response.format,
+                        missing_agents=missing_agents
+                    )
+                }
+            yield event
+    except TimeoutError:
+        yield {"type": "judge_timeout", "elapsed": round(deadline.elapsed(), 3)}
+        combined = "\n\n".join(f"【{r.agent_name}】\n{r.response}" for r in responses)
+        yield {
+            "type": "chat_response",
+            "data": {
+                "response": combined,
+                "format": format,
+                "degraded": True,
+                "missing_agents": missing_agents or [],
+            }
+        }
+
+
+# =============================================================================
+# クォーラム早期決定（判定モード）
+# =============================================================================
+#
+# 3エージェントの多数決は、2エージェントの判定が揃った時点で結果が確定する
+# ことが多い（2票が同じ側なら3票目で覆らない）。クォーラムモードでは:
+#
+# 1. 3エージェントを同時に実行
+# 2. 過半数が揃った時点で decision イベントを送信
+# 3. 同時に JUDGE の統合分析を開始（3票目を待たない）
+# 4. 残りのエージェントは方針に応じて処理
+#    - "continue": 記録のため最後まで実行（判定イベントも送信）。
+#      JUDGE の統合分析は並行して進めるが、final は残りのエージェントの
+#      判定が揃うまで送らず、agent_verdicts / vote_count に全員の判定を含める。
+#      残りのエージェントが期限切れ（agent_timeout）になった場合は、
+#      final を degraded にして missing_agents に含める
+#    - "cancel": まだ判定を返していないエージェントだけをキャンセルしてトークンを節約
+#      （final の agent_verdicts / vote_count は過半数の判定のみ）
+#
+# ユーザーは「2番目に速いエージェント」のレイテンシで decision を受け取れる。
+# JUDGE の統合分析（summary など）は、どちらの方針でも過半数確定時の判定で行う
+# （過半数は確定済みなので、最終判定の承認/否決は変わらない）。
+# =============================================================================
+
+# クォーラムモードの残りエージェントの扱い
+QUORUM_POLICIES = ("continue", "cancel")
+
+# StreamMerger 上の JUDGE ストリーム名
+_JUDGE_STREAM = "JUDGE"
+
+
+async def _stream_judge_quorum(
+    question: str,
+    agents: list,
+    judge,
+    policy: str = "continue",
+    hedge: HedgeBudget | None = None,
+    deadline: RequestDeadline | None = None
+) -> AsyncGenerator[dict, None]:
+    """
+    クォーラム早期決定つきの判定モード
+
+    Args:
+        question: 分析対象の問いかけ
+        agents: 3エージェント
+        judge: JudgeComponent
+        policy: 過半数確定後の残りエージェントの扱い（"continue" | "cancel"）
+        hedge: ヘッジ予算（run_judge_mode_stream() を参照）
+        deadline: リクエストの期限（run_judge_mode_stream() を参照）
+
+    Yields:
+        dict: イベント辞書（run_judge_mode_stream() のイベントに加えて）
+            - {"type": "decision", "verdict": "承認" | "否決", "vote_count": {...}}
+            - {"type": "agent_cancelled", "agent": "..."}: policy="cancel" で中断
+    """
+    if policy not in QUORUM_POLICIES:
+        raise ValueError(f"quorum_policy は {QUORUM_POLICIES} のいずれかです: {policy}")
+
+    verdicts: list[AgentVerdict] = []
+    timed_out: list[str] = []
+    decided: str | None = None
+    # 判定を返したエージェント・ストリームが終了したエージェント
+    voted: set[str] = set()
+    finished: set[str] = set()
+    # policy="continue" で、残りのエージェントの終了を待っている JUDGE の final
+    pending_final: dict | None = None
+
+    def complete(event: dict) -> dict:
+        """final に届いた全員の判定と、JUDGE の開始後に期限切れになったエージェントを含める"""
+        final = event["data"]
+        final.vote_count = judge.vote_count(verdicts)
+        final.agent_verdicts = list(verdicts)
+        if timed_out:
+            final.missing_agents = [
+                *final.missing_agents, *(name for name in timed_out if name not in final.missing_agents)
+            ]
+            final.degraded = True
+        return event
+
+    for agent in agents:
+        yield {"type": "agent_start", "agent": agent.name}
+
+    async with StreamMerger() as merger:
+        for agent in agents:
+            merger.add(
+                agent.name,
+                _with_agent_deadline(
+                    agent.name,
+                    traced_stream(
+                        "magi.agent.analyze", agent.analyze_stream(question, hedge=hedge), **{"magi.agent": agent.name}
+                    ),
+                    deadline
+                )
+            )
+
+        async for name, event in merger:
+            # -----------------------------------------------------------------
+            # JUDGE のイベント（過半数確定後に合流）
+            # -----------------------------------------------------------------
+            if name == _JUDGE_STREAM:
+                if event is None:
+                    continue
+                if event["type"] == "final":
+                    if len(finished) < len(agents):
+                        # policy="continue": 残りのエージェントの判定が揃ってから送る
+                        pending_final = event
+                        continue
+                    yield {"type": "judge_complete"}
+                    event = complete(event)
+                yield event
+                continue
+
+            # -----------------------------------------------------------------
+            # エージェントのイベント
+            # -----------------------------------------------------------------
+            if event is None:
+                finished.add(name)
+                if merger.is_cancelled(name):
+                    yield {"type": "agent_cancelled", "agent": name}
+                else:
+                    yield {"type": "agent_complete", "agent": name}
+                if pending_final is not None and len(finished) == len(agents):
+                    yield {"type": "judge_complete"}
+                    yield complete(pending_final)
+                    pending_final = None
+                continue
+
+            yield event
+
+            if event["type"] == "agent_timeout":
+                timed_out.append(name)
+                continue
+            if event["type"] != "verdict":
+                continue
+
+            verdicts.append(event["data"])
+            voted.add(name)
+            if decided is not None:
+                continue
+
+            # 過半数が揃ったか確認
+            decided = judge.majority_decision(verdicts, total=len(agents))
+            if decided is None:
+                continue
+
+            yield {
+                "type": "decision",
+                "verdict": decided,
+                "vote_count": judge.vote_count(verdicts),
+                "agents": [v.agent_name for v in verdicts]
+            }
+
+            if policy == "cancel":
+                # 判定を返したエージェントは metrics イベントまで最後まで流す
+                for agent in agents:
+                    if agent.name not in voted:
+                        merger.cancel(agent.name)
+
+            # 【LLM呼び出し④】確定した判定で JUDGE の統合分析を開始
+            yield {"type": "judge_start"}
+            merger.add(
+                _JUDGE_STREAM,
+                _judge_analysis(question, list(verdicts), judge, hedge, deadline, list(timed_out) or None)
+            )
 
     # -------------------------------------------------------------------------
-    # 4. 結果を返す
+    # 全員の判定が揃っても過半数が確定しなかった場合（判定が賛成/反対以外、期限切れなど）
     # -------------------------------------------------------------------------
-    return final_verdict
+    if decided is None:
+        yield {"type": "judge_start"}
+        async for event in _judge_analysis(question, verdicts, judge, hedge, deadline, timed_out or None):
+            if event["type"] == "final":
+                yield {"type": "judge_complete"}
+            yield event
+
+
+# =============================================================================
+# 結果キャッシュ
+# =============================================================================
+#
+# キャッシュ本体は pipeline/cache.py（完全一致）と
+# pipeline/semantic_cache.py（類似質問）を参照。
+# ここではキーの組み立てと、正常完了した結果だけを保存する処理を行う。
+# キャッシュの確認はエージェントをプールから借りる前に行い、
+# ヒットした場合はエージェントの貸し出し・生成を行わない。
+#
+# 検索順:
+#   1. 完全一致キャッシュ（正規化した問いかけが同じ）
+#   2. 類似質問キャッシュ（言い換え・語順の違いを吸収、MAGI_SEMANTIC_CACHE=on のとき）
+#   3. どちらにもなければパイプラインを実行し、正常完了したら両方に保存
+# =============================================================================
+
+# キャッシュに保存するイベント（エージェントの結果と最終結果）
+_RESULT_EVENT_TYPES = ("verdict", "response", "final", "chat_response")
+
+# 結果が欠けていることを表すイベント（1つでも届いたら保存しない）
+_INCOMPLETE_EVENT_TYPES = ("agent_timeout", "judge_timeout")
+
+
+# (モード, 回答形式) → 結果キャッシュの検索範囲
+# プロンプト・モデルIDはプロセス内で変わらないため、最初の1回だけ計算する
+_cache_scopes: dict[tuple[str, str | None], str] = {}
+
+
+async def _result_cache_scope(mode: str, format: str | None) -> str:
+    """
+    結果キャッシュの検索範囲を取得
+
+    ペルソナ・JUDGEのシステムプロンプトとモデルIDを含めるため、
+    プロンプトやモデルを変更すると古い結果は使われなくなります。
+    プロンプトを読むためにエージェントを借りるのは、(モード, 回答形式) ごとに
+    最初の1回だけです。
+    """
+    scope = _cache_scopes.get((mode, format))
+    if scope is not None:
+        return scope
+    async with get_agent_pool().acouncil() as (agents, judge):
+        if mode == "chat":
+            prompts = [agent._build_chat_prompt() for agent in agents]
+        else:
+            prompts = [agent._build_system_prompt() for agent in agents]
+        prompts.append(judge.SYSTEM_PROMPT)
+        model_ids = sorted({agent.model_id for agent in agents} | {judge.model_id})
+    scope = make_cache_scope(mode, format, prompts, ",".join(model_ids))
+    _cache_scopes[(mode, format)] = scope
+    return scope
+
+
+async def _lookup_results(
+    question: str,
+    scope: str,
+    cache: ResultCache | None,
+    semantic_cache: SemanticResultCache | None
+) -> list[dict] | None:
+    """
+    完全一致 → 類似質問の順にキャッシュを検索
+
+    Returns:
+        list[dict] | None: 再生するイベントリスト（なければ None）
+            - 類似質問キャッシュの結果には "similarity" と "matched_question" を付与
+    """
+    if cache is not None:
+        cached_events = await cache.aget(make_cache_key(question, scope))
+        if cached_events is not None:
+            return list(replay_cached_events(cached_events))
+    if semantic_cache is not None:
+        match = semantic_cache.get(question, scope)
+        if match is not None:
+            cached_events, similarity, matched_question = match
+            return list(replay_cached_events(
+                cached_events,
+                similarity=round(similarity, 3),
+                matched_question=matched_question
+            ))
+    return None
+
+
+def _save_results(
+    question: str,
+    scope: str,
+    cache: ResultCache | None,
+    semantic_cache: SemanticResultCache | None
+) -> Callable[[list[dict]], Awaitable[None]] | None:
+    """
+    結果を両方のキャッシュに保存する関数を返す（キャッシュが無効なら None）
+    """
+    if cache is None and semantic_cache is None:
+        return None
+
+    async def save(events: list[dict]) -> None:
+        if cache is not None:
+            await cache.aset(make_cache_key(question, scope), events)
+        if semantic_cache is not None:
+            semantic_cache.set(question, scope, events)
+
+    return save
+
+
+async def _store_results(
+    stream: AsyncIterator[dict],
+    save: Callable[[list[dict]], Awaitable[None]] | None,
+    expected_agents: int
+) -> AsyncGenerator[dict, None]:
+    """
+    イベントをそのまま転送しつつ、結果イベントを記録してキャッシュに保存
+
+    全エージェントの結果と最終結果が揃って正常に完了した場合のみ保存します。
+    途中でキャンセル・例外になった場合や、一部のエージェントが欠けた場合
+    （クォーラムの cancel 方針など）は保存しません。
+    エージェント・JUDGE の期限切れ（agent_timeout / judge_timeout）があった場合や、
+    最終結果が degraded の場合も、縮退した結果を TTL の間再生し続けないよう保存しません。
+    """
+    recorded: list[dict] = []
+    incomplete = False
+    async for event in stream:
+        if event["type"] in _INCOMPLETE_EVENT_TYPES:
+            incomplete = True
+        if save is not None and event["type"] in _RESULT_EVENT_TYPES:
+            # data は Pydantic モデルのまま記録して下流に流し、
+            # 保存すると決まってから辞書にする（キャッシュ側が保存時にコピーする）
+            recorded.append(event)
+        yield event
+
+    if save is None or incomplete:
+        return
+    agent_results = [event for event in recorded if "agent" in event]
+    if len(agent_results) != expected_agents or len(recorded) != expected_agents + 1:
+        return
+    recorded = [serialize_event(event) for event in recorded]
+    result = recorded[-1].get("data") or {}
+    if result.get("degraded") or result.get("missing_agents"):
+        return
+    await save(recorded)
 
 
 # =============================================================================
 # Step 2: 非同期ストリーミング版判定モード
 # =============================================================================
 
-async def run_judge_mode_stream(question: str) -> AsyncGenerator[dict, None]:
+async def _stream_judge(
+    question: str,
+    agents: list,
+    judge,
+    parallel: bool = False,
+    hedge: HedgeBudget | None = None,
+    deadline: RequestDeadline | None = None
+) -> AsyncGenerator[dict, None]:
+    """
+    判定モードの本体: 3エージェントの分析 → JUDGEの統合分析
+
+    Args:
+        question: 分析対象の問いかけ
+        agents: 3エージェント
+        judge: JudgeComponent
+        parallel: True の場合は3エージェントを同時に実行
+        hedge: ヘッジ予算（run_judge_mode_stream() を参照）
+        deadline: リクエストの期限（run_judge_mode_stream() を参照）
+
+    Yields:
+        dict: イベント辞書（run_judge_mode_stream() を参照）
+    """
+    # -------------------------------------------------------------------------
+    # 1. 判定結果を収集するリスト
+    # -------------------------------------------------------------------------
+    # 各エージェントの verdict イベントから AgentVerdict を収集
+    verdicts: list[AgentVerdict] = []
+    # 期限切れで判定が欠けたエージェント
+    timed_out: list[str] = []
+
+    # -------------------------------------------------------------------------
+    # 2. 各エージェントで分析（ストリーミング）
+    # -------------------------------------------------------------------------
+    # =================================================================
+    # 【LLM呼び出し】ここで agent.analyze_stream() を実行
+    # =================================================================
+    # - 呼び出し先: agents/base.py の MAGIAgent.analyze_stream()
+    # - 内部処理: self.agent.stream_async() で Bedrock Claude を呼び出し
+    # - 送信内容: question（ユーザーの問いかけ）+ システムプロンプト
+    # - 受信内容: イベントのストリーム（thinking → verdict）
+    # - 注意: question を analyze_stream に渡す（ハードコードではなく）
+    # - parallel=True の場合は3エージェント分を同時に実行
+    async for event in _stream_agents(
+        agents,
+        lambda agent: traced_stream(
+            "magi.agent.analyze", agent.analyze_stream(question, hedge=hedge), **{"magi.agent": agent.name}
+        ),
+        parallel=parallel,
+        deadline=deadline
+    ):
+        # ---------------------------------------------------------------------
+        # イベントをそのまま転送（UIで表示するため）
+        # ---------------------------------------------------------------------
+        yield event
+
+        # ---------------------------------------------------------------------
+        # verdict イベントから判定を収集（到着順）
+        # ---------------------------------------------------------------------
+        # analyze_stream() からは {"type": "verdict", "data": AgentVerdict} が来る
+        # （辞書への変換は _dispatch の出口で1回だけ行うため、そのまま使える）
+        if event["type"] == "verdict":
+            verdicts.append(event["data"])
+        elif event["type"] == "agent_timeout":
+            timed_out.append(event["agent"])
+
+    # -------------------------------------------------------------------------
+    # 3. JUDGEで統合（LLMによる統合分析を含む）
+    # -------------------------------------------------------------------------
+    # - 3エージェントの判定を集計（多数決）
+    # - LLMを使って統合的な分析サマリーを生成
+    # - 【LLM呼び出し④】JUDGEが統合分析を実行
+    yield {"type": "judge_start"}
+
+    # stream_async() を使う非同期版（イベントループをブロックしない）
+    # - judge_thinking: JUDGEの思考プロセス（リアルタイム）
+    # - final: 最終判定（FinalVerdict）
+    # - 期限切れのエージェントがあれば、揃った判定だけで集計（degraded）
+    async for event in _judge_analysis(question, verdicts, judge, hedge, deadline, timed_out or None):
+        if event["type"] == "final":
+            yield {"type": "judge_complete"}
+        yield event
+
+
+async def run_judge_mode_stream(
+    question: str,
+    parallel: bool = False,
+    quorum: bool = False,
+    quorum_policy: str = "continue",
+    use_cache: bool = True,
+    hedge: bool = False,
+    agent_timeout: float | None = None,
+    request_timeout: float | None = None
+) -> AsyncGenerator[dict, None]:
     """
     非同期判定モード: 3エージェント → JUDGE → 最終判定（ストリーミング版）
 
@@ -124,13 +890,14 @@ async def run_judge_mode_stream(question: str) -> AsyncGenerator[dict, None]:
     最終的にJUDGEで判定を統合します。
 
     処理フロー:
-    1. 3エージェント作成
-    2. 各エージェントで analyze_stream() を実行
+    1. 結果キャッシュを確認（ヒットすればエージェントを借りずに再生）
+    2. 3エージェントをプールから借りる
+    3. 各エージェントで analyze_stream() を実行（parallel=True なら同時実行）
        - 思考プロセスをリアルタイムでyield
-       - 判定結果をverdictsリストに収集
-    3. 全員完了後に JUDGE で統合
+       - 判定結果を到着順にverdictsリストに収集
+    4. 全員完了後に JUDGE で統合
 
-    イベントフロー:
+    イベントフロー（逐次）:
     ┌─────────────────────────────────────────────────────────────┐
     │ agent_start → thinking... → verdict → agent_complete       │
     │ agent_start → thinking... → verdict → agent_complete       │
@@ -138,83 +905,89 @@ async def run_judge_mode_stream(question: str) -> AsyncGenerator[dict, None]:
     │ final                                                       │
     └─────────────────────────────────────────────────────────────┘
 
+    イベントフロー（並列）:
+    ┌─────────────────────────────────────────────────────────────┐
+    │ agent_start ×3                                              │
+    │ thinking（3エージェント分が交互に到着）... verdict ×3      │
+    │ agent_complete（完了した順）                                │
+    │ final                                                       │
+    └─────────────────────────────────────────────────────────────┘
+
+    クォーラムモード（quorum=True）:
+        3エージェントを同時に実行し、過半数が揃った時点で decision イベントを
+        送信して JUDGE を開始します（_stream_judge_quorum() を参照）。
+
+    結果キャッシュ（MAGI_CACHE_BACKEND が memory / sqlite の場合）:
+        同じ問いかけの結果がキャッシュにあれば、LLMを呼ばずに verdict / final
+        イベントを即座に再生します（"cached": true 付き）。
+        MAGI_SEMANTIC_CACHE=on の場合は、言い換えられた類似の問いかけの結果も
+        再生します（"similarity" / "matched_question" 付き）。
+
     Args:
         question: 分析対象の問いかけ
+        parallel: True の場合は3エージェントを同時に実行（並列ファンアウト）
+        quorum: True の場合はクォーラム早期決定（parallel の指定に関係なく同時実行）
+        quorum_policy: 過半数確定後の残りエージェントの扱い（"continue" | "cancel"）
+        use_cache: False の場合は結果キャッシュ・類似質問キャッシュを使わない（読み書きとも）
+        hedge: True の場合は最初のトークンが遅い呼び出しをヘッジ（重複発行）する。
+            ヘッジ数はリクエストごとに MAGI_HEDGE_BUDGET（デフォルト 1）まで
+        agent_timeout: エージェント1つあたりの期限・秒（None なら MAGI_AGENT_TIMEOUT、0 で無効）
+        request_timeout: リクエスト全体の期限・秒（None なら MAGI_REQUEST_TIMEOUT、0 で無効）
 
     Yields:
         dict: イベント辞書
             - {"type": "agent_start", "agent": "MELCHIOR-1"}: エージェント開始
-            - {"type": "thinking", "content": "..."}: 思考プロセス（リアルタイム）
-            - {"type": "verdict", "data": {...}}: エージェント判定
+            - {"type": "thinking", "agent": "...", "content": "..."}: 思考プロセス（リアルタイム）
+            - {"type": "verdict", "agent": "...", "data": {...}}: エージェント判定
             - {"type": "agent_complete", "agent": "..."}: エージェント完了
+            - {"type": "judge_start"}: JUDGE統合開始
+            - {"type": "judge_thinking", "content": "..."}: JUDGEの思考プロセス
+            - {"type": "judge_complete"}: JUDGE統合完了
             - {"type": "final", "data": {...}}: 最終判定
+            - {"type": "agent_timeout", "agent": "...", "elapsed": 秒}: エージェントの期限切れ
+              （揃った判定だけで集計し、final の data.degraded が true になる）
+            - {"type": "judge_timeout", "elapsed": 秒}: JUDGEの期限切れ（多数決のみで final を返す）
+            data は AgentVerdict / FinalVerdict のまま（キャッシュから再生した場合は辞書）。
+            辞書への変換は pipeline/events.py の serialize_event() で行う
     """
-    # -------------------------------------------------------------------------
-    # 1. エージェント作成
-    # -------------------------------------------------------------------------
-    melchior = MelchiorAgent()
-    balthasar = BalthasarAgent()
-    casper = CasperAgent()
-    agents = [melchior, balthasar, casper]
+    # リクエストの期限はここから数える
+    deadline = RequestDeadline.from_env(agent_timeout, request_timeout)
 
     # -------------------------------------------------------------------------
-    # 2. 判定結果を収集するリスト
+    # 1. 結果キャッシュの確認（エージェントを借りる前に行う）
     # -------------------------------------------------------------------------
-    # 各エージェントの verdict イベントから AgentVerdict を収集
-    verdicts: list[AgentVerdict] = []
+    # 同じ問いかけの結果があれば、LLMを呼ばずに保存済みのイベントを再生
+    cache = get_result_cache() if use_cache else None
+    semantic_cache = get_semantic_cache() if use_cache else None
+    save = None
+    if cache is not None or semantic_cache is not None:
+        scope = await _result_cache_scope("judge", None)
+        cached_events = await _lookup_results(question, scope, cache, semantic_cache)
+        if cached_events is not None:
+            for event in cached_events:
+                yield event
+            return
+        save = _save_results(question, scope, cache, semantic_cache)
 
     # -------------------------------------------------------------------------
-    # 3. 各エージェントで分析（ストリーミング）
+    # 2. エージェントをプールから借りる
     # -------------------------------------------------------------------------
-    for agent in agents:
-        # エージェント開始イベント
-        yield {"type": "agent_start", "agent": agent.name}
-
-        # =================================================================
-        # 【LLM呼び出し】ここで agent.analyze_stream() を実行
-        # =================================================================
-        # - 呼び出し先: agents/base.py の MAGIAgent.analyze_stream()
-        # - 内部処理: self.agent.stream_async() で Bedrock Claude を呼び出し
-        # - 送信内容: question（ユーザーの問いかけ）+ システムプロンプト
-        # - 受信内容: イベントのストリーム（thinking → verdict）
-        # - 注意: question を analyze_stream に渡す（ハードコードではなく）
-        async for event in agent.analyze_stream(question):
-            # -----------------------------------------------------------------
-            # イベントをそのまま転送（UIで表示するため）
-            # -----------------------------------------------------------------
+    # 各エージェントは固有のペルソナを持つ（MELCHIOR → BALTHASAR → CASPER の順）
+    # 生成済みのインスタンスを再利用し、with を抜けると会話履歴をリセットして返却
+    async with get_agent_pool().acouncil() as (agents, judge):
+        # ---------------------------------------------------------------------
+        # 3. 3エージェントの分析 → JUDGEの統合分析
+        # ---------------------------------------------------------------------
+        # ヘッジ予算はこのリクエストの全エージェント・JUDGEで共有
+        budget = HedgeBudget.from_env() if hedge else None
+        if quorum:
+            stream = _stream_judge_quorum(question, agents, judge, quorum_policy, hedge=budget, deadline=deadline)
+        else:
+            stream = _stream_judge(question, agents, judge, parallel, hedge=budget, deadline=deadline)
+
+        async for event in _store_results(stream, save, len(agents)):
             yield event
 
-            # -----------------------------------------------------------------
-            # verdict イベントから判定を収集
-            # -----------------------------------------------------------------
-            # analyze_stream() からは {"type": "verdict", "data": {...}} が来る
-            # data は AgentVerdict.model_dump() の結果（辞書）
-            if event["type"] == "verdict":
-                # 辞書から AgentVerdict を再構築
-                verdict_data = event["data"]
-                verdict = AgentVerdict(**verdict_data)
-                verdicts.append(verdict)
-
-        # エージェント完了イベント
-        yield {"type": "agent_complete", "agent": agent.name}
-
-    # -------------------------------------------------------------------------
-    # 4. JUDGEで統合（LLMによる統合分析を含む）
-    # -------------------------------------------------------------------------
-    # - 3エージェントの判定を集計（多数決）
-    # - LLMを使って統合的な分析サマリーを生成
-    # - 【LLM呼び出し④】JUDGEが統合分析を実行
-    yield {"type": "judge_start"}
-
-    judge = JudgeComponent()
-    final_verdict = judge.integrate_with_analysis(question, verdicts)
-
-    yield {"type": "judge_complete"}
-
-    # 最終判定イベント
-    # model_dump(): Pydanticモデルを辞書に変換（JSON化可能）
-    yield {"type": "final", "data": final_verdict.model_dump()}
-
 
 # =============================================================================
 # テスト実行用エントリーポイント
@@ -235,7 +1008,7 @@ async def main():
     """
     # run_judge_mode_stream() は AsyncGenerator を返す
     # async for でイベントを順次取得
-    async for event in run_judge_mode_stream("AIを業務に導入すべきか？"):
+    async for event in serialize_events(run_judge_mode_stream("AIを業務に導入すべきか？")):
         # ---------------------------------------------------------------------
         # イベントタイプ別に表示
         # ---------------------------------------------------------------------
@@ -264,127 +1037,598 @@ async def main():
 # 会話モード（ストリーミング版）
 # =============================================================================
 
-async def run_chat_mode_stream(question: str, format: str = "explicit") -> AsyncGenerator[dict, None]:
+async def _stream_chat(
+    question: str,
+    format: str,
+    agents: list,
+    judge,
+    parallel: bool = False,
+    hedge: HedgeBudget | None = None,
+    deadline: RequestDeadline | None = None
+) -> AsyncGenerator[dict, None]:
+    """
+    会話モードの本体: 3エージェントの回答 → JUDGEの統合回答
+
+    Args:
+        question: ユーザーからの質問
+        format: 回答形式（"explicit" または "natural"）
+        agents: 3エージェント
+        judge: JudgeComponent
+        parallel: True の場合は3エージェントを同時に実行
+        hedge: ヘッジ予算（run_judge_mode_stream() を参照）
+        deadline: リクエストの期限（run_judge_mode_stream() を参照）
+
+    Yields:
+        dict: イベント辞書（run_chat_mode_stream() を参照）
+    """
+    # -------------------------------------------------------------------------
+    # 1. 各エージェントの回答を収集
+    # -------------------------------------------------------------------------
+    # responses リストの構成:
+    # [
+    #   AgentResponse(agent_name="MELCHIOR-1", response="科学的観点からは..."),
+    #   AgentResponse(agent_name="BALTHASAR-2", response="保護者の観点からは..."),
+    #   AgentResponse(agent_name="CASPER-3", response="人間的な観点からは...")
+    # ]
+    # → JUDGEの integrate_chat() に渡して統合回答を生成
+    responses: list[AgentResponse] = []
+    timed_out: list[str] = []
+
+    # 【LLM呼び出し】agent.respond_stream() を実行
+    async for event in _stream_agents(
+        agents,
+        lambda agent: traced_stream(
+            "magi.agent.respond", agent.respond_stream(question, hedge=hedge), **{"magi.agent": agent.name}
+        ),
+        parallel=parallel,
+        deadline=deadline
+    ):
+        yield event
+
+        # response イベントから回答を収集（data は AgentResponse）
+        if event["type"] == "response":
+            responses.append(event["data"])
+        elif event["type"] == "agent_timeout":
+            timed_out.append(event["agent"])
+
+    # -------------------------------------------------------------------------
+    # 2. JUDGEで統合
+    # -------------------------------------------------------------------------
+    yield {"type": "judge_start"}
+
+    # stream_async() を使う非同期版（イベントループをブロックしない）
+    # - judge_thinking: JUDGEの思考プロセス（リアルタイム）
+    # - chat_response: 統合回答（ChatResponse）
+    async for event in _judge_chat(question, responses, format, judge, hedge, deadline, timed_out or None):
+        if event["type"] == "chat_response":
+            yield {"type": "judge_complete"}
+        yield event
+
+
+async def _stream_chat_session(
+    question: str,
+    format: str,
+    session_id: str,
+    parallel: bool = False,
+    hedge: HedgeBudget | None = None,
+    deadline: RequestDeadline | None = None
+) -> AsyncGenerator[dict, None]:
+    """
+    セッションの会話履歴を引き継いで会話モードを実行
+
+    各ペルソナ（chat_agent）と JUDGE に前回までの履歴を戻してから実行し、
+    正常に完了したら履歴をセッションに保存します（pipeline/sessions.py を参照）。
+    期限切れで回答できなかったエージェント・JUDGE は、途中までの履歴で
+    上書きせず前回までの履歴を残します。
+
+    Yields:
+        dict: {"type": "session", "session_id": str, "turns": int} の後、
+            _stream_chat() のイベント
+    """
+    store = get_session_store()
+    async with store.lock(session_id):
+        async with get_agent_pool().acouncil() as (agents, judge):
+            conversations = await store.aget(session_id) or {}
+            for agent in agents:
+                agent.import_chat_history(conversations.get(agent.name))
+            judge.import_history(conversations.get(JUDGE_KEY))
+
+            turns = sum(
+                1 for message in conversations.get(JUDGE_KEY, [])
+                if message.get("role") == "user"
+                and not any("toolResult" in block for block in message.get("content", []))
+            )
+            yield {"type": "session", "session_id": session_id, "turns": turns}
+
+            answered: set[str] = set()
+            judge_answered = True
+            async for event in _stream_chat(question, format, agents, judge, parallel, hedge, deadline):
+                yield event
+                if event["type"] == "response":
+                    answered.add(event["agent"])
+                elif event["type"] == "judge_timeout":
+                    judge_answered = False
+
+            # 正常に完了した場合のみ保存（キャンセル・例外時は前回までの履歴のまま）
+            updated = dict(conversations)
+            for agent in agents:
+                if agent.name in answered:
+                    updated[agent.name] = agent.export_chat_history()
+            if judge_answered:
+                updated[JUDGE_KEY] = judge.export_history()
+            await store.aput(session_id, updated)
+
+
+async def run_chat_mode_stream(
+    question: str,
+    format: str = "explicit",
+    parallel: bool = False,
+    use_cache: bool = True,
+    hedge: bool = False,
+    agent_timeout: float | None = None,
+    request_timeout: float | None = None,
+    session_id: str | None = None
+) -> AsyncGenerator[dict, None]:
     """
     会話モード: 3エージェントが各視点から回答 → JUDGEが統合（ストリーミング版）
 
     処理フロー:
-    1. 3エージェント作成
-    2. 各エージェントで respond_stream() を実行（内部で回答を収集）
-    3. JUDGEが3つの回答を統合
+    1. 結果キャッシュを確認（ヒットすればエージェントを借りずに再生）
+    2. 3エージェントをプールから借りる
+    3. 各エージェントで respond_stream() を実行（内部で回答を収集）
+    4. JUDGEが3つの回答を統合
 
     イベントフロー:
     ┌─────────────────────────────────────────────────────────────┐
     │ agent_start → thinking... → response → agent_complete      │
     │ agent_start → thinking... → response → agent_complete      │
     │ agent_start → thinking... → response → agent_complete      │
-    │ judge_start → judge_complete → chat_response               │
+    │ judge_start → judge_thinking... → judge_complete           │
+    │ chat_response                                               │
     └─────────────────────────────────────────────────────────────┘
 
     Args:
         question: ユーザーからの質問
         format: 回答形式（"explicit" または "natural"）
+        parallel: True の場合は3エージェントを同時に実行（並列ファンアウト）
+        use_cache: False の場合は結果キャッシュ・類似質問キャッシュを使わない（読み書きとも）
+        hedge: True の場合は最初のトークンが遅い呼び出しをヘッジ（重複発行）する。
+            ヘッジ数はリクエストごとに MAGI_HEDGE_BUDGET（デフォルト 1）まで
+        agent_timeout: エージェント1つあたりの期限・秒（None なら MAGI_AGENT_TIMEOUT、0 で無効）
+        request_timeout: リクエスト全体の期限・秒（None なら MAGI_REQUEST_TIMEOUT、0 で無効）
+        session_id: 指定した場合は、同じ session_id の前回までの会話履歴を
+            引き継いで回答し、今回のやり取りを履歴に追加する（結果キャッシュは使わない）
 
     Yields:
         dict: イベント辞書
+            - {"type": "session", "session_id": "...", "turns": n}: session_id 指定時のみ（n は前回までのターン数）
             - {"type": "agent_start", "agent": "MELCHIOR-1"}
-            - {"type": "thinking", "content": "..."}
-            - {"type": "response", "data": {...}}
+            - {"type": "thinking", "agent": "...", "content": "..."}
+            - {"type": "response", "agent": "...", "data": {...}}
             - {"type": "agent_complete", "agent": "..."}
             - {"type": "judge_start"}
+            - {"type": "judge_thinking", "content": "..."}
             - {"type": "judge_complete"}
             - {"type": "chat_response", "data": {...}}
+            - {"type": "agent_timeout" | "judge_timeout", ...}: 期限切れ（run_judge_mode_stream() を参照）
+            data は AgentResponse / ChatResponse のまま（run_judge_mode_stream() を参照）
     """
-    from agents.base import AgentResponse
-    
+    # リクエストの期限はここから数える
+    deadline = RequestDeadline.from_env(agent_timeout, request_timeout)
+
+    # セッション指定時: 回答が履歴に依存するため、結果キャッシュを使わずに実行
+    if session_id is not None:
+        budget = HedgeBudget.from_env() if hedge else None
+        async for event in _stream_chat_session(question, format, session_id, parallel, budget, deadline):
+            yield event
+        return
+
     # -------------------------------------------------------------------------
-    # 1. エージェント作成
+    # 1. 結果キャッシュの確認（エージェントを借りる前に行う）
     # -------------------------------------------------------------------------
-    melchior = MelchiorAgent()
-    balthasar = BalthasarAgent()
-    casper = CasperAgent()
-    agents = [melchior, balthasar, casper]
+    cache = get_result_cache() if use_cache else None
+    semantic_cache = get_semantic_cache() if use_cache else None
+    save = None
+    if cache is not None or semantic_cache is not None:
+        scope = await _result_cache_scope("chat", format)
+        cached_events = await _lookup_results(question, scope, cache, semantic_cache)
+        if cached_events is not None:
+            for event in cached_events:
+                yield event
+            return
+        save = _save_results(question, scope, cache, semantic_cache)
 
     # -------------------------------------------------------------------------
-    # 2. 各エージェントの回答を収集
+    # 2. エージェントをプールから借りる
     # -------------------------------------------------------------------------
-    # responses リストの構成:
-    # [
-    #   AgentResponse(agent_name="MELCHIOR-1", response="科学的観点からは..."),
-    #   AgentResponse(agent_name="BALTHASAR-2", response="保護者の観点からは..."),
-    #   AgentResponse(agent_name="CASPER-3", response="人間的な観点からは...")
-    # ]
-    # → JUDGEの integrate_chat() に渡して統合回答を生成
-    responses: list[AgentResponse] = []
+    # 各エージェントは固有のペルソナを持つ（MELCHIOR → BALTHASAR → CASPER の順）
+    # 生成済みのインスタンスを再利用し、with を抜けると会話履歴をリセットして返却
+    async with get_agent_pool().acouncil() as (agents, judge):
+        # ---------------------------------------------------------------------
+        # 3. 3エージェントの回答 → JUDGEの統合回答
+        # ---------------------------------------------------------------------
+        budget = HedgeBudget.from_env() if hedge else None
+        stream = _stream_chat(question, format, agents, judge, parallel, hedge=budget, deadline=deadline)
+        async for event in _store_results(stream, save, len(agents)):
+            yield event
 
-    for agent in agents:
-        # エージェント開始イベント
-        yield {"type": "agent_start", "agent": agent.name}
 
-        # 【LLM呼び出し】agent.respond_stream() を実行
-        async for event in agent.respond_stream(question):
-            yield event
+# =============================================================================
+# バッチモード
+# =============================================================================
+#
+# 夜間処理などで数千件の問いかけをまとめて判定する場合、1件ずつ invoke を
+# 呼ぶと呼び出しごとのオーバーヘッドがかかる。バッチモードでは
+# "questions": [...] を1回の invoke で受け取り、同時実行数の上限付きで
+# パイプラインを実行する。
+#
+# イベントの流れ:
+#   batch_start → (各問いかけの結果イベント + "index") ... → batch_complete
+#   1件終わるごとに batch_progress（進捗・スループット）を送信する。
+#   失敗した問いかけは batch_error を送信し、バッチは中断しない。
+#
+# 設定（環境変数）:
+#   MAGI_BATCH_CONCURRENCY: 同時実行数のデフォルト（デフォルト: 4）
+# =============================================================================
 
-            # response イベントから回答を収集
-            if event["type"] == "response":
-                response_data = event["data"]
-                response = AgentResponse(**response_data)
-                responses.append(response)
+# 各問いかけの完了を表すイベント
+_BATCH_DONE_TYPES = ("final", "chat_response")
 
-        # エージェント完了イベント
-        yield {"type": "agent_complete", "agent": agent.name}
 
-    # -------------------------------------------------------------------------
-    # 3. JUDGEで統合
-    # -------------------------------------------------------------------------
-    yield {"type": "judge_start"}
+async def _batch_item(
+    index: int,
+    question: str,
+    run: Callable[[str], AsyncIterator[dict]],
+    stream_all: bool
+) -> AsyncGenerator[dict, None]:
+    """
+    1件分のパイプラインを実行し、イベントに "index" を付けて返す
 
-    judge = JudgeComponent()
-    chat_response = judge.integrate_chat(question, responses, format)
+    例外は batch_error イベントに変換する（他の問いかけを巻き込まない）。
+    """
+    try:
+        async for event in run(question):
+            if stream_all or event["type"] in _RESULT_EVENT_TYPES:
+                yield {**event, "index": index}
+    except Exception as e:
+        yield {
+            "type": "batch_error",
+            "index": index,
+            "question": question,
+            "error": f"{type(e).__name__}: {e}"
+        }
 
-    yield {"type": "judge_complete"}
 
-    # 統合回答イベント
-    yield {"type": "chat_response", "data": chat_response.model_dump()}
+async def run_batch_stream(
+    questions: list[str],
+    run: Callable[[str], AsyncIterator[dict]],
+    concurrency: int | None = None,
+    stream_all: bool = False
+) -> AsyncGenerator[dict, None]:
+    """
+    複数の問いかけを同時実行数の上限付きで実行（バッチモード）
 
+    問いかけの順序ではなく、完了した順にイベントが届きます。
+    各イベントの "index" で元の問いかけと対応付けてください。
 
-# ============ エントリーポイント ============
-@app.entrypoint
-async def invoke(payload: dict):
+    Args:
+        questions: 問いかけのリスト
+        run: 1件分のイベントストリームを返す関数
+            （例: lambda q: run_judge_mode_stream(q, parallel=True)）
+        concurrency: 同時に実行するパイプライン数
+            （省略時は環境変数 MAGI_BATCH_CONCURRENCY、デフォルト 4）
+        stream_all: True の場合は thinking などの途中経過も送信
+            （デフォルトは verdict / response / final / chat_response のみ）
+
+    Yields:
+        dict: イベント辞書
+            - {"type": "batch_start", "total": N, "concurrency": C}
+            - {"type": "verdict" | "final" | ..., "index": i, ...}: 各問いかけの結果
+            - {"type": "batch_error", "index": i, "question": "...", "error": "..."}
+            - {"type": "batch_progress", "completed", "succeeded", "failed", "total",
+               "elapsed", "throughput"}: 1件完了ごと（throughput は件/秒）
+            - {"type": "batch_complete", "total", "succeeded", "failed",
+               "failed_indexes", "elapsed", "throughput"}
     """
-    AgentCore エントリーポイント（ストリーミング版）
+    if concurrency is None:
+        concurrency = int(os.environ.get("MAGI_BATCH_CONCURRENCY", "4"))
+    concurrency = max(1, concurrency)
+    total = len(questions)
+    started_at = time.perf_counter()
+    succeeded = 0
+    failed_indexes: list[int] = []
+
+    def summary() -> dict:
+        elapsed = time.perf_counter() - started_at
+        completed = succeeded + len(failed_indexes)
+        return {
+            "total": total,
+            "succeeded": succeeded,
+            "failed": len(failed_indexes),
+            "elapsed": round(elapsed, 3),
+            "throughput": round(completed / elapsed, 3) if elapsed > 0 else 0.0,
+        }
+
+    yield {"type": "batch_start", "total": total, "concurrency": concurrency}
+
+    async with StreamMerger() as merger:
+        # 上限まで開始し、1件終わるごとに次の問いかけを開始する
+        pending = iter(enumerate(questions))
+        finished: set[int] = set()
+
+        def start_next() -> None:
+            for index, question in pending:
+                merger.add(str(index), _batch_item(index, question, run, stream_all))
+                return
+
+        for _ in range(concurrency):
+            start_next()
+
+        async for name, event in merger:
+            if event is not None:
+                if event["type"] in _BATCH_DONE_TYPES:
+                    succeeded += 1
+                    finished.add(event["index"])
+                elif event["type"] == "batch_error":
+                    failed_indexes.append(event["index"])
+                    finished.add(event["index"])
+                yield event
+                continue
+
+            # 1件分のストリームが終了
+            index = int(name)
+            if index not in finished:
+                # 最終結果もエラーもなく終わった場合は失敗として扱う
+                failed_indexes.append(index)
+                yield {
+                    "type": "batch_error",
+                    "index": index,
+                    "question": questions[index],
+                    "error": "最終結果が得られませんでした"
+                }
+            yield {"type": "batch_progress", "completed": succeeded + len(failed_indexes), **summary()}
+            start_next()
+
+    yield {"type": "batch_complete", "failed_indexes": sorted(failed_indexes), **summary()}
+
+
+# =============================================================================
+# ウォームアップ / キープアライブ（ping モード）
+# =============================================================================
+#
+# "mode": "ping" の payload は LLM を呼び出さずに次を行い、準備状況を返す。
+#   1. エージェントの読み込み（未読み込みの場合、pipeline/startup.py）
+#   2. 共有クライアントの接続を温める（DNS・TLS・認証情報、agents/models.py）
+#   3. エージェントプールの事前生成
+# スケジューラーやデプロイ後のフックから定期的に送れば、アイドル後の最初の
+# リクエストでこれらを待たずに済む。コンテナ内で定期的に温める場合は
+# MAGI_KEEPALIVE_INTERVAL を設定する（リクエストがない間だけ動く）。
+# =============================================================================
+
+async def run_ping_stream(connections: int = 1, pool_size: int | None = None) -> AsyncGenerator[dict, None]:
+    """
+    共有クライアントとエージェントプールを温め、準備状況を返す（ping モード）
 
     Args:
-        payload: {
-            "question": "AIを導入すべきか？",
-            "mode": "judge" | "chat",  # オプション、デフォルト: "judge"
-            "format": "explicit" | "natural"  # chatモード時のみ、デフォルト: "explicit"
+        connections: 温める接続の数
+        pool_size: 事前生成する1種類あたりのインスタンス数（省略時はプールの上限まで、0 で生成しない）
+
+    Yields:
+        dict: {"type": "ping", "data": {
+                  "ready": 温め終わったか（接続に失敗した場合は False）,
+                  "agents_loaded": ping の前からエージェントが読み込まれていたか,
+                  "warm": warm_connections() の結果,
+                  "pool": エージェントプールの統計, "connections": コネクションプールの状態,
+                  "limiter": リミッターの統計（無効なら None）, "keep_alive": キープアライブの状況,
+                  "uptime_ms": プロセスの起動からの時間, "ms": ping の所要時間}}
+    """
+    started_at = time.perf_counter()
+    agents_loaded = agents_ready()
+    await ensure_agents_loaded()
+    from agents.models import connection_stats, warm_connections
+    from pipeline.limiter import get_limiter
+
+    warm = await asyncio.to_thread(warm_connections, connections)
+    if pool_size != 0:
+        await asyncio.to_thread(get_agent_pool().prewarm, pool_size)
+    limiter = get_limiter()
+    yield {
+        "type": "ping",
+        "data": {
+            "ready": warm["warmed"],
+            "agents_loaded": agents_loaded,
+            "warm": warm,
+            "pool": get_agent_pool().stats(),
+            "connections": connection_stats(),
+            "limiter": limiter.stats() if limiter is not None else None,
+            "keep_alive": keep_alive_stats(),
+            "uptime_ms": startup_profile.report()["uptime_ms"],
+            "ms": round((time.perf_counter() - started_at) * 1000, 1),
         }
+    }
+
+
+# =============================================================================
+# 同一リクエストの合流（シングルフライト）
+# =============================================================================
+#
+# 実行中のリクエストと同じ payload が届いた場合は、新しくパイプラインを
+# 起動せず、実行中のストリームに合流させる（pipeline/singleflight.py を参照）。
+# 後から来たリクエストにも、既に送信済みのイベントを含めて全イベントが届く。
+#
+# 設定（環境変数）:
+#   MAGI_SINGLE_FLIGHT: on | off（デフォルト: on）
+# =============================================================================
+
+_single_flight = SingleFlight()
+
+
+# 合流の判定に含めない payload のキー（クライアントごとの指定）
+_PER_CLIENT_KEYS = ("coalesce", "encoding", "delta")
+
+
+def _single_flight_enabled() -> bool:
+    return os.environ.get("MAGI_SINGLE_FLIGHT", "on").lower() in ("1", "true", "yes", "on")
+
+
+async def _dispatch(payload: dict) -> AsyncGenerator[dict, None]:
+    """
+    payload のモードに応じて適切なハンドラーを呼び出す
+
+    Args:
+        payload: invoke() に渡された payload
 
     Yields:
         各イベント（thinking, verdict, final など）
     """
+    started_at = time.perf_counter()
+    mark_activity()
+    # エージェントが未読み込み（起動直後）ならスレッドで読み込む（/ping は止めない）
+    await ensure_agents_loaded()
+
     # -------------------------------------------------------------------------
     # 1. payloadからパラメータを取り出す
     # -------------------------------------------------------------------------
     question = payload.get("question", "")
     mode = payload.get("mode", "judge")  # デフォルト: 判定モード
     format = payload.get("format", "explicit")  # デフォルト: 明示的形式
+    parallel = bool(payload.get("parallel", False))  # デフォルト: 逐次実行
+    quorum = bool(payload.get("quorum", False))  # デフォルト: 全員の判定を待つ
+    quorum_policy = payload.get("quorum_policy", "continue")
+    use_cache = bool(payload.get("cache", True))
+    hedge = bool(payload.get("hedge", False))  # デフォルト: ヘッジしない
+    # 期限（秒）: 省略時は環境変数 MAGI_AGENT_TIMEOUT / MAGI_REQUEST_TIMEOUT、0 で無効
+    agent_timeout = payload.get("agent_timeout")
+    request_timeout = payload.get("request_timeout")
+    agent_timeout = float(agent_timeout) if agent_timeout is not None else None
+    request_timeout = float(request_timeout) if request_timeout is not None else None
+    # 会話モードのセッション（前回までの会話履歴を引き継ぐ）
+    session_id = str(payload["session_id"]) if payload.get("session_id") else None
+    # thinking のまとめ送り: 省略時は環境変数 MAGI_THINKING_INTERVAL_MS / MAGI_THINKING_MAX_BYTES、0 で無効
+    interval, max_bytes = get_coalesce_settings()
+    if payload.get("thinking_interval_ms") is not None:
+        interval = float(payload["thinking_interval_ms"]) / 1000
+    if payload.get("thinking_max_bytes") is not None:
+        max_bytes = int(payload["thinking_max_bytes"])
 
     # -------------------------------------------------------------------------
-    # 2. モードに応じて適切なハンドラーを呼び出す
+    # 2. モードに応じて適切なハンドラーを選ぶ
     # -------------------------------------------------------------------------
-    if mode == "chat":
-        # 会話モード: 多角的な回答を統合
-        async for event in run_chat_mode_stream(question, format):
-            yield event
-    else:
+    # 各エージェントの metrics イベントを、1件ごとに final / chat_response へ集計する
+    # （バッチモードでは結果イベントだけを送る場合があるため、1件分のストリームに付ける）
+    def run(question: str) -> AsyncIterator[dict]:
+        if mode == "chat":
+            # 会話モード: 多角的な回答を統合
+            return attach_metrics(run_chat_mode_stream(
+                question,
+                format,
+                parallel=parallel,
+                use_cache=use_cache,
+                hedge=hedge,
+                agent_timeout=agent_timeout,
+                request_timeout=request_timeout,
+                session_id=session_id
+            ))
         # 判定モード（デフォルト）: 賛成/反対の判定
-        async for event in run_judge_mode_stream(question):
-            yield event
+        return attach_metrics(run_judge_mode_stream(
+            question,
+            parallel=parallel,
+            quorum=quorum,
+            quorum_policy=quorum_policy,
+            use_cache=use_cache,
+            hedge=hedge,
+            agent_timeout=agent_timeout,
+            request_timeout=request_timeout
+        ))
 
+    # -------------------------------------------------------------------------
+    # 3. 実行（"questions" があればバッチモード）
+    # -------------------------------------------------------------------------
+    if "questions" in payload:
+        questions = payload["questions"]
+        if not isinstance(questions, list):
+            raise ValueError("questions は文字列のリストで指定してください")
+        stream = run_batch_stream(
+            [str(q) for q in questions],
+            run,
+            concurrency=int(payload["concurrency"]) if payload.get("concurrency") else None,
+            stream_all=bool(payload.get("stream_all", False))
+        )
+    else:
+        stream = run(question)
+
+    # 同じエージェントの連続した thinking チャンクをまとめてから送る
+    # （構造イベントは即座に送る。合流したリクエストの再生バッファも小さくなる）
+    # data の Pydantic モデルはここで1回だけ辞書にする（合流したリクエストで共有）
+    # リクエスト全体を magi.request スパンにし、TTFT・全体の時間をヒストグラムに記録する
+    async for event in trace_request(
+        serialize_events(coalesce_thinking(stream, interval, max_bytes)),
+        "batch" if "questions" in payload else mode,
+        **{"magi.parallel": parallel, "magi.batch_size": len(payload.get("questions") or [])}
+    ):
+        yield event
+    # MAGI_STARTUP_PROFILE=on なら、最初のリクエストの完了時に起動の記録を表示
+    startup_profile.first_request(time.perf_counter() - started_at)
 
 
+# ============ エントリーポイント ============
+@app.entrypoint
+async def invoke(payload: dict):
+    """
+    AgentCore エントリーポイント（ストリーミング版）
+
+    Args:
+        payload: {
+            "question": "AIを導入すべきか？",
+            "questions": ["...", "..."],  # バッチモード（question の代わりに指定）
+            "concurrency": 4,  # バッチモードの同時実行数、デフォルト: MAGI_BATCH_CONCURRENCY（4）
+            "stream_all": true | false,  # バッチモードで途中経過も送信するか、デフォルト: false
+            "mode": "judge" | "chat" | "ping",  # オプション、デフォルト: "judge"（ping は LLM を呼ばずに温める）
+            "connections": 1,  # pingモード時のみ、温める接続の数、デフォルト: 1
+            "pool": 4,  # pingモード時のみ、事前生成するプールのインスタンス数、デフォルト: MAGI_POOL_SIZE
+            "format": "explicit" | "natural",  # chatモード時のみ、デフォルト: "explicit"
+            "session_id": "...",  # chatモード時のみ、同じIDの会話履歴を引き継ぐ（MAGI_SESSION_* で上限を設定）
+            "parallel": true | false,  # 3エージェントの同時実行、デフォルト: false
+            "quorum": true | false,  # judgeモード時のみ、過半数で早期決定、デフォルト: false
+            "quorum_policy": "continue" | "cancel",  # 過半数確定後の残りエージェント、デフォルト: "continue"
+            "cache": true | false,  # 結果キャッシュを使うか、デフォルト: true（MAGI_CACHE_BACKEND / MAGI_SEMANTIC_CACHE 設定時のみ有効）
+            "coalesce": true | false,  # 実行中の同一リクエストに合流するか、デフォルト: true（MAGI_SINGLE_FLIGHT=off で無効）
+            "hedge": true | false,  # 最初のトークンが遅い呼び出しをヘッジするか、デフォルト: false
+            "agent_timeout": 90,  # エージェント1つあたりの期限・秒、デフォルト: MAGI_AGENT_TIMEOUT（0 で無効）
+            "request_timeout": 180,  # リクエスト全体の期限・秒、デフォルト: MAGI_REQUEST_TIMEOUT（0 で無効）
+            "thinking_interval_ms": 50,  # thinking をまとめる時間幅・ミリ秒、デフォルト: MAGI_THINKING_INTERVAL_MS（0 で無効）
+            "thinking_max_bytes": 2048,  # thinking をまとめる最大サイズ、デフォルト: MAGI_THINKING_MAX_BYTES
+            "encoding": "json" | "packed",  # 送信形式（packed は届いているイベントをまとめたフレーム）、デフォルト: "json"
+            "delta": true | false  # final の agent_verdicts を送信済み verdict への参照にするか、デフォルト: false
+        }
+
+    Yields:
+        各イベント（thinking, verdict, final など）。encoding="packed" の場合はまとめ送りのフレーム（配列）
+        エージェントの呼び出しごとに {"type": "metrics", "agent": ..., "data": {...}} を送り、
+        final / chat_response の "metrics" に集計を付けます（pipeline/metrics.py を参照）。
+        ping モードは {"type": "ping", "data": {...}} を1件だけ送ります（run_ping_stream() を参照）。
+    """
+    if payload.get("mode") == "ping":
+        # 温めた結果と最新の統計を返すため、合流・キャッシュは使わない
+        stream = run_ping_stream(
+            connections=int(payload.get("connections", 1)),
+            pool_size=int(payload["pool"]) if payload.get("pool") is not None else None
+        )
+    elif bool(payload.get("coalesce", True)) and _single_flight_enabled():
+        # 同じ payload のリクエストが実行中なら、そのストリームに合流
+        # （送信形式はリクエストごとに変換するため、合流の判定には含めない）
+        key = make_flight_key({k: v for k, v in payload.items() if k not in _PER_CLIENT_KEYS})
+        stream = _single_flight.stream(key, lambda: _dispatch(payload))
+    else:
+        stream = _dispatch(payload)
+
+    encoding = payload.get("encoding", "json")
+    delta = bool(payload.get("delta", False))
+    # クライアントが切断したら、残りのエージェント・JUDGE のモデル呼び出しごと止める
+    # （合流している他のクライアントがいれば、パイプラインは続く）
+    async for value in until_disconnected(encode_stream(stream, encoding, delta), current_disconnect_signal()):
+        yield value
+
 
 # =============================================================================
 # スクリプト実行時のエントリーポイント
@@ -0,0 +1,209 @@
+# =============================================================================
+# cancel_check.py - クライアント切断時のキャンセル伝播の確認（オフライン）
+# =============================================================================
+#
+# FakeModel（MAGI_MODEL_BACKEND=fake）で次を確認・表示します。Bedrock は呼び出しません。
+# FakeModel は BedrockModel と同じく、読み手がいなくなっても生成を続け、
+# cancel_signal がセットされたときだけ止まります（agents/fake_model.py）。
+#
+#   1. invoke() を読んでいるタスクのキャンセル（判定・逐次・会話・セッション付き会話）
+#   2. HTTP のクライアント切断（backend.app を uvicorn でこのプロセス内に起動し、
+#      ストリームの途中でソケットを閉じる。encoding=packed の場合も含む）
+#   3. 同じ問いかけに合流した2人のうち1人だけが切断した場合（もう1人には最後まで届く）
+#
+# 各ケースで確認すること:
+#   - キャンセル後に生成されたトークンが、実行中の呼び出し1本あたり1つ以下
+#     （次のチャンクの境目で止まる）で、実行中の呼び出しが残っていない
+#   - 結果キャッシュ・セッション履歴に途中までの結果が保存されていない
+#   - magi.cancelled カウンター（magi.scope=request / model / client）
+#
+# 実行方法:
+#   cd agentcore && python -m bench.cancel_check
+#
+# =============================================================================
+
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+
+
+# キャンセル後に生成が止まったか確認するまでの待ち時間（秒）
+_SETTLE = 0.5
+
+
+def _fake_model():
+    """共有モデルのラッパーを外した FakeModel"""
+    from agents.models import get_shared_model
+
+    model = get_shared_model()
+    while hasattr(model, "model"):
+        model = model.model
+    return model
+
+
+async def _after_cancel(label: str, started: int) -> int:
+    """キャンセル後に生成されたトークン数を表示して返す"""
+    model = _fake_model()
+    before = model.generated_tokens
+    await asyncio.sleep(_SETTLE)
+    extra = model.generated_tokens - before
+    print(f"  {label:<28} キャンセル後のトークン {extra:>3}  実行中 {model.in_flight}  止めた生成 {model.aborted - started}")
+    assert model.in_flight == 0, "キャンセル後もモデル呼び出しが残っています"
+    return extra
+
+
+async def _cancel_in_process(label: str, payload: dict, cancel_at: int | str) -> None:
+    """invoke() を途中まで（cancel_at 件目、または cancel_at の種類のイベントまで）読んでからタスクをキャンセル"""
+    import backend
+
+    received = asyncio.Event()
+
+    async def consume() -> None:
+        count = 0
+        async for event in backend.invoke(payload):
+            count += 1
+            if count == cancel_at or event.get("type") == cancel_at:
+                received.set()
+
+    started = _fake_model().aborted
+    task = asyncio.create_task(consume())
+    await asyncio.wait_for(received.wait(), 10)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    extra = await _after_cancel(label, started)
+    assert extra <= 4, "キャンセル後も生成が続いています"
+
+
+# =============================================================================
+# HTTP（uvicorn をこのプロセス内で起動）
+# =============================================================================
+
+def _start_server() -> int:
+    import uvicorn
+    import backend
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(backend.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="cancel-check-server", daemon=True).start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise TimeoutError("サーバーが起動しませんでした")
+        time.sleep(0.05)
+    return port
+
+
+async def _http_invoke(port: int, payload: dict, disconnect_after: int | None = None) -> str:
+    """
+    POST /invocations を実行（disconnect_after バイト受信した時点で切断）
+
+    Returns:
+        str: "disconnected" | "final"（最終結果まで受信）| "incomplete"
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        f"POST /invocations HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    received = b""
+    try:
+        while chunk := await asyncio.wait_for(reader.read(65536), 10):
+            received += chunk
+            if disconnect_after is not None and len(received) >= disconnect_after:
+                return "disconnected"
+    finally:
+        writer.close()
+    return "final" if b'"type": "final"' in received else "incomplete"
+
+
+def _counter_values(metric_reader) -> dict[str, int]:
+    values: dict[str, int] = {}
+    for resource_metrics in metric_reader.get_metrics_data().resource_metrics:
+        for scope_metrics in resource_metrics.scope_metrics:
+            for metric in scope_metrics.metrics:
+                if metric.name != "magi.cancelled":
+                    continue
+                for point in metric.data.data_points:
+                    scope = point.attributes.get("magi.scope")
+                    values[scope] = values.get(scope, 0) + point.value
+    return values
+
+
+def main() -> None:
+    os.environ.update(
+        MAGI_MODEL_BACKEND="fake",
+        MAGI_FAKE_TTFT="0.02",
+        MAGI_FAKE_TOKEN_DELAY="0.02",
+        MAGI_FAKE_TOKENS="60",
+        MAGI_CACHE_BACKEND="memory",
+        MAGI_SINGLE_FLIGHT="on",
+    )
+    from pipeline.telemetry import configure_local_telemetry
+
+    _, metric_reader = configure_local_telemetry("memory")
+    import backend
+    from pipeline.cache import get_result_cache
+    from pipeline.sessions import get_session_store
+
+    print("1. invoke() を読んでいるタスクのキャンセル")
+
+    async def in_process() -> None:
+        await _cancel_in_process("judge parallel", {"question": "判定 並列", "parallel": True}, 5)
+        await _cancel_in_process("judge sequential", {"question": "判定 逐次"}, 5)
+        await _cancel_in_process("chat parallel", {"question": "会話", "mode": "chat", "parallel": True}, 5)
+        await _cancel_in_process(
+            "chat session",
+            {"question": "会話 セッション", "mode": "chat", "parallel": True, "session_id": "cancel-check"},
+            5
+        )
+        # JUDGE の実行中にキャンセル（3エージェントの結果は届いている）
+        await _cancel_in_process("judge (JUDGE 実行中)", {"question": "判定 JUDGE", "parallel": True}, "judge_start")
+
+    asyncio.run(in_process())
+    cache = get_result_cache()
+    assert len(cache) == 0, "キャンセルした結果がキャッシュに保存されています"
+    assert get_session_store().get("cancel-check") is None, "キャンセルした会話がセッションに保存されています"
+
+    print("2. HTTP のクライアント切断")
+    port = _start_server()
+
+    async def over_http() -> None:
+        started = _fake_model().aborted
+        assert await _http_invoke(port, {"question": "HTTP 切断", "parallel": True}, 1500) == "disconnected"
+        extra = await _after_cancel("切断", started)
+        assert extra <= 4, "切断後も生成が続いています"
+
+        # packed は元のストリームを別タスクで読むため、そちらまでキャンセルが届くこと
+        started = _fake_model().aborted
+        payload = {"question": "HTTP 切断 packed", "parallel": True, "encoding": "packed"}
+        assert await _http_invoke(port, payload, 1500) == "disconnected"
+        extra = await _after_cancel("切断（encoding=packed）", started)
+        assert extra <= 4, "切断後も生成が続いています"
+
+        print("3. 合流した2人のうち1人だけが切断")
+        payload = {"question": "HTTP 合流", "parallel": True}
+        results = await asyncio.gather(_http_invoke(port, payload, 1500), _http_invoke(port, payload))
+        print(f"  結果: {results}")
+        assert results == ["disconnected", "final"], "残ったクライアントに最終結果が届いていません"
+
+    asyncio.run(over_http())
+    assert len(cache) == 1, "最後まで完了した結果だけがキャッシュに保存されているはずです"
+
+    counters = _counter_values(metric_reader)
+    print(f"\nmagi.cancelled: {counters}")
+    assert counters.get("request", 0) >= 6 and counters.get("model", 0) > 0 and counters.get("client", 0) >= 3
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
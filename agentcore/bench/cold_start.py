@@ -0,0 +1,149 @@
+# =============================================================================
+# cold_start.py - バックエンドのコールドスタートの計測（オフライン）
+# =============================================================================
+#
+# 新しいプロセスで次を計測します（FakeModel、Bedrock は呼び出しません）。
+#
+#   1. import backend のインポート時間（python -X importtime）を
+#      トップレベルのパッケージごとに集計（Strands が含まれていないことも確認）
+#   2. サーバーを起動してから GET /ping が応答するまでの時間
+#   3. 起動直後の最初のリクエストと2件目のリクエストの
+#      最初のイベント・final までの時間（MAGI_WARMUP=off / on、
+#      または最初のリクエストの前に "mode": "ping" を送った場合）
+#   4. サーバーが表示した段階ごとの時間（MAGI_STARTUP_PROFILE=on、pipeline/startup.py）
+#
+# --delay は /ping の応答から最初のリクエストまでの間隔で、スケールアウト後に
+# ロードバランサーがトラフィックを流し始めるまでの時間を想定しています。
+# MAGI_WARMUP=on の効果は、この間にエージェントの読み込みが済むかどうかで決まります。
+#
+# 実行方法:
+#   cd agentcore && python -m bench.cold_start
+#   cd agentcore && python -m bench.cold_start --runs 5 --delay 0
+#
+# =============================================================================
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from bench.http_load import _Server, _percentile, invoke_once
+
+
+_AGENTCORE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(top: int) -> tuple[float, list[tuple[str, float]]]:
+    """
+    新しいプロセスで import backend のインポート時間を計測
+
+    Returns:
+        tuple: (全体の時間ms, [(トップレベルのパッケージ, 自身の時間の合計ms)] 上位 top 件)
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend"],
+        cwd=_AGENTCORE_DIR,
+        env={**os.environ, "MAGI_MODEL_BACKEND": "fake"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    packages: dict[str, float] = {}
+    total = 0.0
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        packages[name.split(".")[0]] = packages.get(name.split(".")[0], 0.0) + int(self_us) / 1000
+        if name == "backend":
+            total = int(cumulative_us) / 1000
+    ranking = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return total, ranking[:top]
+
+
+async def _cold_start(env: dict[str, str], delay: float, stall_timeout: float, ping: bool) -> dict:
+    """サーバーを新しく起動し、起動時間と最初の2件のリクエストを計測（ping=True なら先に ping を送る）"""
+    with tempfile.NamedTemporaryFile("r", suffix=".log") as log:
+        server = _Server.start({**env, "MAGI_STARTUP_PROFILE": "on"}, log.name)
+        try:
+            ready = await server.wait_ready()
+            if ping:
+                result = await invoke_once(server.host, server.port, {"mode": "ping"}, stall_timeout)
+                if result["error"] or result["first"] is None:
+                    raise RuntimeError(f"ping が失敗しました: {result['error']}")
+            await asyncio.sleep(delay)
+            payload = {"question": "AIを導入すべきか？", "mode": "judge", "parallel": True, "cache": False}
+            first = await invoke_once(server.host, server.port, payload, stall_timeout)
+            second = await invoke_once(
+                server.host, server.port, {**payload, "question": "2件目の問い"}, stall_timeout
+            )
+        finally:
+            server.stop()
+        profiles = {}
+        for line in log.read().splitlines():
+            if line.startswith('{"startup_profile"'):
+                profile = json.loads(line)
+                profiles[profile["startup_profile"]] = profile
+    if first["error"] or second["error"]:
+        raise RuntimeError(f"リクエストが失敗しました: {first['error'] or second['error']}")
+    return {"ready": ready, "first": first, "second": second, "profiles": profiles}
+
+
+def _phases(result: dict) -> dict[str, float]:
+    """サーバーが表示した段階ごとの時間（同じ名前は最後の値）"""
+    phases: dict[str, float] = {}
+    for profile in result["profiles"].values():
+        for phase in profile["phases"]:
+            phases[phase["name"]] = phase["ms"]
+    return phases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="バックエンドのコールドスタートの計測")
+    parser.add_argument("--runs", type=int, default=3, help="設定ごとの起動回数")
+    parser.add_argument("--delay", type=float, default=1.0, help="/ping の応答から最初のリクエストまでの秒数")
+    parser.add_argument("--top", type=int, default=10, help="表示するパッケージの数")
+    parser.add_argument("--stall-timeout", type=float, default=30.0, help="データが届かないとき打ち切るまでの秒数")
+    args = parser.parse_args()
+
+    total, ranking = import_profile(args.top)
+    print(f"import backend: {total:.1f}ms（自身の時間が大きいパッケージ）")
+    for name, ms in ranking:
+        print(f"  {name:<24}{ms:>9.1f}ms")
+    if any(name == "strands" for name, _ in ranking):
+        print("  ※ strands が import backend の時点で読み込まれています")
+
+    fake = {
+        "MAGI_MODEL_BACKEND": "fake",
+        "MAGI_FAKE_TTFT": "0.05",
+        "MAGI_FAKE_TOKEN_DELAY": "0.002",
+        "MAGI_FAKE_TOKENS": "20",
+    }
+    print(f"\n{'warmup':<8}{'ready_ms':>10}{'first1_ms':>11}{'final1_ms':>11}{'final2_ms':>11}  段階（ms、中央値）")
+    for warmup in ("off", "on", "ping"):
+        env = {**fake, "MAGI_WARMUP": "on" if warmup == "on" else "off"}
+        results = [
+            asyncio.run(_cold_start(env, args.delay, args.stall_timeout, ping=warmup == "ping"))
+            for _ in range(args.runs)
+        ]
+
+        def median(values: list[float]) -> float:
+            return _percentile(sorted(values), 0.5) * 1000
+
+        phases: dict[str, list[float]] = {}
+        for result in results:
+            for name, ms in _phases(result).items():
+                phases.setdefault(name, []).append(ms / 1000)
+        summary = ", ".join(f"{name}={median(values):.0f}" for name, values in phases.items() if name != "listen")
+        print(f"{warmup:<8}{median([r['ready'] for r in results]):>10.0f}"
+              f"{median([r['first']['first'] for r in results]):>11.0f}"
+              f"{median([r['first']['final'] for r in results]):>11.0f}"
+              f"{median([r['second']['final'] for r in results]):>11.0f}  {summary}")
+
+
+if __name__ == "__main__":
+    main()
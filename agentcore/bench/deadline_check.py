@@ -0,0 +1,90 @@
+# =============================================================================
+# deadline_check.py - 期限切れ（degraded）の結果がキャッシュされないことの確認（オフライン）
+# =============================================================================
+#
+# FakeModel（MAGI_MODEL_BACKEND=fake）と MAGI_CACHE_BACKEND=memory で次を確認します。
+# Bedrock は呼び出しません。
+#
+#   1. JUDGE の期限切れ（request_timeout）: judge_timeout の後に degraded の
+#      final / chat_response が届き、結果キャッシュ・類似質問キャッシュに保存されないこと
+#   2. エージェントの期限切れ（agent_timeout）: agent_timeout の後の degraded の
+#      final / chat_response も保存されないこと
+#   3. その後の期限なしのリクエストは cached にならず最後まで実行され、
+#      正常に完了した結果だけが保存・再生されること（degraded ではない）
+#
+# 実行方法:
+#   cd agentcore && python -m bench.deadline_check
+#
+# =============================================================================
+
+import asyncio
+import os
+
+
+async def _run(payload: dict) -> dict:
+    """invoke() を最後まで読み、イベントの種類・最終結果・cached を返す"""
+    import backend
+
+    types: list[str] = []
+    result = None
+    cached = False
+    async for event in backend.invoke({"coalesce": False, **payload}):
+        types.append(event["type"])
+        if event["type"] in ("final", "chat_response"):
+            result = event["data"]
+        cached = cached or bool(event.get("cached"))
+    assert result is not None, f"最終結果が届いていません: {types}"
+    return {"types": types, "result": result, "cached": cached}
+
+
+def _cache_sizes() -> tuple[int, int]:
+    from pipeline.cache import get_result_cache
+    from pipeline.semantic_cache import get_semantic_cache
+
+    return len(get_result_cache()), len(get_semantic_cache())
+
+
+async def check(mode: str) -> None:
+    base = {"question": f"期限の確認（{mode}）", "mode": mode, "parallel": True}
+
+    for label, timeouts, expected in (
+        ("JUDGE の期限切れ", {"request_timeout": 0.4}, "judge_timeout"),
+        ("エージェントの期限切れ", {"agent_timeout": 0.1}, "agent_timeout"),
+    ):
+        degraded = await _run({**base, **timeouts})
+        assert expected in degraded["types"], f"{expected} が届いていません: {degraded['types']}"
+        assert degraded["result"]["degraded"], "期限切れの結果が degraded になっていません"
+        assert _cache_sizes() == (0, 0), f"{label}の結果がキャッシュに保存されています: {_cache_sizes()}"
+        print(f"  {mode:<6}{label:<16} degraded={degraded['result']['degraded']}  キャッシュ {_cache_sizes()}")
+
+    first = await _run({**base, "request_timeout": 0, "agent_timeout": 0})
+    assert not first["cached"], "期限切れの結果がキャッシュから再生されています"
+    assert not first["result"].get("degraded"), "期限なしのリクエストが degraded になっています"
+    assert _cache_sizes() == (1, 1), f"正常に完了した結果が保存されていません: {_cache_sizes()}"
+
+    second = await _run({**base, "request_timeout": 0, "agent_timeout": 0})
+    assert second["cached"] and not second["result"].get("degraded")
+    print(f"  {mode:<6}{'期限なし':<16} 1回目 cached={first['cached']}  2回目 cached={second['cached']}")
+
+
+def main() -> None:
+    os.environ.update(
+        MAGI_MODEL_BACKEND="fake",
+        MAGI_FAKE_TTFT="0.02",
+        MAGI_FAKE_TOKEN_DELAY="0.005",
+        MAGI_FAKE_TOKENS="60",
+        MAGI_CACHE_BACKEND="memory",
+        MAGI_SEMANTIC_CACHE="on",
+    )
+    from pipeline.cache import get_result_cache
+    from pipeline.semantic_cache import get_semantic_cache
+
+    for mode in ("judge", "chat"):
+        get_result_cache().clear()
+        get_semantic_cache().clear()
+        asyncio.run(check(mode))
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
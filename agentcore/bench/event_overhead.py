@@ -0,0 +1,177 @@
+# =============================================================================
+# event_overhead.py - イベントの辞書⇔Pydantic 変換コストの比較（マイクロベンチマーク）
+# =============================================================================
+#
+# 判定モード1リクエスト分（verdict 3つ + final 1つ）のイベントについて、
+# data の変換にかかる時間を「以前の経路」と「現在の経路」で比較します。
+# モデル呼び出しや JSON 化（AgentCore Runtime 側）は両方で同じなので含めません。
+#
+#   以前: analyze_stream で model_dump → backend で AgentVerdict(**data) を再検証
+#         → FinalVerdict(...) を検証付きで生成 → model_dump
+#   現在: AgentVerdict をそのまま集計に使い、FinalVerdict に渡す
+#         （検証済みのインスタンスは再検証されない）
+#         → _dispatch の出口の serialize_event() で1回だけ辞書にする
+#           （キャッシュした TypeAdapter の直列化器を直接使う）
+#
+#   ※ FinalVerdict.model_construct() も試したが、pydantic 2.14 では
+#     Python 側で組み立てるため、通常の生成（Rust 側の検証）より遅い
+#
+# あわせて次も表示します。
+#   - FinalVerdict 1つの直列化: model_dump() / TypeAdapter.dump_python() /
+#     キャッシュした直列化器（pipeline/events.py の dump_model()）
+#   - 結果キャッシュに保存するリクエストの経路（backend._store_results）:
+#       以前: 結果イベントを先に辞書にして deepcopy した記録を作り、それを下流に流す
+#       現在: モデルのまま下流に流し、保存すると決まってから辞書にする
+#
+# あわせて、data を持たないイベント（thinking など）1つあたりに
+# serialize_event() が加えるコストも表示します。
+#
+# 実行方法:
+#   cd agentcore && python -m bench.event_overhead
+#   cd agentcore && python -m bench.event_overhead --number 20000
+#
+# =============================================================================
+
+import argparse
+import copy
+import timeit
+
+from pydantic import TypeAdapter
+
+from agents.base import AgentVerdict, FinalVerdict
+from pipeline.events import dump_model, serialize_event
+
+
+_AGENTS = ("MELCHIOR-1", "BALTHASAR-2", "CASPER-3")
+
+
+def _structured_outputs() -> list[AgentVerdict]:
+    """モデルの structured_output に相当する検証済みの判定"""
+    return [
+        AgentVerdict(
+            agent_name=name,
+            verdict="賛成" if i % 2 == 0 else "反対",
+            reasoning="判定理由の説明です。" * 10,
+            confidence=0.8,
+        )
+        for i, name in enumerate(_AGENTS)
+    ]
+
+
+def before(outputs: list[AgentVerdict]) -> list[dict]:
+    """以前の経路（辞書 → モデルの組み立て直しを含む）"""
+    events = []
+    verdicts = []
+    for name, output in zip(_AGENTS, outputs):
+        event = {"type": "verdict", "agent": name, "data": output.model_dump()}
+        events.append(event)
+        verdicts.append(AgentVerdict(**event["data"]))
+    final = FinalVerdict(
+        verdict="承認",
+        summary="統合サマリー",
+        vote_count={"賛成": 2, "反対": 1},
+        agent_verdicts=verdicts,
+    )
+    events.append({"type": "final", "data": final.model_dump()})
+    return events
+
+
+def after(outputs: list[AgentVerdict]) -> list[dict]:
+    """現在の経路（モデルのまま受け渡し、出口で1回だけ辞書にする）"""
+    events = []
+    verdicts = []
+    for name, output in zip(_AGENTS, outputs):
+        event = {"type": "verdict", "agent": name, "data": output}
+        events.append(event)
+        verdicts.append(event["data"])
+    final = FinalVerdict(
+        verdict="承認",
+        summary="統合サマリー",
+        vote_count={"賛成": 2, "反対": 1},
+        agent_verdicts=verdicts,
+    )
+    events.append({"type": "final", "data": final})
+    return [serialize_event(event) for event in events]
+
+
+def _events(outputs: list[AgentVerdict]) -> list[dict]:
+    """モデルのままの結果イベント（verdict 3 + final 1）"""
+    events = [{"type": "verdict", "agent": name, "data": output} for name, output in zip(_AGENTS, outputs)]
+    final = FinalVerdict(verdict="承認", summary="統合サマリー", vote_count={"賛成": 2, "反対": 1}, agent_verdicts=outputs)
+    events.append({"type": "final", "data": final})
+    return events
+
+
+def store_before(events: list[dict]) -> list[dict]:
+    """以前の _store_results: 先に辞書にし、deepcopy を記録して下流に流す"""
+    recorded = []
+    sent = []
+    for event in events:
+        event = serialize_event(event)
+        recorded.append(copy.deepcopy(event))
+        sent.append(serialize_event(event))
+    return recorded
+
+
+def store_after(events: list[dict]) -> list[dict]:
+    """現在の _store_results: モデルのまま流し、保存時に辞書にする"""
+    recorded = []
+    sent = []
+    for event in events:
+        recorded.append(event)
+        sent.append(serialize_event(event))
+    return [serialize_event(event) for event in recorded]
+
+
+def _best(function, number: int, repeat: int) -> float:
+    """1回あたりの最短時間（マイクロ秒）"""
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="イベントの辞書⇔Pydantic 変換コストの比較")
+    parser.add_argument("--number", type=int, default=5000, help="1回の計測で実行する回数")
+    parser.add_argument("--repeat", type=int, default=15, help="計測の繰り返し回数（最小値を使う）")
+    args = parser.parse_args()
+
+    outputs = _structured_outputs()
+    # どちらの経路でも送信されるイベントは同じであること
+    assert before(outputs) == after(outputs)
+
+    # 交互に計測して最小値を取る（他の処理による揺れを抑える）
+    results = {"before": float("inf"), "after": float("inf")}
+    for _ in range(args.repeat):
+        for name, path in (("before", before), ("after", after)):
+            seconds = timeit.timeit(lambda: path(outputs), number=args.number)
+            results[name] = min(results[name], seconds / args.number * 1e6)
+    print(f"1リクエスト（verdict 3 + final 1）あたり: "
+          f"before {results['before']:.1f} us → after {results['after']:.1f} us "
+          f"（{results['before'] / results['after']:.1f}x）")
+
+    final = _events(outputs)[-1]["data"]
+    adapter = TypeAdapter(FinalVerdict)
+    assert final.model_dump() == adapter.dump_python(final) == dump_model(final)
+    dumps = {
+        "model_dump()": lambda: final.model_dump(),
+        "TypeAdapter.dump_python()": lambda: adapter.dump_python(final),
+        "dump_model()": lambda: dump_model(final),
+    }
+    print("FinalVerdict 1つの直列化: " + "  ".join(
+        f"{name} {_best(function, args.number * 4, args.repeat):.2f} us" for name, function in dumps.items()
+    ))
+
+    events = _events(outputs)
+    assert store_before(events) == store_after(events)
+    stored = {name: _best(lambda: path(events), args.number, args.repeat)
+              for name, path in (("before", store_before), ("after", store_after))}
+    print(f"結果キャッシュに保存するリクエスト（_store_results + 出口）: "
+          f"before {stored['before']:.1f} us → after {stored['after']:.1f} us "
+          f"（{stored['before'] / stored['after']:.1f}x）")
+
+    thinking = {"type": "thinking", "agent": "MELCHIOR-1", "content": "検討中。"}
+    seconds = min(timeit.repeat(lambda: serialize_event(thinking), number=args.number * 20, repeat=args.repeat))
+    print(f"data のないイベント1つあたりの serialize_event(): {seconds / (args.number * 20) * 1e9:.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
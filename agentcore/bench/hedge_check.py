@@ -0,0 +1,75 @@
+# =============================================================================
+# hedge_check.py - リミッター混雑時のヘッジの確認（オフライン）
+# =============================================================================
+#
+# FakeModel を LimitedModel → HedgedModel で包み（get_shared_model() と同じ順序）、
+# 次を確認します。Bedrock は呼び出しません。
+#
+#   1. 混雑時: 同時実行数 2 のリミッターに 12 本を同時に流す
+#      - リミッターの待ち時間（最大 0.5 秒程度）でヘッジが発行されないこと
+#      - 記録される TTFT が待ち時間を含まない（FakeModel の ttft 付近）こと
+#   2. 空いている時: 最初のトークンが遅い呼び出しは、これまでどおりヘッジされること
+#
+# 実行方法:
+#   cd agentcore && python -m bench.hedge_check
+#
+# =============================================================================
+
+import asyncio
+
+from agents.fake_model import FakeModel
+from agents.models import HedgedModel, LimitedModel
+from pipeline.hedging import HEDGE_STATE_KEY, HedgeBudget, HedgePolicy
+from pipeline.limiter import AdaptiveLimiter
+
+
+_MESSAGES = [{"role": "user", "content": [{"text": "AIを導入すべきか？"}]}]
+_POLICY = HedgePolicy(min_samples=5, default_delay=0.15, min_delay=0.1)
+
+
+async def _call(model: HedgedModel, budget: HedgeBudget) -> None:
+    async for _ in model.stream(_MESSAGES, invocation_state={HEDGE_STATE_KEY: budget}):
+        pass
+
+
+async def check_congested() -> None:
+    fake = FakeModel(ttft=0.05, token_delay=0.01, tokens=5, seed=0)
+    limiter = AdaptiveLimiter(initial_limit=2, min_limit=2, max_limit=2)
+    model = HedgedModel(LimitedModel(fake, limiter))
+    budgets = [HedgeBudget(max_hedges=1, policy=_POLICY) for _ in range(12)]
+
+    await asyncio.gather(*(_call(model, budget) for budget in budgets))
+
+    hedges = sum(budget.used for budget in budgets)
+    p95 = model.ttft.percentile(0.95)
+    stats = limiter.stats()
+    print(
+        f"  混雑時:   呼び出し {fake.calls}  ヘッジ {hedges}  TTFT p95 {p95:.3f}s"
+        f"  待ち時間 max {stats['queue_wait_max']:.3f}s"
+    )
+    assert stats["queue_wait_max"] > _POLICY.default_delay, "リミッターの待ち行列ができていません"
+    assert hedges == 0 and fake.calls == 12, "リミッターの待ち時間でヘッジが発行されています"
+    assert p95 < 0.1, f"TTFT にリミッターの待ち時間が含まれています: {p95:.3f}s"
+
+
+async def check_idle() -> None:
+    fake = FakeModel(ttft=0.4, token_delay=0.01, tokens=5, seed=0)
+    model = HedgedModel(LimitedModel(fake, AdaptiveLimiter(initial_limit=16)))
+    for _ in range(_POLICY.min_samples):
+        model.ttft.record(0.05)
+    budget = HedgeBudget(max_hedges=1, policy=_POLICY)
+
+    await _call(model, budget)
+
+    print(f"  空き時:   呼び出し {fake.calls}  ヘッジ {budget.used}")
+    assert budget.used == 1 and fake.calls == 2, "最初のトークンが遅い呼び出しがヘッジされていません"
+
+
+def main() -> None:
+    asyncio.run(check_congested())
+    asyncio.run(check_idle())
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
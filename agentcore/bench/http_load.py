@@ -0,0 +1,373 @@
+# =============================================================================
+# http_load.py - ローカルの AgentCore サーバーへの HTTP 負荷テスト（オフライン）
+# =============================================================================
+#
+# backend.py の app（BedrockAgentCoreApp）を FakeModel（MAGI_MODEL_BACKEND=fake）で
+# サブプロセスとして起動し、POST /invocations のストリーミング呼び出しを
+# 同時実行数ごとに多数開いて計測します。Bedrock は呼び出しません。
+# bench/load_suite.py と違い、uvicorn・SSE 変換・HTTP のチャンク転送といった
+# 実際のサーバー経路のコスト（直列化・フレーミング）も含めて測ります。
+#
+#   ロードジェネレーター ──POST /invocations──→ uvicorn + BedrockAgentCoreApp（別プロセス）
+#          │                                        └─ invoke() → FakeModel
+#          └←── text/event-stream（data: {...}\n\n をチャンク転送）
+#
+# 同時実行数ごとの計測:
+#   - first_ms: 最初のイベントが届くまでの時間（p50 / p95）
+#   - verdict_ms: 最初の verdict（会話モードは response）までの時間（p50 / p95）
+#   - final_ms: final（会話モードは chat_response）までの時間（p50 / p95 / p99）
+#   - stalled: --stall-timeout 秒以上データが届かなかった、または
+#     最終結果なしで終わったストリームの数
+#   - errors: HTTP エラー・接続エラーの数
+#   - cpu: サーバープロセスの CPU 使用率（/proc から取得、Linux のみ）と
+#     1リクエストあたりの CPU 時間
+#   - kib: 1リクエストあたりの受信バイト数
+#
+# クライアントは標準ライブラリ（asyncio のソケット）だけで HTTP/1.1 を話すため、
+# 追加の依存はありません。
+#
+# 実行方法:
+#   cd agentcore && python -m bench.http_load
+#   cd agentcore && python -m bench.http_load --levels 8,64,256 --encoding packed --delta
+#   cd agentcore && python -m bench.http_load --mode chat --jitter 0.3 --error-rate 0.01
+#   cd agentcore && python -m bench.http_load --url http://127.0.0.1:8080  # 起動済みのサーバー
+#
+# =============================================================================
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from pipeline.wire import FrameDecoder
+
+
+# 最初の結果 / 最終結果とみなすイベント
+_FIRST_RESULT_TYPES = ("verdict", "response")
+_FINAL_TYPES = ("final", "chat_response")
+
+
+def _percentile(values: list[float], p: float) -> float:
+    """ソート済みの値の p パーセンタイル（最近傍順位法）"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, round(p * len(values) + 0.5) - 1))
+    return values[rank]
+
+
+# =============================================================================
+# サーバー（サブプロセス）
+# =============================================================================
+
+class _Server:
+    """
+    FakeModel で backend.app を起動したサブプロセス
+
+    Attributes:
+        host: 待ち受けホスト
+        port: 待ち受けポート
+        process: サブプロセス（--url 指定時は None）
+    """
+
+    def __init__(self, host: str, port: int, process: subprocess.Popen | None = None):
+        self.host = host
+        self.port = port
+        self.process = process
+
+    @classmethod
+    def start(cls, env: dict[str, str], log_path: str | None) -> "_Server":
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        log = open(log_path, "w") if log_path else subprocess.DEVNULL
+        process = subprocess.Popen(
+            [sys.executable, "-c", f"import backend; backend.app.run(host='127.0.0.1', port={port})"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env={**os.environ, **env},
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        return cls("127.0.0.1", port, process)
+
+    async def wait_ready(self, timeout: float = 60.0) -> float:
+        """GET /ping が 200 を返すまで待ち、起動にかかった秒数を返す"""
+        started_at = time.perf_counter()
+        while time.perf_counter() - started_at < timeout:
+            if self.process is not None and self.process.poll() is not None:
+                raise RuntimeError(f"サーバーが終了しました（exit {self.process.returncode}）")
+            try:
+                status, _ = await _get(self.host, self.port, "/ping")
+                if status == 200:
+                    return time.perf_counter() - started_at
+            except OSError:
+                pass
+            await asyncio.sleep(0.1)
+        raise TimeoutError("サーバーが起動しませんでした")
+
+    def cpu_seconds(self) -> float | None:
+        """サーバープロセスの CPU 時間（user + system、Linux 以外は None）"""
+        if self.process is None:
+            return None
+        try:
+            with open(f"/proc/{self.process.pid}/stat") as f:
+                # comm（2番目）に空白が入り得るため、最後の ")" より後ろを分割する
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def stop(self) -> None:
+        if self.process is None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+# =============================================================================
+# HTTP クライアント（HTTP/1.1、1リクエスト1接続）
+# =============================================================================
+
+async def _read_headers(reader: asyncio.StreamReader) -> tuple[int, dict[str, str]]:
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("レスポンスがありません")
+    status = int(status_line.split()[1])
+    headers: dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return status, headers
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+
+async def _get(host: str, port: int, path: str) -> tuple[int, bytes]:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status, _ = await _read_headers(reader)
+        return status, await reader.read()
+    finally:
+        writer.close()
+
+
+async def _body_chunks(reader: asyncio.StreamReader, headers: dict[str, str], stall_timeout: float):
+    """レスポンスボディをチャンクごとに返す（stall_timeout 秒届かなければ TimeoutError）"""
+    if "chunked" not in headers.get("transfer-encoding", ""):
+        while chunk := await asyncio.wait_for(reader.read(65536), stall_timeout):
+            yield chunk
+        return
+    while True:
+        size_line = await asyncio.wait_for(reader.readline(), stall_timeout)
+        size = int(size_line.split(b";")[0].strip() or b"0", 16)
+        if size == 0:
+            return
+        chunk = await asyncio.wait_for(reader.readexactly(size + 2), stall_timeout)
+        yield chunk[:-2]
+
+
+async def invoke_once(host: str, port: int, payload: dict, stall_timeout: float) -> dict:
+    """
+    POST /invocations を1回実行し、ストリームのタイミングを計測
+
+    Returns:
+        dict: {"first", "verdict", "final"（秒、届かなければ None）, "stalled", "error", "bytes"}
+    """
+    result = {"first": None, "verdict": None, "final": None, "stalled": False, "error": None, "bytes": 0}
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    started_at = time.perf_counter()
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    decoder = FrameDecoder()
+    buffer = b""
+    try:
+        writer.write(
+            f"POST /invocations HTTP/1.1\r\nHost: {host}:{port}\r\n"
+            f"Content-Type: application/json\r\nAccept: text/event-stream\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        status, headers = await asyncio.wait_for(_read_headers(reader), stall_timeout)
+        if status != 200:
+            result["error"] = f"HTTP {status}"
+            return result
+
+        async for chunk in _body_chunks(reader, headers, stall_timeout):
+            result["bytes"] += len(chunk)
+            buffer += chunk
+            # SSE のイベント（data: {...}\n\n）ごとに復元する
+            while b"\n\n" in buffer:
+                message, buffer = buffer.split(b"\n\n", 1)
+                if not message.startswith(b"data: "):
+                    continue
+                elapsed = time.perf_counter() - started_at
+                for event in decoder.decode(json.loads(message[6:])):
+                    kind = event.get("type") if isinstance(event, dict) else None
+                    if result["first"] is None:
+                        result["first"] = elapsed
+                    if kind in _FIRST_RESULT_TYPES and result["verdict"] is None:
+                        result["verdict"] = elapsed
+                    elif kind in _FINAL_TYPES:
+                        result["final"] = elapsed
+                    elif kind is None and isinstance(event, dict) and "error" in event:
+                        result["error"] = event.get("error_type") or "stream error"
+    except TimeoutError:
+        result["stalled"] = True
+    except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        writer.close()
+
+    if result["final"] is None and result["error"] is None:
+        result["stalled"] = True
+    return result
+
+
+# =============================================================================
+# 計測
+# =============================================================================
+
+async def run_level(server: _Server, make_payload, concurrency: int, requests: int, stall_timeout: float) -> dict:
+    """同時実行数1段階分（ウォームアップ1波 → クローズドループで requests 件）を計測"""
+    await asyncio.gather(*(
+        invoke_once(server.host, server.port, make_payload(f"ウォームアップ {concurrency} {i}"), stall_timeout)
+        for i in range(concurrency)
+    ))
+
+    results: list[dict] = []
+    pending = iter(range(requests))
+
+    async def worker() -> None:
+        for i in pending:
+            payload = make_payload(f"問い {concurrency} {i}")
+            results.append(await invoke_once(server.host, server.port, payload, stall_timeout))
+
+    cpu_before = server.cpu_seconds()
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+    cpu_after = server.cpu_seconds()
+
+    def times(key: str) -> list[float]:
+        return sorted(r[key] for r in results if r[key] is not None and not r["error"])
+
+    first, verdict, final = times("first"), times("verdict"), times("final")
+    cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "rps": round(len(final) / elapsed, 2),
+        "first_p50_ms": round(_percentile(first, 0.50) * 1000, 1),
+        "first_p95_ms": round(_percentile(first, 0.95) * 1000, 1),
+        "verdict_p50_ms": round(_percentile(verdict, 0.50) * 1000, 1),
+        "verdict_p95_ms": round(_percentile(verdict, 0.95) * 1000, 1),
+        "final_p50_ms": round(_percentile(final, 0.50) * 1000, 1),
+        "final_p95_ms": round(_percentile(final, 0.95) * 1000, 1),
+        "final_p99_ms": round(_percentile(final, 0.99) * 1000, 1),
+        "stalled": sum(r["stalled"] for r in results),
+        "errors": sum(bool(r["error"]) for r in results),
+        "cpu_percent": round(cpu / elapsed * 100, 1) if cpu is not None else None,
+        "cpu_ms_per_req": round(cpu / requests * 1000, 2) if cpu is not None else None,
+        "kib_per_req": round(sum(r["bytes"] for r in results) / requests / 1024, 2),
+    }
+
+
+def _print_results(results: list[dict]) -> None:
+    print(f"{'conc':>6}{'rps':>8}{'first50':>9}{'first95':>9}{'verd50':>8}{'verd95':>8}"
+          f"{'final50':>9}{'final95':>9}{'final99':>9}{'stall':>7}{'err':>5}{'cpu%':>7}{'cpu_ms':>8}{'KiB':>7}")
+    for r in results:
+        cpu_percent = f"{r['cpu_percent']:.1f}" if r["cpu_percent"] is not None else "-"
+        cpu_ms = f"{r['cpu_ms_per_req']:.2f}" if r["cpu_ms_per_req"] is not None else "-"
+        print(f"{r['concurrency']:>6}{r['rps']:>8.2f}{r['first_p50_ms']:>9.1f}{r['first_p95_ms']:>9.1f}"
+              f"{r['verdict_p50_ms']:>8.1f}{r['verdict_p95_ms']:>8.1f}{r['final_p50_ms']:>9.1f}"
+              f"{r['final_p95_ms']:>9.1f}{r['final_p99_ms']:>9.1f}{r['stalled']:>7}{r['errors']:>5}"
+              f"{cpu_percent:>7}{cpu_ms:>8}{r['kib_per_req']:>7.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ローカルの AgentCore サーバーへの HTTP 負荷テスト")
+    parser.add_argument("--levels", default="1,8,32,128", help="同時実行数（カンマ区切り）")
+    parser.add_argument("--requests-per-worker", type=int, default=3, help="1段階でワーカー1つあたりに実行する件数")
+    parser.add_argument("--min-requests", type=int, default=16, help="1段階あたりの最小件数")
+    parser.add_argument("--mode", choices=("judge", "chat"), default="judge")
+    parser.add_argument("--sequential", action="store_true", help="3エージェントを逐次実行（parallel=false）")
+    parser.add_argument("--encoding", choices=("json", "packed"), default="json", help="送信形式")
+    parser.add_argument("--delta", action="store_true", help="final を差分モードで受け取る")
+    parser.add_argument("--stall-timeout", type=float, default=10.0, help="データが届かないとき打ち切るまでの秒数")
+    parser.add_argument("--ttft", type=float, default=0.05, help="フェイクモデルの TTFT（秒）")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="フェイクモデルのトークン間隔（秒）")
+    parser.add_argument("--tokens", type=int, default=40, help="フェイクモデルの思考トークン数")
+    parser.add_argument("--jitter", type=float, default=0.2, help="待ち時間のゆらぎ（0〜1）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="ストリーム途中のエラー率（0〜1）")
+    parser.add_argument("--seed", type=int, default=1, help="フェイクモデルの乱数シード")
+    parser.add_argument("--url", help="起動済みのサーバー（指定時はサーバーを起動せず、CPU も計測しない）")
+    parser.add_argument("--server-log", help="起動したサーバーの出力を保存するファイル")
+    parser.add_argument("--output", help="結果を保存する JSON ファイル")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",") if level]
+
+    def make_payload(question: str) -> dict:
+        return {
+            "question": question,
+            "mode": args.mode,
+            "parallel": not args.sequential,
+            "cache": False,
+            "coalesce": False,
+            "encoding": args.encoding,
+            "delta": args.delta,
+        }
+
+    settings = {
+        "MAGI_MODEL_BACKEND": "fake",
+        "MAGI_FAKE_TTFT": str(args.ttft),
+        "MAGI_FAKE_TOKEN_DELAY": str(args.token_delay),
+        "MAGI_FAKE_TOKENS": str(args.tokens),
+        "MAGI_FAKE_JITTER": str(args.jitter),
+        "MAGI_FAKE_ERROR_RATE": str(args.error_rate),
+        "MAGI_FAKE_SEED": str(args.seed),
+    }
+    if args.url:
+        parts = urlsplit(args.url)
+        server = _Server(parts.hostname or "127.0.0.1", parts.port or 80)
+    else:
+        server = _Server.start(settings, args.server_log)
+
+    async def run_all() -> list[dict]:
+        startup = await server.wait_ready()
+        print(f"サーバー: http://{server.host}:{server.port}（起動 {startup:.2f}s）"
+              f" mode={args.mode} encoding={args.encoding} delta={args.delta}")
+        results = []
+        for concurrency in levels:
+            requests = max(args.min_requests, concurrency * args.requests_per_worker)
+            results.append(await run_level(server, make_payload, concurrency, requests, args.stall_timeout))
+        return results
+
+    try:
+        results = asyncio.run(run_all())
+    finally:
+        server.stop()
+    _print_results(results)
+
+    if args.output:
+        meta = {"settings": settings, "args": vars(args), "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"保存しました: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
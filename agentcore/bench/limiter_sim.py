@@ -0,0 +1,116 @@
+# =============================================================================
+# limiter_sim.py - 適応型リミッターのシミュレーション（オフライン）
+# =============================================================================
+#
+# FakeModel（agents/fake_model.py）に「同時実行数 capacity を超えると
+# スロットリングを返す」サービスを演じさせ、リミッターあり/なしで
+# スロットリング回数・スループット・待ち時間を比較します。
+# Bedrock は呼び出しません。
+#
+# 実行方法:
+#   cd agentcore && python -m bench.limiter_sim
+#   cd agentcore && python -m bench.limiter_sim --workers 64 --capacity 12 --calls 400
+#
+# 確認ポイント:
+#   - リミッターありでは limit が capacity 付近に収束し、スロットリングが激減する
+#   - リミッターなしでは多くの呼び出しがスロットリング → リトライを繰り返す
+#   - max_queue を小さくすると LimiterQueueFullError で即座に拒否される
+#
+# =============================================================================
+
+import argparse
+import asyncio
+import time
+
+from agents.fake_model import FakeModel
+from agents.models import LimitedModel
+from pipeline.limiter import AdaptiveLimiter, LimiterQueueFullError
+from strands.types.exceptions import ModelThrottledException
+
+
+_MESSAGES = [{"role": "user", "content": [{"text": "AIを導入すべきか？"}]}]
+
+
+async def _worker(model, remaining: list[int], stats: dict, backoff: float) -> None:
+    """呼び出しがなくなるまで、スロットリング時はリトライしながら呼び出す"""
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        while True:
+            try:
+                async for _ in model.stream(_MESSAGES):
+                    pass
+                stats["succeeded"] += 1
+                break
+            except ModelThrottledException:
+                stats["retries"] += 1
+                await asyncio.sleep(backoff)
+            except LimiterQueueFullError:
+                stats["rejected"] += 1
+                break
+
+
+async def simulate(
+    workers: int,
+    capacity: int,
+    calls: int,
+    limiter: AdaptiveLimiter | None,
+    backoff: float
+) -> dict:
+    """
+    1回分のシミュレーションを実行
+
+    Returns:
+        dict: 成功数・リトライ数・拒否数・所要時間・スループット・リミッター統計
+    """
+    fake = FakeModel(ttft=0.02, token_delay=0.002, tokens=10, max_concurrency=capacity, seed=0)
+    model = LimitedModel(fake, limiter) if limiter is not None else fake
+    stats = {"succeeded": 0, "retries": 0, "rejected": 0}
+    remaining = [calls]
+    limits: list[int] = []
+
+    async def sample() -> None:
+        while True:
+            if limiter is not None:
+                limits.append(limiter.limit)
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample())
+    started_at = time.perf_counter()
+    await asyncio.gather(*(_worker(model, remaining, stats, backoff) for _ in range(workers)))
+    elapsed = time.perf_counter() - started_at
+    sampler.cancel()
+
+    result = {
+        **stats,
+        "throttled": fake.throttled,
+        "peak_in_flight": fake.peak_in_flight,
+        "elapsed": round(elapsed, 3),
+        "throughput": round(stats["succeeded"] / elapsed, 1),
+    }
+    if limiter is not None:
+        result["limiter"] = limiter.stats()
+        result["limit_timeline"] = limits[::max(1, len(limits) // 20)]
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="適応型リミッターのシミュレーション")
+    parser.add_argument("--workers", type=int, default=48, help="同時に呼び出すワーカー数")
+    parser.add_argument("--capacity", type=int, default=8, help="フェイクサービスの同時実行数の上限")
+    parser.add_argument("--calls", type=int, default=300, help="成功させる呼び出しの総数")
+    parser.add_argument("--backoff", type=float, default=0.05, help="スロットリング時のリトライ間隔（秒）")
+    parser.add_argument("--max-queue", type=int, default=256, help="リミッターの待ち行列の最大長")
+    args = parser.parse_args()
+
+    print(f"workers={args.workers} capacity={args.capacity} calls={args.calls}")
+
+    print("\n--- リミッターなし ---")
+    print(asyncio.run(simulate(args.workers, args.capacity, args.calls, None, args.backoff)))
+
+    print("\n--- リミッターあり（AIMD）---")
+    limiter = AdaptiveLimiter(initial_limit=16, max_limit=64, max_queue=args.max_queue)
+    print(asyncio.run(simulate(args.workers, args.capacity, args.calls, limiter, args.backoff)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+# =============================================================================
+# load_suite.py - 同時実行数を段階的に上げる負荷ベンチマーク（オフライン）
+# =============================================================================
+#
+# FakeModel（MAGI_MODEL_BACKEND=fake）を使い、次の3つを同時実行数ごとに
+# 実行して比較します。Bedrock は呼び出しません。
+#
+#   judge:  run_judge_mode_stream(parallel=True, use_cache=False)
+#   chat:   run_chat_mode_stream(parallel=True, use_cache=False)
+#   invoke: invoke()（判定モード、合流・キャッシュなし。thinking のまとめ送りや
+#           直列化・計測などエントリーポイントの処理を含む）
+#
+# 同時実行数ごとの計測:
+#   - rps: 1秒あたりの成功リクエスト数（クローズドループ: 各ワーカーが
+#     1件終わるたびに次の1件を開始）
+#   - p50 / p95 / p99: 成功したリクエストの開始から最後のイベントまでの時間
+#   - errors: 例外で終わったリクエスト数（MAGI_FAKE_ERROR_RATE で注入）
+#   - lag_p99 / lag_max: イベントループの遅れ（5ms ごとの sleep の超過時間）
+#   - kib_per_req: 同時実行中の1リクエストあたりのメモリ
+#     （tracemalloc のピーク増分 ÷ 同時実行数、スループット計測とは別に1波だけ実行）
+#
+# コミット間の比較:
+#   フェイクモデルの設定と乱数シードを固定し、結果を JSON に保存します。
+#   --compare で以前の JSON と並べて rps / p95 の比を表示します。
+#
+# 実行方法:
+#   cd agentcore && python -m bench.load_suite
+#   cd agentcore && python -m bench.load_suite --levels 1,8,32 --targets judge,invoke --output before.json
+#   cd agentcore && python -m bench.load_suite --output after.json --compare before.json
+#   cd agentcore && python -m bench.load_suite --jitter 0.3 --error-rate 0.02
+#
+# =============================================================================
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from typing import AsyncIterator
+
+
+_TARGETS = ("judge", "chat", "invoke")
+
+# イベントループの遅れを測る間隔（秒）
+_LAG_INTERVAL = 0.005
+
+
+def _percentile(values: list[float], p: float) -> float:
+    """ソート済みの値の p パーセンタイル（最近傍順位法）"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, round(p * len(values) + 0.5) - 1))
+    return values[rank]
+
+
+def _request(target: str, question: str) -> AsyncIterator:
+    """対象のパイプラインを1件分開始する"""
+    import backend
+
+    if target == "judge":
+        return backend.run_judge_mode_stream(question, parallel=True, use_cache=False)
+    if target == "chat":
+        return backend.run_chat_mode_stream(question, parallel=True, use_cache=False)
+    return backend.invoke({
+        "question": question, "mode": "judge", "parallel": True, "cache": False, "coalesce": False
+    })
+
+
+async def _one(target: str, question: str) -> tuple[float, bool]:
+    """1件を最後のイベントまで読み、(所要時間, 成功したか) を返す"""
+    started_at = time.perf_counter()
+    try:
+        async for _ in _request(target, question):
+            pass
+    except Exception:
+        return time.perf_counter() - started_at, False
+    return time.perf_counter() - started_at, True
+
+
+async def _wave(target: str, count: int, prefix: str) -> None:
+    """count 件を同時に実行（ウォームアップ・メモリ計測用）"""
+    await asyncio.gather(*(_one(target, f"{prefix} {i}") for i in range(count)))
+
+
+async def _throughput(target: str, concurrency: int, requests: int) -> dict:
+    """concurrency 個のワーカーで requests 件を実行し、スループットとレイテンシを計測"""
+    latencies: list[float] = []
+    errors = 0
+    lags: list[float] = []
+    pending = iter(range(requests))
+    done = asyncio.Event()
+
+    async def monitor() -> None:
+        while not done.is_set():
+            started_at = time.perf_counter()
+            await asyncio.sleep(_LAG_INTERVAL)
+            lags.append(time.perf_counter() - started_at - _LAG_INTERVAL)
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in pending:
+            latency, ok = await _one(target, f"{target} {concurrency} 問い {i}")
+            if ok:
+                latencies.append(latency)
+            else:
+                errors += 1
+
+    lag_task = asyncio.create_task(monitor())
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+    done.set()
+    await lag_task
+
+    latencies.sort()
+    lags.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "lag_p99_ms": round(_percentile(lags, 0.99) * 1000, 2),
+        "lag_max_ms": round((lags[-1] if lags else 0.0) * 1000, 2),
+    }
+
+
+async def _memory_per_request(target: str, concurrency: int) -> float:
+    """concurrency 件を同時に実行したときの1件あたりのメモリ（KiB）"""
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await _wave(target, concurrency, f"{target} {concurrency} メモリ")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round((peak - baseline) / concurrency / 1024, 1)
+
+
+async def run_level(target: str, concurrency: int, requests: int, memory: bool) -> dict:
+    """
+    同時実行数1段階分を計測
+
+    エージェントプールの生成などを計測に含めないよう、先に同じ同時実行数で
+    1波ぶんウォームアップしてから計測します。
+    """
+    await _wave(target, concurrency, f"{target} {concurrency} ウォームアップ")
+    result = {"target": target, "concurrency": concurrency}
+    result.update(await _throughput(target, concurrency, requests))
+    result["kib_per_req"] = await _memory_per_request(target, concurrency) if memory else None
+    return result
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_results(results: list[dict], baseline: dict[tuple[str, int], dict]) -> None:
+    header = (f"{'target':<8}{'conc':>6}{'rps':>9}{'p50_ms':>9}{'p95_ms':>9}{'p99_ms':>9}"
+              f"{'errors':>8}{'lag_p99':>9}{'lag_max':>9}{'KiB/req':>9}")
+    if baseline:
+        header += f"{'rps比':>8}{'p95比':>8}"
+    print(header)
+    for r in results:
+        line = (f"{r['target']:<8}{r['concurrency']:>6}{r['rps']:>9.2f}{r['p50_ms']:>9.1f}"
+                f"{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['errors']:>8}{r['lag_p99_ms']:>9.2f}"
+                f"{r['lag_max_ms']:>9.2f}{r['kib_per_req'] if r['kib_per_req'] is not None else '-':>9}")
+        before = baseline.get((r["target"], r["concurrency"]))
+        if before and before["rps"] and before["p95_ms"]:
+            line += f"{r['rps'] / before['rps']:>8.2f}{r['p95_ms'] / before['p95_ms']:>8.2f}"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="同時実行数を段階的に上げる負荷ベンチマーク")
+    parser.add_argument("--targets", default=",".join(_TARGETS), help="judge,chat,invoke から選択")
+    parser.add_argument("--levels", default="1,4,16,64", help="同時実行数（カンマ区切り）")
+    parser.add_argument("--requests-per-worker", type=int, default=4, help="1段階でワーカー1つあたりに実行する件数")
+    parser.add_argument("--min-requests", type=int, default=20, help="1段階あたりの最小件数")
+    parser.add_argument("--ttft", type=float, default=0.05, help="フェイクモデルの TTFT（秒）")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="フェイクモデルのトークン間隔（秒）")
+    parser.add_argument("--tokens", type=int, default=40, help="フェイクモデルの思考トークン数")
+    parser.add_argument("--jitter", type=float, default=0.2, help="待ち時間のゆらぎ（0〜1）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="ストリーム途中のエラー率（0〜1）")
+    parser.add_argument("--seed", type=int, default=1, help="フェイクモデルの乱数シード")
+    parser.add_argument("--no-memory", action="store_true", help="メモリ計測（tracemalloc）を省略")
+    parser.add_argument("--output", help="結果を保存する JSON ファイル")
+    parser.add_argument("--compare", help="比較する以前の結果（JSON ファイル）")
+    args = parser.parse_args()
+
+    settings = {
+        "MAGI_MODEL_BACKEND": "fake",
+        "MAGI_FAKE_TTFT": str(args.ttft),
+        "MAGI_FAKE_TOKEN_DELAY": str(args.token_delay),
+        "MAGI_FAKE_TOKENS": str(args.tokens),
+        "MAGI_FAKE_JITTER": str(args.jitter),
+        "MAGI_FAKE_ERROR_RATE": str(args.error_rate),
+        "MAGI_FAKE_SEED": str(args.seed),
+    }
+    os.environ.update(settings)
+
+    targets = [t for t in args.targets.split(",") if t]
+    unknown = set(targets) - set(_TARGETS)
+    if unknown:
+        parser.error(f"未知の対象: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.levels.split(",") if level]
+
+    baseline: dict[tuple[str, int], dict] = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        baseline = {(r["target"], r["concurrency"]): r for r in previous["results"]}
+        print(f"比較対象: {args.compare}（commit {previous['meta'].get('commit')}）")
+
+    async def run_all() -> list[dict]:
+        results = []
+        for target in targets:
+            for concurrency in levels:
+                requests = max(args.min_requests, concurrency * args.requests_per_worker)
+                results.append(await run_level(target, concurrency, requests, not args.no_memory))
+        return results
+
+    results = asyncio.run(run_all())
+    _print_results(results, baseline)
+
+    if args.output:
+        meta = {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "settings": settings,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"保存しました: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
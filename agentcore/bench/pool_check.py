@@ -0,0 +1,103 @@
+# =============================================================================
+# pool_check.py - エージェントプールの生成と保持数の確認（オフライン）
+# =============================================================================
+#
+# 生成に時間がかかる（time.sleep で生成を模した）インスタンスの AgentPool で
+# 次を確認します。Bedrock は呼び出しません。
+#
+#   1. acheckout(): 新規生成の間もイベントループが止まらないこと
+#      （同時に走らせたタイマーの遅れが生成時間よりずっと短い）
+#   2. acheckout() が生成中にキャンセルされても、貸し出し数が戻り、
+#      できあがったインスタンスはプールに返されること
+#   3. prewarm() を複数スレッドから同時に呼んでも、待機数・生成数が
+#      max_size を超えないこと
+#
+# 実行方法:
+#   cd agentcore && python -m bench.pool_check
+#
+# =============================================================================
+
+import asyncio
+import threading
+import time
+
+from agents.pool import AgentPool
+
+
+_BUILD_SECONDS = 0.2
+
+
+class _SlowInstance:
+    """生成に _BUILD_SECONDS 秒かかるインスタンス（Strands Agent の生成を模す）"""
+
+    def __init__(self):
+        time.sleep(_BUILD_SECONDS)
+
+    def reset(self) -> None:
+        pass
+
+
+async def _max_tick_delay(until: asyncio.Future, interval: float = 0.01) -> float:
+    """until が終わるまで interval ごとに起き、予定からの最大の遅れを返す"""
+    worst = 0.0
+    while not until.done():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - expected)
+    return worst
+
+
+async def check_nonblocking() -> None:
+    pool: AgentPool[_SlowInstance] = AgentPool(_SlowInstance, max_size=4)
+
+    async def borrow() -> None:
+        async with pool.acheckout():
+            await asyncio.sleep(0)
+
+    borrowing = asyncio.ensure_future(asyncio.gather(*(borrow() for _ in range(3))))
+    delay = await _max_tick_delay(borrowing)
+    await borrowing
+    stats = pool.stats()
+    print(f"  acheckout: 生成 {stats['created']}件  イベントループの最大遅れ {delay * 1000:.1f}ms")
+    assert delay < _BUILD_SECONDS / 4, f"生成の間イベントループが止まっています: {delay:.3f}s"
+    assert stats["created"] == 3 and stats["idle"] == 3 and stats["in_use"] == 0, stats
+
+
+async def check_cancelled() -> None:
+    pool: AgentPool[_SlowInstance] = AgentPool(_SlowInstance, max_size=4)
+
+    async def borrow() -> None:
+        async with pool.acheckout():
+            raise AssertionError("キャンセルされたのに貸し出されました")
+
+    task = asyncio.ensure_future(borrow())
+    await asyncio.sleep(_BUILD_SECONDS / 4)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await asyncio.sleep(_BUILD_SECONDS)
+    stats = pool.stats()
+    print(f"  キャンセル: in_use {stats['in_use']}  idle {stats['idle']}")
+    assert stats["in_use"] == 0 and stats["idle"] == 1, stats
+
+
+def check_prewarm_race() -> None:
+    pool: AgentPool[_SlowInstance] = AgentPool(_SlowInstance, max_size=4)
+    threads = [threading.Thread(target=pool.prewarm) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = pool.stats()
+    print(f"  prewarm x8: idle {stats['idle']}  created {stats['created']}  max_size {stats['max_size']}")
+    assert stats["idle"] == stats["created"] == 4, f"max_size を超えて生成しています: {stats}"
+
+
+def main() -> None:
+    asyncio.run(check_nonblocking())
+    asyncio.run(check_cancelled())
+    check_prewarm_race()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# =============================================================================
+# prompt_cache_check.py - プロンプトキャッシュのリクエスト形状の確認（オフライン）
+# =============================================================================
+#
+# FakeModel（MAGI_MODEL_BACKEND=fake）で判定モードを2回実行し、次を確認します。
+# Bedrock は呼び出しません。
+#
+#   1. MAGI_PROMPT_CACHE=on のとき、全ロール（3賢者 + JUDGE）の
+#      システムプロンプトの末尾に cachePoint が付いていること
+#   2. そのシステムプロンプトを BedrockModel.format_request() に通すと、
+#      Converse API の "system" の末尾に cachePoint が残ること
+#      （クライアントを作るだけで、リクエストは送らない）
+#   3. metrics イベントのキャッシュトークンが、1回目は書き込み、
+#      2回目は読み込みになること
+#   4. MAGI_PROMPT_CACHE=off のときは cachePoint もキャッシュトークンもないこと
+#
+# 実行方法:
+#   cd agentcore && python -m bench.prompt_cache_check
+#
+# =============================================================================
+
+import asyncio
+import os
+
+
+_ROLES = ("MELCHIOR-1", "BALTHASAR-2", "CASPER-3", "JUDGE")
+
+
+def _fake_model():
+    """共有モデルのラッパー（HedgedModel / LimitedModel）を外した FakeModel"""
+    from agents.fake_model import FakeModel
+    from agents.models import get_shared_model
+
+    model = get_shared_model()
+    while not isinstance(model, FakeModel):
+        model = model.model
+    return model
+
+
+async def _run_once() -> dict[str, dict]:
+    """判定モードを1回実行し、ロールごとの metrics イベントの data を返す"""
+    import backend
+
+    payload = {"question": "AIを導入すべきか？", "mode": "judge", "parallel": True, "cache": False}
+    metrics = {}
+    async for event in backend.invoke(payload):
+        if event.get("type") == "metrics":
+            metrics[event["agent"]] = event["data"]
+    assert set(metrics) == set(_ROLES), f"metrics イベントが揃っていません: {sorted(metrics)}"
+    return metrics
+
+
+def _reset() -> None:
+    """設定を切り替えるため、共有モデルとエージェントプールを作り直す"""
+    from agents.models import reset_shared_models
+    from agents.pool import get_agent_pool
+
+    reset_shared_models()
+    get_agent_pool().clear()
+
+
+def _check_bedrock_request(system_prompt_content: list[dict]) -> None:
+    """BedrockModel が組み立てる Converse リクエストの system を確認"""
+    from strands.models.bedrock import BedrockModel
+
+    model = BedrockModel(model_id="anthropic.claude-3-5-sonnet-20240620-v1:0", region_name="us-east-1")
+    request = model.format_request(
+        [{"role": "user", "content": [{"text": "確認"}]}],
+        system_prompt_content=system_prompt_content,
+    )
+    assert request["system"][-1] == {"cachePoint": {"type": "default"}}, request["system"]
+    assert "text" in request["system"][0]
+
+
+async def check_enabled() -> None:
+    os.environ["MAGI_PROMPT_CACHE"] = "on"
+    _reset()
+    model = _fake_model()
+
+    first = await _run_once()
+    systems = [request["system_prompt_content"] for request in model.requests]
+    assert systems and all(system[-1] == {"cachePoint": {"type": "default"}} for system in systems)
+    _check_bedrock_request(systems[0])
+
+    second = await _run_once()
+    for role in _ROLES:
+        assert first[role]["cache_write_tokens"] > 0 and first[role]["cache_read_tokens"] == 0, first[role]
+        assert second[role]["cache_read_tokens"] > 0 and second[role]["cache_write_tokens"] == 0, second[role]
+
+    print("MAGI_PROMPT_CACHE=on")
+    print(f"{'role':<14}{'1st write':>10}{'2nd read':>10}{'input':>8}")
+    for role in _ROLES:
+        print(f"{role:<14}{first[role]['cache_write_tokens']:>10}"
+              f"{second[role]['cache_read_tokens']:>10}{second[role]['input_tokens']:>8}")
+
+
+async def check_disabled() -> None:
+    os.environ["MAGI_PROMPT_CACHE"] = "off"
+    _reset()
+    model = _fake_model()
+
+    metrics = await _run_once()
+    assert not any(
+        "cachePoint" in block
+        for request in model.requests
+        for block in request["system_prompt_content"]
+    )
+    assert all(m["cache_read_tokens"] == 0 and m["cache_write_tokens"] == 0 for m in metrics.values())
+    print("MAGI_PROMPT_CACHE=off: cachePoint なし")
+
+
+def main() -> None:
+    os.environ.update(
+        MAGI_MODEL_BACKEND="fake",
+        MAGI_FAKE_TTFT="0.01",
+        MAGI_FAKE_TOKEN_DELAY="0.001",
+        MAGI_FAKE_TOKENS="20",
+    )
+    asyncio.run(check_enabled())
+    asyncio.run(check_disabled())
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# =============================================================================
+# quorum_check.py - クォーラム早期決定のイベント順序の確認（オフライン）
+# =============================================================================
+#
+# 3エージェントの判定の到着時刻を固定した台本どおりのストリームと、
+# FakeModel（MAGI_MODEL_BACKEND=fake）で動く JUDGE で _stream_judge_quorum() を実行し、
+# 次を確認します。Bedrock は呼び出しません。
+#
+#   台本: 2エージェントが先に「賛成」を返し（過半数確定）、3人目は
+#         JUDGE の統合分析より遅れて「反対」を返す
+#
+#   policy="continue":
+#     - decision は3人目より前に届く
+#     - final は3人目の判定の後に届き、agent_verdicts / vote_count に3人分を含む
+#   policy="continue" で3人目が期限切れ（agent_timeout）:
+#     - final は degraded になり、missing_agents に3人目を含む（判定は2人分）
+#   policy="cancel":
+#     - キャンセルされるのは判定を返していない3人目だけ（agent_cancelled）
+#     - 判定を返した2人は metrics イベントまで届き、agent_complete で終わる
+#     - final の agent_verdicts / vote_count は2人分
+#
+# 実行方法:
+#   cd agentcore && python -m bench.quorum_check
+#
+# =============================================================================
+
+import asyncio
+import os
+
+
+class _ScriptedAgent:
+    """delay 秒後に verdict を返し、続けて metrics を返すエージェント"""
+
+    def __init__(self, name: str, verdict: str, delay: float):
+        self.name = name
+        self.verdict = verdict
+        self.delay = delay
+
+    async def analyze_stream(self, question: str, hedge=None):
+        from agents.base import AgentVerdict
+
+        yield {"type": "thinking", "agent": self.name, "content": "検討中"}
+        await asyncio.sleep(self.delay)
+        yield {
+            "type": "verdict",
+            "agent": self.name,
+            "data": AgentVerdict(agent_name=self.name, verdict=self.verdict, reasoning="台本", confidence=0.9)
+        }
+        await asyncio.sleep(0.01)
+        yield {"type": "metrics", "agent": self.name, "data": {}}
+
+
+async def _run(policy: str, agent_timeout: float | None = None) -> list[dict]:
+    import backend
+    from pipeline.deadline import RequestDeadline
+
+    agents = [
+        _ScriptedAgent("MELCHIOR-1", "賛成", 0.05),
+        _ScriptedAgent("BALTHASAR-2", "賛成", 0.1),
+        _ScriptedAgent("CASPER-3", "反対", 1.0),
+    ]
+    async with backend.get_agent_pool().acouncil() as (_, judge):
+        deadline = RequestDeadline(agent_timeout=agent_timeout) if agent_timeout else None
+        stream = backend._stream_judge_quorum("クォーラムの確認", agents, judge, policy, deadline=deadline)
+        return [event async for event in stream]
+
+
+def _index(events: list[dict], type: str, agent: str | None = None) -> int:
+    for i, event in enumerate(events):
+        if event["type"] == type and (agent is None or event.get("agent") == agent):
+            return i
+    raise AssertionError(f"{type} {agent or ''} が届いていません: {[e['type'] for e in events]}")
+
+
+def check_continue() -> None:
+    events = asyncio.run(_run("continue"))
+    final = events[_index(events, "final")]["data"]
+    assert _index(events, "decision") < _index(events, "verdict", "CASPER-3"), "decision が3人目を待っています"
+    assert _index(events, "verdict", "CASPER-3") < _index(events, "final"), "final が3人目の判定より前に届いています"
+    assert _index(events, "judge_complete") == _index(events, "final") - 1
+    assert [v.agent_name for v in final.agent_verdicts] == ["MELCHIOR-1", "BALTHASAR-2", "CASPER-3"]
+    assert final.vote_count == {"賛成": 2, "反対": 1}, final.vote_count
+    assert final.verdict == "承認"
+    print(f"  continue: {[e['type'] for e in events if e['type'] not in ('thinking', 'judge_thinking')]}")
+
+
+def check_continue_timeout() -> None:
+    events = asyncio.run(_run("continue", agent_timeout=0.5))
+    final = events[_index(events, "final")]["data"]
+    assert _index(events, "decision") < _index(events, "agent_timeout", "CASPER-3") < _index(events, "final")
+    assert final.degraded and final.missing_agents == ["CASPER-3"], (final.degraded, final.missing_agents)
+    assert [v.agent_name for v in final.agent_verdicts] == ["MELCHIOR-1", "BALTHASAR-2"]
+    assert final.vote_count == {"賛成": 2, "反対": 0}, final.vote_count
+    print(f"  timeout:  degraded={final.degraded}  missing_agents={final.missing_agents}")
+
+
+def check_cancel() -> None:
+    events = asyncio.run(_run("cancel"))
+    final = events[_index(events, "final")]["data"]
+    cancelled = [e["agent"] for e in events if e["type"] == "agent_cancelled"]
+    completed = [e["agent"] for e in events if e["type"] == "agent_complete"]
+    metrics = [e["agent"] for e in events if e["type"] == "metrics" and e["agent"] != "JUDGE"]
+    assert cancelled == ["CASPER-3"], f"判定を返したエージェントがキャンセルされています: {cancelled}"
+    assert sorted(completed) == sorted(metrics) == ["BALTHASAR-2", "MELCHIOR-1"], (completed, metrics)
+    assert final.vote_count == {"賛成": 2, "反対": 0}, final.vote_count
+    assert len(final.agent_verdicts) == 2
+    print(f"  cancel:   {[e['type'] for e in events if e['type'] not in ('thinking', 'judge_thinking')]}")
+
+
+def main() -> None:
+    os.environ.update(
+        MAGI_MODEL_BACKEND="fake",
+        MAGI_FAKE_TTFT="0.02",
+        MAGI_FAKE_TOKEN_DELAY="0.005",
+        MAGI_FAKE_TOKENS="20",
+    )
+    check_continue()
+    check_continue_timeout()
+    check_cancel()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
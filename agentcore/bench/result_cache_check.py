@@ -0,0 +1,91 @@
+# =============================================================================
+# result_cache_check.py - 結果キャッシュのヒット経路の確認（オフライン）
+# =============================================================================
+#
+# FakeModel（MAGI_MODEL_BACKEND=fake）と MAGI_CACHE_BACKEND=sqlite で次を確認します。
+# Bedrock は呼び出しません。
+#
+#   1. ResultCache は抽象基底クラスで、直接インスタンス化できないこと
+#   2. SQLiteResultCache の get() / set() がイベントループのスレッドで実行されないこと
+#   3. キャッシュにヒットしたリクエストは、エージェントをプールから借りないこと
+#      （created / reused が増えない）
+#
+# 実行方法:
+#   cd agentcore && python -m bench.result_cache_check
+#
+# =============================================================================
+
+import asyncio
+import os
+import tempfile
+import threading
+
+
+def _checkouts() -> int:
+    import backend
+
+    return sum(stats["created"] + stats["reused"] for stats in backend.get_agent_pool().stats().values())
+
+
+async def _run(payload: dict) -> bool:
+    """invoke() を最後まで読み、cached だったかを返す"""
+    import backend
+
+    cached = False
+    async for event in backend.invoke({"coalesce": False, **payload}):
+        cached = cached or bool(event.get("cached"))
+    return cached
+
+
+async def check(mode: str, io_threads: set[int]) -> None:
+    payload = {"question": f"キャッシュの確認（{mode}）", "mode": mode, "parallel": True}
+    loop_thread = threading.get_ident()
+
+    assert not await _run(payload)
+    before = _checkouts()
+    assert await _run(payload), "2回目のリクエストがキャッシュから再生されていません"
+    assert _checkouts() == before, f"キャッシュヒットでエージェントを借りています: {before} → {_checkouts()}"
+    assert io_threads and loop_thread not in io_threads, "SQLite の I/O がイベントループで実行されています"
+    print(f"  {mode:<6} ヒット時の貸し出し 0件  SQLite I/O スレッド {len(io_threads)}件（ループ外）")
+
+
+def main() -> None:
+    directory = tempfile.mkdtemp()
+    os.environ.update(
+        MAGI_MODEL_BACKEND="fake",
+        MAGI_FAKE_TTFT="0.02",
+        MAGI_FAKE_TOKEN_DELAY="0.005",
+        MAGI_FAKE_TOKENS="20",
+        MAGI_CACHE_BACKEND="sqlite",
+        MAGI_CACHE_PATH=os.path.join(directory, "result_cache.sqlite3"),
+    )
+    from pipeline.cache import ResultCache, SQLiteResultCache, get_result_cache
+
+    try:
+        ResultCache()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("ResultCache が抽象基底クラスになっていません")
+
+    cache = get_result_cache()
+    assert isinstance(cache, SQLiteResultCache)
+    io_threads: set[int] = set()
+    get, set_ = cache.get, cache.set
+
+    def traced_get(key):
+        io_threads.add(threading.get_ident())
+        return get(key)
+
+    def traced_set(key, events):
+        io_threads.add(threading.get_ident())
+        set_(key, events)
+
+    cache.get, cache.set = traced_get, traced_set
+    for mode in ("judge", "chat"):
+        asyncio.run(check(mode, io_threads))
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
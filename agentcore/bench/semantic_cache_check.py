@@ -0,0 +1,105 @@
+# =============================================================================
+# semantic_cache_check.py - 類似質問キャッシュの一致・不一致と速度の確認（オフライン）
+# =============================================================================
+#
+# pipeline/semantic_cache.py の SemanticResultCache（デフォルトの閾値）で次を確認します。
+#
+#   1. 言い換え（語順・文末表現・記号・空白の違い）はヒットすること
+#   2. 否定（「導入すべきでない」）・別の話題（「教育に」）・別の対象は
+#      ヒットしないこと（逆の判定や無関係な判定を返さない）
+#   3. 署名の計算時間と、--entries 件を登録した状態の検索時間（1件あたり）
+#
+# 実行方法:
+#   cd agentcore && python -m bench.semantic_cache_check
+#   cd agentcore && python -m bench.semantic_cache_check --entries 100000
+#
+# =============================================================================
+
+import argparse
+import random
+import time
+
+from pipeline.semantic_cache import MinHashLSHIndex, SemanticResultCache, normalize_for_similarity
+
+
+_SCOPE = "judge"
+_SEED = "AIを業務に導入すべきか？"
+
+# ヒットすべき言い換え
+_POSITIVE = (
+    "業務にAIを導入すべきでしょうか",
+    "AIを業務に導入するべきか",
+    "AI を業務に導入すべきですか。",
+    "ＡＩを業務に導入すべきか?",
+)
+
+# ヒットしてはいけない問いかけ（否定・別の話題・別の対象）
+_NEGATIVE = (
+    "AIを業務に導入すべきでない",
+    "AIを業務に導入すべきではないか？",
+    "AIを業務に導入すべきではありませんか",
+    "AIを業務に導入すべきか否か",
+    "AIを教育に導入すべきか？",
+    "AIを業務から排除すべきか？",
+    "AIを業務で活用すべきか？",
+    "ロボットを業務に導入すべきか？",
+)
+
+
+def check_matches() -> None:
+    cache = SemanticResultCache()
+    cache.set(_SEED, _SCOPE, [{"type": "final", "data": {"final_verdict": "承認"}}])
+    index = cache.index
+    seed_shingles = index.shingles(normalize_for_similarity(_SEED))
+
+    print(f"閾値 {cache.threshold}、登録: {_SEED}")
+    for expected, questions in ((True, _POSITIVE), (False, _NEGATIVE)):
+        for question in questions:
+            score = index.jaccard(seed_shingles, index.shingles(normalize_for_similarity(question)))
+            hit = cache.get(question, _SCOPE) is not None
+            print(f"  {'hit ' if hit else 'miss'}  jaccard={score:.3f}  {question}")
+            assert hit == expected, f"{question}: {'ヒットすべき' if expected else 'ヒットしてはいけない'}"
+
+
+def check_speed(entries: int) -> None:
+    # 常用漢字の範囲から文字を選んだ、互いに似ていない問いかけ（実際の問いかけの分布に近い）
+    rng = random.Random(0)
+    index = MinHashLSHIndex()
+    texts = [
+        normalize_for_similarity(
+            "".join(chr(rng.randrange(0x4E00, 0x6000)) for _ in range(rng.randrange(6, 14))) + "を導入すべきか"
+        )
+        for _ in range(entries)
+    ]
+
+    started_at = time.perf_counter()
+    for i, text in enumerate(texts):
+        index.add(str(i), _SCOPE, text)
+    add_ms = (time.perf_counter() - started_at) * 1000 / entries
+
+    sample = texts[:: max(1, entries // 1000)]
+    started_at = time.perf_counter()
+    for text in sample:
+        index.signature(text)
+    signature_ms = (time.perf_counter() - started_at) * 1000 / len(sample)
+
+    started_at = time.perf_counter()
+    for text in sample:
+        assert index.query(_SCOPE, text, 0.8) is not None
+    query_ms = (time.perf_counter() - started_at) * 1000 / len(sample)
+
+    print(f"\n{entries}件: signature {signature_ms:.3f}ms  add {add_ms:.3f}ms  query {query_ms:.3f}ms（1件あたり）")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="類似質問キャッシュの一致・不一致と速度の確認")
+    parser.add_argument("--entries", type=int, default=20000, help="速度の計測で登録する件数")
+    args = parser.parse_args()
+
+    check_matches()
+    check_speed(args.entries)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# =============================================================================
+# session_check.py - 会話セッションの保存先の確認（オフライン）
+# =============================================================================
+#
+# pipeline/sessions.py の SessionStore で次を確認します。
+#
+#   1. _fit(): 256KiB を超えるセッションが上限に収まり、各会話は新しい方の
+#      ターンが残ること。以前の方式（ターンを1つ削るたびに全体と各キーを
+#      JSON 化し直す）より速いこと
+#   2. aget() / aput() の get() / put() がイベントループのスレッドで実行されないこと
+#   3. 退避先（spill_dir）:
+#      - ttl を過ぎたファイル・中断された一時ファイルが走査で削除されること
+#        （ストア生成時の走査で、前回のプロセスが残したものも消える）
+#      - 合計が max_spill_bytes を超えないこと（古く使われたものから削除）
+#      - 同じセッションの退避が同時に走っても失敗せず、一時ファイルが残らないこと
+#
+# 実行方法:
+#   cd agentcore && python -m bench.session_check
+#
+# =============================================================================
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import timeit
+
+from pipeline.sessions import JUDGE_KEY, SessionStore, _drop_oldest_turn, _size_of
+
+
+_KEYS = ("MELCHIOR-1", "BALTHASAR-2", "CASPER-3", JUDGE_KEY)
+
+
+def _conversations(turns: int) -> dict[str, list[dict]]:
+    """1ターン（ユーザー + アシスタント）が 600 バイト程度の会話履歴"""
+    return {
+        key: [
+            message
+            for turn in range(turns)
+            for message in (
+                {"role": "user", "content": [{"text": f"{key} の質問 {turn}。" * 8}]},
+                {"role": "assistant", "content": [{"text": f"{key} の回答 {turn}。" * 12}]},
+            )
+        ]
+        for key in _KEYS
+    }
+
+
+def _fit_before(store: SessionStore, conversations: dict[str, list[dict]]) -> tuple[dict, int]:
+    """以前の _fit()（比較用）"""
+    conversations = {key: list(messages) for key, messages in conversations.items()}
+    size = _size_of(conversations)
+    while size > store.max_session_bytes and any(conversations.values()):
+        key = max(conversations, key=lambda k: len(json.dumps(conversations[k], default=str)))
+        conversations[key] = _drop_oldest_turn(conversations[key])
+        size = _size_of(conversations)
+    return conversations, size
+
+
+def check_fit() -> None:
+    store = SessionStore()
+    conversations = _conversations(300)
+    before = _fit_before(store, conversations)
+    after = store._fit(conversations)
+    assert after[1] == _size_of(after[0]) <= store.max_session_bytes, "サイズの計算が JSON 化と一致しません"
+    for key, messages in after[0].items():
+        assert messages and messages == conversations[key][-len(messages):], f"{key}: 新しいターンが残っていません"
+    # 以前の方式（エスケープ後の文字数で比べる）とは、どのキーを削るかが少し異なるだけ
+    assert abs(sum(map(len, after[0].values())) - sum(map(len, before[0].values()))) <= 4
+
+    seconds = {
+        name: min(timeit.repeat(lambda: fit(conversations), number=1, repeat=3))
+        for name, fit in (("before", lambda c: _fit_before(store, c)), ("after", store._fit))
+    }
+    print(
+        f"  _fit: {_size_of(conversations) // 1024}KiB → {after[1] // 1024}KiB  "
+        f"before {seconds['before'] * 1000:.0f}ms → after {seconds['after'] * 1000:.1f}ms"
+        f"（{seconds['before'] / seconds['after']:.0f}x）"
+    )
+
+
+async def check_async() -> None:
+    store = SessionStore()
+    threads: set[int] = set()
+    get, put = store.get, store.put
+
+    def traced_get(session_id):
+        threads.add(threading.get_ident())
+        return get(session_id)
+
+    def traced_put(session_id, conversations):
+        threads.add(threading.get_ident())
+        put(session_id, conversations)
+
+    store.get, store.put = traced_get, traced_put
+    await store.aput("async", _conversations(3))
+    assert await store.aget("async") is not None
+    assert threads and threading.get_ident() not in threads, "get() / put() がイベントループで実行されています"
+    print(f"  aget / aput: スレッド {len(threads)}件（ループ外）")
+
+
+def _spilled_files(directory: str) -> list[str]:
+    return sorted(os.listdir(directory))
+
+
+def check_spill() -> None:
+    directory = tempfile.mkdtemp()
+
+    # ttl を過ぎたファイルと、中断された一時ファイルを残しておく
+    stale = [os.path.join(directory, "stale.json"), os.path.join(directory, "stale.json1234.tmp")]
+    for path in stale:
+        with open(path, "w") as f:
+            f.write("{}")
+        os.utime(path, (time.time() - 120, time.time() - 120))
+    store = SessionStore(max_sessions=1, ttl=60, spill_dir=directory)
+    assert not any(os.path.exists(path) for path in stale), "前回の期限切れのファイルが残っています"
+
+    # 期限切れになった退避ファイルは、次の走査で削除される
+    store.put("a", _conversations(2))
+    store.put("b", _conversations(2))
+    (spilled,) = _spilled_files(directory)
+    used_at = time.time() - 120
+    os.utime(os.path.join(directory, spilled), (used_at, used_at))
+    assert store.sweep_spilled() == 1 and not _spilled_files(directory)
+    print(f"  走査: 生成時に {len(stale)}件、期限切れ 1件を削除")
+
+    # 合計の上限
+    file_size = len(json.dumps({"used_at": 0.0, "conversations": _conversations(2)}, ensure_ascii=False))
+    store = SessionStore(max_sessions=1, ttl=60, spill_dir=directory, max_spill_bytes=file_size * 3)
+    for i in range(10):
+        store.put(f"s{i}", _conversations(2))
+        time.sleep(0.01)
+    total = sum(os.path.getsize(os.path.join(directory, name)) for name in _spilled_files(directory))
+    assert total <= store.max_spill_bytes, f"退避先が上限を超えています: {total} > {store.max_spill_bytes}"
+    assert store.get("s8") is not None, "最後に退避したセッションが削除されています"
+    print(f"  上限: 10件退避 → {len(_spilled_files(directory))}件 {total}B（上限 {store.max_spill_bytes}B）")
+
+    # 同じセッションの同時退避
+    store = SessionStore(max_sessions=1, ttl=60, spill_dir=tempfile.mkdtemp())
+    store.put("same", _conversations(2))
+    session = store._sessions["same"]
+    errors: list[BaseException] = []
+
+    def spill() -> None:
+        try:
+            for _ in range(20):
+                store._spill("same", session)
+        except BaseException as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=spill) for _ in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert not errors, f"同時退避が失敗しました: {errors[0]!r}"
+    assert _spilled_files(store.spill_dir) == [os.path.basename(store._spill_path("same"))], "一時ファイルが残っています"
+    print("  同時退避: 8スレッド x 20回 成功、一時ファイルなし")
+
+
+def main() -> None:
+    check_fit()
+    asyncio.run(check_async())
+    check_spill()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
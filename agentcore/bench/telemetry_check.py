@@ -0,0 +1,110 @@
+# =============================================================================
+# telemetry_check.py - OpenTelemetry のスパン・ヒストグラムの確認（オフライン）
+# =============================================================================
+#
+# メモリへのエクスポーター（pipeline/telemetry.py の configure_local_telemetry）を
+# 設定し、FakeModel（MAGI_MODEL_BACKEND=fake）で判定モード・会話モードを
+# 1回ずつ実行して、次を確認・表示します。Bedrock は呼び出しません。
+#
+#   - スパンの親子関係（magi.request の下にエージェント・JUDGE・多数決・直列化）
+#   - エージェントのスパンに metrics イベントの値が付いていること
+#   - magi.ttft / magi.request.duration ヒストグラムのモードごとの件数
+#
+# 実行方法:
+#   cd agentcore && python -m bench.telemetry_check
+#   cd agentcore && MAGI_OTEL_EXPORTER=console python -m bench.telemetry_check  # コンソールに出力
+#
+# =============================================================================
+
+import asyncio
+import os
+
+
+# モードごとに magi.request の下にあるべきスパン
+_EXPECTED_SPANS = {
+    "judge": {"magi.agent.analyze", "magi.judge.vote_count", "magi.judge.integrate", "magi.serialize"},
+    "chat": {"magi.agent.respond", "magi.judge.chat", "magi.serialize"},
+}
+
+
+async def _run(mode: str) -> None:
+    import backend
+
+    payload = {"question": "AIを導入すべきか？", "mode": mode, "parallel": True, "cache": False}
+    async for _ in backend.invoke(payload):
+        pass
+
+
+def _print_tree(spans) -> None:
+    """スパンを親子関係のツリーで表示"""
+    children: dict[int | None, list] = {}
+    for span in spans:
+        parent = span.parent.span_id if span.parent else None
+        children.setdefault(parent, []).append(span)
+
+    def show(span, depth: int) -> None:
+        duration_ms = (span.end_time - span.start_time) / 1e6
+        attributes = {k: v for k, v in span.attributes.items() if k.startswith("magi.")}
+        print(f"{'  ' * depth}{span.name} {duration_ms:.1f}ms {attributes}")
+        for child in sorted(children.get(span.context.span_id, []), key=lambda s: s.start_time):
+            show(child, depth + 1)
+
+    for root in children.get(None, []):
+        show(root, 0)
+
+
+def _histogram_counts(metric_reader) -> dict[tuple[str, str], int]:
+    """ヒストグラムごと・モードごとの記録件数"""
+    counts: dict[tuple[str, str], int] = {}
+    for resource_metrics in metric_reader.get_metrics_data().resource_metrics:
+        for scope_metrics in resource_metrics.scope_metrics:
+            for metric in scope_metrics.metrics:
+                if metric.name not in ("magi.ttft", "magi.request.duration"):
+                    continue  # Strands 自身のメトリクス・カウンター
+                for point in metric.data.data_points:
+                    key = (metric.name, point.attributes.get("magi.mode"))
+                    counts[key] = counts.get(key, 0) + point.count
+    return counts
+
+
+def main() -> None:
+    os.environ.update(
+        MAGI_MODEL_BACKEND="fake",
+        MAGI_FAKE_TTFT="0.02",
+        MAGI_FAKE_TOKEN_DELAY="0.001",
+        MAGI_FAKE_TOKENS="20",
+    )
+    exporter = os.environ.pop("MAGI_OTEL_EXPORTER", "memory")
+    from pipeline.telemetry import configure_local_telemetry
+
+    span_exporter, metric_reader = configure_local_telemetry(exporter)
+    if exporter != "memory":
+        for mode in _EXPECTED_SPANS:
+            asyncio.run(_run(mode))
+        return
+
+    for mode, expected in _EXPECTED_SPANS.items():
+        span_exporter.clear()
+        asyncio.run(_run(mode))
+        spans = span_exporter.get_finished_spans()
+        print(f"\n--- mode={mode} ---")
+        _print_tree(spans)
+
+        request = next(s for s in spans if s.name == "magi.request")
+        under_request = {s.name for s in spans if s.parent and s.parent.span_id == request.context.span_id}
+        assert expected <= under_request, f"magi.request の下に {expected - under_request} がありません"
+        agents = [s for s in spans if s.name.startswith("magi.") and s.attributes.get("magi.agent")]
+        assert all("magi.ttft_ms" in s.attributes for s in agents), "metrics の値がスパンにありません"
+
+    counts = _histogram_counts(metric_reader)
+    print("\nヒストグラムの記録件数:")
+    for (name, mode), count in sorted(counts.items()):
+        print(f"  {name} mode={mode}: {count}")
+    for mode in _EXPECTED_SPANS:
+        assert counts.get(("magi.ttft", mode)) == 4
+        assert counts.get(("magi.request.duration", mode)) == 1
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
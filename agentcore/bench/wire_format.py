@@ -0,0 +1,143 @@
+# =============================================================================
+# wire_format.py - 送信形式ごとのバイト数・パース時間の比較（オフライン）
+# =============================================================================
+#
+# FakeModel（MAGI_MODEL_BACKEND=fake）で invoke() を1度実行してイベントを集め、
+# 同じイベント列を送信形式（json / packed、差分モードあり/なし）ごとに
+# 変換して次を比較します。
+# Bedrock は呼び出しません。
+#
+# packed は届いているイベントをまとめて送るため、集めたときのイベントの間隔
+# （0.5ms 以上空いたもの）を再現しながら変換します。
+#
+#   - frames: SSE のフレーム数
+#   - bytes: AgentCore Runtime が送る SSE（data: {JSON}\n\n）の合計バイト数
+#   - parse_ms: クライアント側の復元時間（SSE の行分割 → json.loads → フレーム復元）
+#
+# 実行方法:
+#   cd agentcore && python -m bench.wire_format
+#   cd agentcore && python -m bench.wire_format --interval-ms 0  # thinking をまとめない
+#   cd agentcore && python -m bench.wire_format --tokens 200 --repeat 500
+#
+# =============================================================================
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import time
+
+
+# これより短いイベントの間隔は、同時に届いたものとして再現する
+_GAP_SECONDS = 0.0005
+
+# パース時間の計測を繰り返す回数（最小値を表示）
+_ROUNDS = 10
+
+_VARIANTS = [
+    ("json", False),
+    ("json", True),
+    ("packed", False),
+    ("packed", True),
+]
+
+
+def _to_sse(value) -> bytes:
+    """AgentCore Runtime と同じ方法で SSE に変換"""
+    return f"data: {json.dumps(value, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def _parse(body: bytes) -> list[dict]:
+    """クライアント側の復元（frontend.py の invoke_magi_agent と同じ手順）"""
+    from pipeline.wire import FrameDecoder
+
+    decoder = FrameDecoder()
+    events: list[dict] = []
+    for line in body.decode("utf-8").split("\n"):
+        if line.startswith("data: "):
+            events.extend(decoder.decode(json.loads(line[6:])))
+    return events
+
+
+async def _capture(payload: dict) -> list[tuple[float, dict]]:
+    """invoke() を1度実行し、送信前のイベントを届いた時刻とともに集める"""
+    import backend
+
+    return [(time.perf_counter(), event) async for event in backend.invoke(payload)]
+
+
+async def _encode(captured: list[tuple[float, dict]], encoding: str, delta: bool) -> bytes:
+    """集めたイベントを届いた間隔どおりに流し、指定の送信形式で SSE のバイト列にする"""
+    from pipeline.wire import encode_stream
+
+    async def replay():
+        previous_at = captured[0][0]
+        for arrived_at, event in captured:
+            if arrived_at - previous_at >= _GAP_SECONDS:
+                await asyncio.sleep(arrived_at - previous_at)
+            previous_at = arrived_at
+            yield event
+
+    chunks = [_to_sse(value) async for value in encode_stream(replay(), encoding, delta)]
+    return b"".join(chunks)
+
+
+async def run(mode: str, repeat: int, interval_ms: int) -> None:
+    """1モード分の比較を表示（全形式で同じイベント列を使う）"""
+    captured = await _capture({
+        "question": "AIを導入すべきか？",
+        "mode": mode,
+        "parallel": True,
+        "coalesce": False,
+        "cache": False,
+        "thinking_interval_ms": interval_ms,
+    })
+    events = [event for _, event in captured]
+
+    print(f"\n--- mode={mode} thinking_interval_ms={interval_ms} ---")
+    print(f"{'encoding':<10}{'delta':<7}{'events':>8}{'frames':>8}{'bytes':>10}{'ratio':>8}{'parse_ms':>10}{'ratio':>8}")
+    bodies = []
+    for encoding, delta in _VARIANTS:
+        body = await _encode(captured, encoding, delta)
+        # どの形式でも元のイベントに戻ること
+        assert _parse(body) == events, f"{encoding}/{delta} で復元結果が一致しません"
+        bodies.append(body)
+
+    # ホストの揺らぎが特定の形式に偏らないよう、形式を交互に計測して各形式の最小値を使う
+    parse_ms = [float("inf")] * len(bodies)
+    gc.disable()
+    try:
+        for _ in range(_ROUNDS):
+            for i, body in enumerate(bodies):
+                started_at = time.perf_counter()
+                for _ in range(repeat):
+                    _parse(body)
+                parse_ms[i] = min(parse_ms[i], (time.perf_counter() - started_at) * 1000 / repeat)
+    finally:
+        gc.enable()
+
+    for (encoding, delta), body, ms in zip(_VARIANTS, bodies, parse_ms):
+        print(f"{encoding:<10}{str(delta):<7}{len(events):>8}{body.count(b'data: '):>8}{len(body):>10}"
+              f"{len(body) / len(bodies[0]):>8.2f}{ms:>10.3f}{ms / parse_ms[0]:>8.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="送信形式ごとのバイト数・パース時間の比較")
+    parser.add_argument("--tokens", type=int, default=80, help="フェイクモデルの思考トークン数")
+    parser.add_argument("--repeat", type=int, default=100, help="パース時間の1回の計測で復元する回数")
+    parser.add_argument("--interval-ms", type=int, default=50, help="thinking をまとめる時間幅（0 でまとめない）")
+    args = parser.parse_args()
+
+    os.environ.update(
+        MAGI_MODEL_BACKEND="fake",
+        MAGI_FAKE_TTFT="0.01",
+        MAGI_FAKE_TOKEN_DELAY="0.001",
+        MAGI_FAKE_TOKENS=str(args.tokens),
+    )
+    for mode in ("judge", "chat"):
+        asyncio.run(run(mode, args.repeat, args.interval_ms))
+
+
+if __name__ == "__main__":
+    main()
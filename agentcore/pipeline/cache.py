@@ -0,0 +1,397 @@
+# =============================================================================
+# cache.py - 判定結果キャッシュ
+# =============================================================================
+#
+# 同じ問いかけ（例: 複数チームからの同じ方針質問）に対して、
+# 毎回4回のLLM呼び出しを行わずに済むよう、判定結果をキャッシュします。
+#
+# 主要コンポーネント:
+# - normalize_question(): 問いかけの正規化（NFKC・空白の統一）
+# - make_cache_scope(): キャッシュの検索範囲（モード・プロンプト・モデル）の生成
+# - make_cache_key(): キャッシュキーの生成
+# - ResultCache: キャッシュの抽象基底クラス（バックエンドの差し替え口）
+# - MemoryResultCache: プロセス内メモリ（LRU + TTL）
+# - SQLiteResultCache: ローカルディスク上のSQLite（LRU + TTL）
+# - replay_cached_events(): キャッシュした結果をイベントとして再生
+# - get_result_cache(): 環境変数の設定に従ったプロセス共有キャッシュ
+#
+# キャッシュキーの構成:
+#   正規化した問いかけ + モード + 回答形式 + 各ペルソナ/JUDGEの
+#   システムプロンプトのハッシュ + モデルID
+#   → プロンプトやモデルを変更すると古い結果は自動的に使われなくなる
+#
+# キャッシュする内容:
+#   各エージェントの判定（verdict / response イベント）と
+#   最終判定（final / chat_response イベント）。
+#   thinking などの途中経過は保存しない。
+#
+# イベントループからは aget() / aset() を使う。ディスク I/O を行うバックエンド
+# （blocking = True の SQLiteResultCache）はスレッドで実行し、ループを止めない。
+#
+# 設定（環境変数）:
+#   MAGI_CACHE_BACKEND: none | memory | sqlite（デフォルト: none）
+#   MAGI_CACHE_TTL: 有効期間・秒（デフォルト: 3600）
+#   MAGI_CACHE_MAX_ENTRIES: 最大件数（デフォルト: 1024）
+#   MAGI_CACHE_PATH: SQLiteファイルのパス（デフォルト: 一時ディレクトリ）
+#
+# =============================================================================
+
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Iterator
+
+
+# =============================================================================
+# キャッシュキー
+# =============================================================================
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """
+    問いかけを正規化
+
+    - NFKC 正規化（全角英数字・記号を半角に統一）
+    - 前後の空白を除去し、連続する空白を1つにまとめる
+    - 英字を小文字に統一
+
+    Args:
+        question: 元の問いかけ
+
+    Returns:
+        正規化した問いかけ
+    """
+    text = unicodedata.normalize("NFKC", question)
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text.lower()
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_cache_scope(
+    mode: str,
+    format: str | None,
+    system_prompts: list[str],
+    model_id: str
+) -> str:
+    """
+    キャッシュの検索範囲（問いかけ以外の構成要素）を生成
+
+    類似質問キャッシュ（pipeline/semantic_cache.py）でも、
+    異なるモード・プロンプト・モデルの結果を混同しないために使います。
+
+    Args:
+        mode: "judge" | "chat"
+        format: 回答形式（judgeモードでは None）
+        system_prompts: 各ペルソナ・JUDGEのシステムプロンプト
+        model_id: 使用するモデルID
+
+    Returns:
+        SHA-256 の16進文字列
+    """
+    material = json.dumps(
+        {
+            "mode": mode,
+            "format": format,
+            "prompts": [_sha256(prompt) for prompt in system_prompts],
+            "model_id": model_id,
+        },
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return _sha256(material)
+
+
+def make_cache_key(question: str, scope: str) -> str:
+    """
+    キャッシュキーを生成
+
+    Args:
+        question: 問いかけ（内部で正規化する）
+        scope: make_cache_scope() で生成した検索範囲
+
+    Returns:
+        SHA-256 の16進文字列
+    """
+    return _sha256(f"{scope}:{normalize_question(question)}")
+
+
+# =============================================================================
+# キャッシュバックエンド
+# =============================================================================
+
+class ResultCache(ABC):
+    """
+    判定結果キャッシュの抽象基底クラス
+
+    値は JSON 化可能なイベント辞書のリストです。
+    サブクラスは get() / set() / clear() / __len__() を実装します。
+    get() / set() がブロッキング I/O を行う場合は blocking = True にすると、
+    aget() / aset() がスレッドで実行します。
+
+    Attributes:
+        max_entries: 最大件数（超えたら最も古く使われたものから削除）
+        ttl: 有効期間（秒）
+        blocking: get() / set() がディスク・ネットワーク I/O を行うか
+    """
+
+    blocking = False
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, key: str) -> list[dict] | None:
+        """キャッシュを取得（なければ None）"""
+
+    @abstractmethod
+    def set(self, key: str, events: list[dict]) -> None:
+        """キャッシュを保存"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """キャッシュをすべて削除"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """保存している件数"""
+
+    async def aget(self, key: str) -> list[dict] | None:
+        """get() をイベントループを止めずに実行"""
+        if self.blocking:
+            return await asyncio.to_thread(self.get, key)
+        return self.get(key)
+
+    async def aset(self, key: str, events: list[dict]) -> None:
+        """set() をイベントループを止めずに実行"""
+        if self.blocking:
+            await asyncio.to_thread(self.set, key, events)
+        else:
+            self.set(key, events)
+
+    def stats(self) -> dict:
+        """
+        キャッシュの統計情報
+
+        Returns:
+            dict: {"backend", "entries", "hits", "misses", "max_entries", "ttl"}
+        """
+        return {
+            "backend": type(self).__name__,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+        }
+
+
+class MemoryResultCache(ResultCache):
+    """
+    プロセス内メモリのキャッシュ（LRU + TTL）
+
+    OrderedDict の並び順を「最後に使われた順」として扱います。
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0):
+        super().__init__(max_entries, ttl)
+        # キー → (有効期限, イベントリスト)
+        self._entries: OrderedDict[str, tuple[float, list[dict]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> list[dict] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # 呼び出し側でイベントを書き換えてもキャッシュが壊れないようにコピー
+            return copy.deepcopy(entry[1])
+
+    def set(self, key: str, events: list[dict]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(events))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteResultCache(ResultCache):
+    """
+    ローカルディスク上のSQLiteキャッシュ（LRU + TTL）
+
+    プロセスを再起動しても結果が残ります。
+    accessed_at 列を「最後に使われた時刻」として LRU 削除に使います。
+    ディスク I/O を行うため、イベントループからは aget() / aset() で使います。
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 1024, ttl: float = 3600.0):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                events TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)")
+
+    def get(self, key: str) -> list[dict] | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT events, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, events: list[dict]) -> None:
+        now = time.time()
+        payload = json.dumps(events, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, events, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, payload, now + self.ttl, now)
+            )
+            # 期限切れを削除してから、件数超過分を最も古く使われた順に削除
+            self._conn.execute("DELETE FROM results WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                """
+                DELETE FROM results WHERE key IN (
+                    SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+# =============================================================================
+# キャッシュしたイベントの再生
+# =============================================================================
+
+def replay_cached_events(events: list[dict], **marker) -> Iterator[dict]:
+    """
+    キャッシュした結果を、通常実行と同じ形のイベント列として再生
+
+    エージェントのイベント（"agent" を持つもの）は agent_start / agent_complete で、
+    最終判定は judge_start / judge_complete で囲みます。
+    キャッシュから返したイベントには "cached": True を付与します。
+
+    Args:
+        events: キャッシュしたイベントリスト
+        **marker: 結果イベントに追加で付与する項目（類似度など）
+
+    Yields:
+        dict: イベント辞書
+    """
+    for event in events:
+        if "agent" in event:
+            yield {"type": "agent_start", "agent": event["agent"]}
+            yield {**event, "cached": True, **marker}
+            yield {"type": "agent_complete", "agent": event["agent"]}
+        else:
+            yield {"type": "judge_start"}
+            yield {"type": "judge_complete"}
+            yield {**event, "cached": True, **marker}
+
+
+# =============================================================================
+# プロセス共有キャッシュ
+# =============================================================================
+
+_result_cache: ResultCache | None = None
+_result_cache_loaded = False
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache | None:
+    """
+    環境変数の設定に従ったプロセス共有キャッシュを取得
+
+    Returns:
+        ResultCache | None: MAGI_CACHE_BACKEND=none（デフォルト）の場合は None
+    """
+    global _result_cache, _result_cache_loaded
+    with _result_cache_lock:
+        if not _result_cache_loaded:
+            _result_cache = _create_result_cache()
+            _result_cache_loaded = True
+        return _result_cache
+
+
+def set_result_cache(cache: ResultCache | None) -> None:
+    """プロセス共有キャッシュを差し替える（独自バックエンド・テスト用）"""
+    global _result_cache, _result_cache_loaded
+    with _result_cache_lock:
+        _result_cache = cache
+        _result_cache_loaded = True
+
+
+def _create_result_cache() -> ResultCache | None:
+    """環境変数からキャッシュを生成"""
+    backend = os.environ.get("MAGI_CACHE_BACKEND", "none").lower()
+    ttl = float(os.environ.get("MAGI_CACHE_TTL", "3600"))
+    max_entries = int(os.environ.get("MAGI_CACHE_MAX_ENTRIES", "1024"))
+
+    if backend == "memory":
+        return MemoryResultCache(max_entries=max_entries, ttl=ttl)
+    if backend == "sqlite":
+        path = os.environ.get(
+            "MAGI_CACHE_PATH",
+            os.path.join(tempfile.gettempdir(), "magi_result_cache.sqlite3")
+        )
+        return SQLiteResultCache(path, max_entries=max_entries, ttl=ttl)
+    if backend == "none":
+        return None
+    raise ValueError(f"MAGI_CACHE_BACKEND は none | memory | sqlite のいずれかです: {backend}")
@@ -0,0 +1,167 @@
+# =============================================================================
+# coalesce.py - thinking イベントのまとめ送り
+# =============================================================================
+#
+# analyze_stream / respond_stream は、モデルの data チャンク（数文字程度）ごとに
+# {"type": "thinking"} を1つ返します。そのままでは1チャンクごとに
+# SSE フレーム1つ・フロントエンドでの JSON パース1回が発生します。
+#
+# このモジュールは、同じエージェントの連続した thinking チャンクを
+# 「N ミリ秒ごと」または「M バイトごと」に1つのイベントへまとめます。
+#
+# 主要コンポーネント:
+# - coalesce_thinking(): イベントストリームに、まとめ送りの段を挟む
+#
+# ルール:
+#   - まとめる対象: thinking / judge_thinking / reasoning
+#     （同じ type・同じ agent のチャンク同士を連結）
+#   - それ以外のイベント（verdict, final など）が来たら、溜めていた
+#     チャンクを先に送ってから即座に送る（順序は保たれる）
+#   - 最初のチャンクを溜めてから interval 経過、または溜めたサイズが
+#     max_bytes に達したら送る（後続のチャンクが来なくても送る）
+#
+#   thinking "検" ─┐
+#   thinking "討" ─┼─(50ms)→ thinking "検討中"
+#   thinking "中" ─┘
+#   verdict       ─────────→ verdict（即座に送信）
+#
+# 設定（環境変数）:
+#   MAGI_THINKING_INTERVAL_MS: まとめる時間幅・ミリ秒（デフォルト: 50、0 で無効）
+#   MAGI_THINKING_MAX_BYTES: まとめる最大サイズ・バイト（デフォルト: 2048）
+#
+# =============================================================================
+
+import asyncio
+import os
+from typing import AsyncGenerator, AsyncIterator
+
+
+# まとめる対象のイベント
+COALESCED_TYPES = ("thinking", "judge_thinking", "reasoning")
+
+# ストリーム終了を表す番兵
+_END = object()
+
+
+class _Pending:
+    """溜めているチャンク（同じ type・agent 分）"""
+
+    __slots__ = ("event", "parts", "size")
+
+    def __init__(self, event: dict):
+        self.event = event
+        self.parts: list[str] = []
+        self.size = 0
+
+    def add(self, content: str) -> None:
+        self.parts.append(content)
+        self.size += len(content.encode("utf-8"))
+
+    def build(self) -> dict:
+        return {**self.event, "content": "".join(self.parts)}
+
+
+def get_coalesce_settings() -> tuple[float, int]:
+    """
+    環境変数からまとめ送りの設定を読む
+
+    Returns:
+        tuple: (時間幅・秒, 最大バイト数)
+    """
+    interval_ms = float(os.environ.get("MAGI_THINKING_INTERVAL_MS", "50"))
+    max_bytes = int(os.environ.get("MAGI_THINKING_MAX_BYTES", "2048"))
+    return interval_ms / 1000, max_bytes
+
+
+async def coalesce_thinking(
+    stream: AsyncIterator[dict],
+    interval: float = 0.05,
+    max_bytes: int = 2048
+) -> AsyncGenerator[dict, None]:
+    """
+    thinking チャンクをまとめてから転送する
+
+    元のストリームは1つのタスクで最後まで駆動し（途中でタスクを替えない）、
+    こちらは時間幅の経過を待ちながら Queue からイベントを受け取ります。
+
+    Args:
+        stream: 元のイベントストリーム
+        interval: まとめる時間幅（秒）。0 以下ならまとめずにそのまま転送
+        max_bytes: まとめる最大サイズ（バイト、UTF-8）
+
+    Yields:
+        dict: イベント辞書
+    """
+    if interval <= 0:
+        async for event in stream:
+            yield event
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=256)
+
+    async def pump() -> None:
+        try:
+            async for event in stream:
+                await queue.put(event)
+            await queue.put(_END)
+        except Exception as e:
+            await queue.put(e)
+
+    task = asyncio.create_task(pump())
+    pending: dict[tuple, _Pending] = {}
+    flush_at: float | None = None
+
+    def flush() -> list[dict]:
+        nonlocal flush_at
+        events = [item.build() for item in pending.values()]
+        pending.clear()
+        flush_at = None
+        return events
+
+    try:
+        while True:
+            if flush_at is None:
+                item = await queue.get()
+            else:
+                try:
+                    async with asyncio.timeout_at(flush_at):
+                        item = await queue.get()
+                except TimeoutError:
+                    for event in flush():
+                        yield event
+                    continue
+
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                for event in flush():
+                    yield event
+                raise item
+
+            if item.get("type") in COALESCED_TYPES and isinstance(item.get("content"), str):
+                key = (item["type"], item.get("agent"))
+                buffered = pending.get(key)
+                if buffered is None:
+                    buffered = pending[key] = _Pending(item)
+                    if flush_at is None:
+                        flush_at = loop.time() + interval
+                buffered.add(item["content"])
+                if buffered.size >= max_bytes:
+                    for event in flush():
+                        yield event
+                continue
+
+            # 構造イベント: 溜めていたチャンクを先に送ってから即座に送る
+            for event in flush():
+                yield event
+            yield item
+
+        for event in flush():
+            yield event
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,130 @@
+# =============================================================================
+# deadline.py - エージェント単位・リクエスト単位の期限
+# =============================================================================
+#
+# どこにもタイムアウトがないと、1つのペルソナ呼び出しが応答しなくなった
+# だけで run_judge_mode_stream 全体が止まり続けます。
+# このモジュールは、エージェントごとの期限とリクエスト全体の期限を管理します。
+#
+# 主要コンポーネント:
+# - RequestDeadline: 1リクエスト分の期限（エージェント期限・リクエスト期限）
+# - stream_until(): 期限までイベントを転送し、超えたら TimeoutError
+#
+# 期限の考え方:
+#   - エージェント期限: そのエージェントの開始から agent_timeout 秒
+#   - リクエスト期限: リクエストの開始から request_timeout 秒
+#   - 各エージェント・JUDGE にはどちらか早い方が適用される
+#
+#   request_timeout ├──────────────────────────────────────┤
+#   MELCHIOR-1      ├──── agent_timeout ────┤
+#   BALTHASAR-2        ├──── agent_timeout ────┤
+#   JUDGE                                   ├──────────────┤（リクエスト期限まで）
+#
+# 期限切れの扱いは backend.py が行います（agent_timeout イベント、
+# 揃った判定だけでの集計、JUDGE の多数決フォールバック）。
+#
+# 設定（環境変数、0 で無効）:
+#   MAGI_AGENT_TIMEOUT: エージェント1つあたりの期限・秒（デフォルト: 90）
+#   MAGI_REQUEST_TIMEOUT: リクエスト全体の期限・秒（デフォルト: 180）
+#
+# =============================================================================
+
+import asyncio
+import os
+from typing import AsyncGenerator, AsyncIterator
+
+
+def _timeout_from_env(name: str, default: str) -> float | None:
+    """環境変数から期限（秒）を読む（0 以下は無効 = None）"""
+    value = float(os.environ.get(name, default))
+    return value if value > 0 else None
+
+
+class RequestDeadline:
+    """
+    1リクエスト分の期限
+
+    生成した時点をリクエストの開始とみなします（イベントループの時刻を使う）。
+
+    Attributes:
+        agent_timeout: エージェント1つあたりの期限（秒、None は無制限）
+        request_timeout: リクエスト全体の期限（秒、None は無制限）
+    """
+
+    def __init__(self, agent_timeout: float | None = None, request_timeout: float | None = None):
+        self.agent_timeout = agent_timeout
+        self.request_timeout = request_timeout
+        self._loop = asyncio.get_running_loop()
+        self.started_at = self._loop.time()
+
+    @classmethod
+    def from_env(
+        cls,
+        agent_timeout: float | None = None,
+        request_timeout: float | None = None
+    ) -> "RequestDeadline":
+        """
+        環境変数の設定から生成（引数で指定した値が優先、0 以下は無効）
+
+        Args:
+            agent_timeout: エージェント期限（None なら MAGI_AGENT_TIMEOUT）
+            request_timeout: リクエスト期限（None なら MAGI_REQUEST_TIMEOUT）
+        """
+        if agent_timeout is None:
+            agent_timeout = _timeout_from_env("MAGI_AGENT_TIMEOUT", "90")
+        if request_timeout is None:
+            request_timeout = _timeout_from_env("MAGI_REQUEST_TIMEOUT", "180")
+        return cls(
+            agent_timeout=agent_timeout if agent_timeout and agent_timeout > 0 else None,
+            request_timeout=request_timeout if request_timeout and request_timeout > 0 else None
+        )
+
+    @property
+    def request_at(self) -> float | None:
+        """リクエスト期限の時刻（イベントループの時刻、None は無制限）"""
+        if self.request_timeout is None:
+            return None
+        return self.started_at + self.request_timeout
+
+    def agent_at(self) -> float | None:
+        """今から開始するエージェントの期限の時刻（リクエスト期限と早い方）"""
+        candidates = [self.request_at]
+        if self.agent_timeout is not None:
+            candidates.append(self._loop.time() + self.agent_timeout)
+        candidates = [when for when in candidates if when is not None]
+        return min(candidates) if candidates else None
+
+    def elapsed(self) -> float:
+        """リクエスト開始からの経過秒数"""
+        return self._loop.time() - self.started_at
+
+
+async def stream_until(stream: AsyncIterator[dict], when: float | None) -> AsyncGenerator[dict, None]:
+    """
+    期限までイベントを転送する
+
+    イベント1つ分の待機ごとに期限を適用するため、呼び出し側が
+    イベントを処理している時間にキャンセルが紛れ込むことはありません。
+
+    Args:
+        stream: 元のイベントストリーム
+        when: 期限の時刻（イベントループの時刻、None は無制限）
+
+    Yields:
+        dict: イベント辞書
+
+    Raises:
+        TimeoutError: 期限を超えた場合（元のストリームは閉じてから送出）
+    """
+    try:
+        while True:
+            try:
+                async with asyncio.timeout_at(when):
+                    event = await anext(stream)
+            except StopAsyncIteration:
+                return
+            yield event
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,195 @@
+# =============================================================================
+# disconnect.py - クライアントの切断をパイプラインに伝える
+# =============================================================================
+#
+# Streamlit のタブを閉じる・再実行するなどでクライアントが切断しても、
+# AgentCore ランタイム（BedrockAgentCoreApp）は invoke() の非同期ジェネレータを
+# すぐには止めません。ランタイムは invoke() を専用のイベントループで動かし、
+# 同期ジェネレータに橋渡しして StreamingResponse に渡しますが、その同期ジェネレータが
+# 閉じられる（＝ invoke() が止まる）のは、切断後にガベージコレクションで
+# 回収されたときです。それまで残りのペルソナと JUDGE のモデル呼び出しが続き、
+# 誰も読まないトークンの料金がかかっていました。
+#
+# このモジュールでは:
+#   1. DisconnectMiddleware（ASGI ミドルウェア）が POST /invocations ごとに
+#      DisconnectSignal を作り、contextvar に入れる（ランタイムは contextvar を
+#      コピーして invoke() に渡すため、invoke() からも見える）
+#   2. StreamingResponse が http.disconnect を受け取ると、ミドルウェアが
+#      DisconnectSignal を発火する
+#   3. invoke() は until_disconnected() でストリームを読み、発火したら
+#      パイプラインを読んでいるタスクをキャンセルする。キャンセルはエージェントの
+#      並列実行・シングルフライト・モデル呼び出し（agents/models.py の
+#      CancellableModel）まで伝わり、Bedrock のストリームも閉じられる
+#   4. キャンセルはパイプラインの中だけで止め、invoke() は正常に終わる
+#      （ランタイムの橋渡しが終了を受け取れるように。asyncio.timeout() と同じ仕組み）
+#
+#   クライアント ─×─ uvicorn ─ DisconnectMiddleware ──発火──┐
+#                                                          ↓（ワーカーループへ）
+#   invoke() ─ until_disconnected() ─ task.cancel() → パイプライン → CancellableModel
+#
+# キャンセルされたパイプラインの結果はキャッシュ・セッション履歴に保存されません
+# （backend.py の _store_results() / _stream_chat_session() は正常に完了した場合のみ保存）。
+# 同じ問いかけに合流している他のクライアントがいれば、パイプラインはそのまま続きます。
+#
+# 主要コンポーネント:
+# - DisconnectSignal: リクエスト1件分の切断の通知
+# - DisconnectMiddleware: http.disconnect を検知して DisconnectSignal を発火する
+# - current_disconnect_signal(): 現在のリクエストの DisconnectSignal
+# - until_disconnected(): 切断されたらストリームを止める
+#
+# =============================================================================
+
+import asyncio
+import threading
+from contextvars import ContextVar
+from typing import AsyncGenerator, AsyncIterator
+
+from pipeline.telemetry import CANCELLED_COUNTER
+
+
+# 切断の検知対象のパス
+_INVOCATION_PATH = "/invocations"
+
+
+class DisconnectSignal:
+    """
+    リクエスト1件分のクライアント切断の通知
+
+    発火（fire()）はサーバーのイベントループから、パイプラインのキャンセルは
+    invoke() を動かしているイベントループ（ランタイムのワーカーループ）で行います。
+
+    Attributes:
+        disconnected: クライアントが切断したか
+    """
+
+    def __init__(self):
+        self.disconnected = False
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # until_disconnected() がパイプラインのイベントを待っている間だけ True
+        # （ワーカーループのスレッドだけが読み書きする）
+        self._awaiting = False
+        self._cancelling = False
+
+    def fire(self) -> None:
+        """クライアントの切断を通知（どのスレッドからでも呼べる）"""
+        with self._lock:
+            if self.disconnected:
+                return
+            self.disconnected = True
+            loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._cancel)
+
+    def _attach(self) -> None:
+        """現在のタスクを切断時のキャンセル対象にする"""
+        with self._lock:
+            self._task = asyncio.current_task()
+            self._loop = asyncio.get_running_loop()
+
+    def _detach(self) -> None:
+        with self._lock:
+            self._task = None
+            self._loop = None
+
+    def _cancel(self) -> None:
+        """パイプラインのイベントを待っている最中ならタスクをキャンセル（ワーカーループで実行）"""
+        if self._awaiting and self._task is not None and not self._task.done():
+            self._cancelling = True
+            self._task.cancel()
+
+
+# 現在のリクエストの DisconnectSignal（DisconnectMiddleware が設定）
+_current_signal: ContextVar[DisconnectSignal | None] = ContextVar("magi_disconnect_signal", default=None)
+
+
+def current_disconnect_signal() -> DisconnectSignal | None:
+    """
+    現在のリクエストの DisconnectSignal
+
+    Returns:
+        DisconnectSignal | None: HTTP 経由でない呼び出し（テスト・バッチスクリプト）では None
+    """
+    return _current_signal.get()
+
+
+class DisconnectMiddleware:
+    """
+    POST /invocations のクライアント切断を検知する ASGI ミドルウェア
+
+    使用例:
+        app = BedrockAgentCoreApp(middleware=[Middleware(DisconnectMiddleware)])
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope.get("path") != _INVOCATION_PATH:
+            await self.app(scope, receive, send)
+            return
+
+        signal = DisconnectSignal()
+
+        async def receive_with_signal():
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                signal.fire()
+            return message
+
+        token = _current_signal.set(signal)
+        try:
+            await self.app(scope, receive_with_signal, send)
+        finally:
+            _current_signal.reset(token)
+
+
+async def until_disconnected(
+    stream: AsyncIterator,
+    signal: DisconnectSignal | None
+) -> AsyncGenerator:
+    """
+    クライアントが切断したらストリームを止める
+
+    パイプラインのイベントを待っている最中に切断されたら、現在のタスクを
+    キャンセルしてパイプライン全体に CancelledError を伝え、その後ここで
+    キャンセルを取り消して正常に終了します。イベントを渡した直後
+    （呼び出し側が次を要求する前）に切断された場合は、次の要求時に
+    ストリームを閉じて終了します。
+
+    Args:
+        stream: invoke() のイベントストリーム
+        signal: 現在のリクエストの DisconnectSignal（None なら何もせずに転送）
+
+    Yields:
+        元のイベント
+    """
+    if signal is None:
+        async for value in stream:
+            yield value
+        return
+
+    signal._attach()
+    try:
+        while not signal.disconnected:
+            signal._awaiting = True
+            try:
+                value = await anext(stream)
+            except StopAsyncIteration:
+                return
+            except asyncio.CancelledError:
+                if not signal._cancelling:
+                    raise
+                # 切断によるキャンセル: パイプラインは止まったので、ここで取り消して終わる
+                asyncio.current_task().uncancel()
+                break
+            finally:
+                signal._awaiting = False
+            yield value
+        CANCELLED_COUNTER.add(1, {"magi.scope": "client"})
+    finally:
+        signal._detach()
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
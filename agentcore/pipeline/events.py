@@ -0,0 +1,99 @@
+# =============================================================================
+# events.py - イベントの data（Pydantic モデル）の直列化
+# =============================================================================
+#
+# バックエンド内部では、verdict / response / final / chat_response イベントの
+# "data" に Pydantic モデル（AgentVerdict など）をそのまま入れて受け渡します。
+# 以前は analyze_stream() で model_dump() した辞書を run_judge_mode_stream() が
+# AgentVerdict(**data) で組み立て直しており、そのたびに検証が走っていました。
+#
+# このモジュールは、イベントを外に出すところ（backend._dispatch の出口と
+# 結果キャッシュへの保存）で辞書に変換します。
+#
+# 変換には、モデルクラスごとに1回だけ作る TypeAdapter の直列化器
+# （pydantic_core の SchemaSerializer.to_python）を直接使います。
+# model_dump() / TypeAdapter.dump_python() は引数を詰め直す Python 側の処理を
+# 挟むため、FinalVerdict（判定3つ入り）1つで model_dump() より2〜3割速くなります
+# （pydantic 2.14、bench/event_overhead.py。TypeAdapter.dump_python() は model_dump() と同程度）。
+#
+# 主要コンポーネント:
+# - dump_model(): Pydantic モデルを辞書に変換（キャッシュした直列化器を使う）
+# - serialize_event(): イベント1つの data を辞書に変換
+# - serialize_events(): イベントストリーム全体に serialize_event() を適用
+#
+#   analyze_stream ──{"data": AgentVerdict}──→ _stream_judge（そのまま集計に使う）
+#                                                   │
+#   _dispatch の出口 ←──────────────────────────────┘
+#        └─ serialize_event() → {"data": {...}}（ここで1回だけ辞書にする）
+#
+# =============================================================================
+
+from typing import AsyncGenerator, AsyncIterator
+
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import SchemaSerializer
+
+from pipeline.telemetry import recording, span
+
+
+# data に Pydantic モデルが入るイベント
+# （thinking など大半のイベントは type の確認だけで素通りさせる）
+MODEL_EVENT_TYPES = frozenset({"verdict", "response", "final", "chat_response"})
+
+
+# モデルクラス → 直列化器（TypeAdapter はクラスごとに1回だけ作る）
+_serializers: dict[type[BaseModel], SchemaSerializer] = {}
+
+
+def dump_model(data: BaseModel) -> dict:
+    """
+    Pydantic モデルを辞書に変換する（model_dump() と同じ結果）
+
+    Args:
+        data: 変換するモデル
+
+    Returns:
+        dict: 新しく作られた辞書（元のモデルとは共有しない）
+    """
+    serializer = _serializers.get(type(data))
+    if serializer is None:
+        serializer = _serializers[type(data)] = TypeAdapter(type(data)).serializer
+    return serializer.to_python(data)
+
+
+def serialize_event(event: dict) -> dict:
+    """
+    イベントの data が Pydantic モデルなら辞書に変換する
+
+    変換済み（辞書）のイベントはそのまま返すため、同じイベントに
+    何度呼んでも変換は1回しか実行されません。
+
+    Args:
+        event: イベント辞書
+
+    Returns:
+        dict: data が辞書になったイベント（元のイベントは変更しない）
+    """
+    if event.get("type") not in MODEL_EVENT_TYPES:
+        return event
+    data = event.get("data")
+    if isinstance(data, BaseModel):
+        if not recording():
+            return {**event, "data": dump_model(data)}
+        with span("magi.serialize", **{"magi.event_type": event["type"]}):
+            return {**event, "data": dump_model(data)}
+    return event
+
+
+async def serialize_events(stream: AsyncIterator[dict]) -> AsyncGenerator[dict, None]:
+    """
+    イベントストリームの data をすべて辞書に変換して転送する
+
+    Args:
+        stream: 元のイベントストリーム
+
+    Yields:
+        dict: data が辞書になったイベント
+    """
+    async for event in stream:
+        yield serialize_event(event)
@@ -0,0 +1,153 @@
+# =============================================================================
+# fanout.py - 複数エージェントのイベントストリーム合流
+# =============================================================================
+#
+# 3エージェント（MELCHIOR, BALTHASAR, CASPER）の analyze_stream() を
+# 同時に実行し、届いた順に1本のイベントストリームへ合流させます。
+#
+# 主要コンポーネント:
+# - StreamMerger: 非同期ストリームを並列に駆動して合流させるクラス
+#
+# 実行中にストリームを追加（add）・個別にキャンセル（cancel）できるため、
+# クォーラム早期決定時に JUDGE を途中から合流させる用途にも使えます。
+#
+# 仕組み:
+#   各ストリームを asyncio.Task で駆動し、イベントを共通の asyncio.Queue に
+#   投入します。呼び出し側は Queue から (ストリーム名, イベント) を順に
+#   受け取ります。ストリームが終了すると (ストリーム名, None) が届きます。
+#
+#   MELCHIOR-1 ─┐
+#   BALTHASAR-2 ─┼─→ Queue ─→ async for name, event in merger
+#   CASPER-3 ───┘
+#
+# 使用例:
+#   async with StreamMerger() as merger:
+#       for agent in agents:
+#           merger.add(agent.name, agent.analyze_stream(question))
+#       async for name, event in merger:
+#           if event is None:
+#               ...  # name のストリームが終了
+#
+# =============================================================================
+
+import asyncio
+from typing import AsyncGenerator, AsyncIterator
+
+
+# ストリーム終了を表す番兵
+_DONE = object()
+
+
+class StreamMerger:
+    """
+    複数の非同期イベントストリームを1本に合流させる
+
+    add() で登録したストリームはすぐにバックグラウンドで駆動され、
+    イベントは到着順に取り出せます。いずれかのストリームで例外が
+    発生した場合は、残りのストリームをキャンセルしてから呼び出し側に
+    例外を再送出します。
+
+    async with で使用すると、ブロックを抜けた時点で（途中終了・例外を
+    含めて）未完了のストリームが確実にキャンセルされます。
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._cancelled: set[str] = set()
+        self._active = 0
+
+    async def __aenter__(self) -> "StreamMerger":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    def add(self, name: str, stream: AsyncIterator[dict]) -> None:
+        """
+        ストリームを登録して駆動を開始
+
+        Args:
+            name: ストリーム名（エージェント名）
+            stream: イベントを返す非同期イテレータ
+        """
+        self._active += 1
+        task = asyncio.create_task(self._pump(name, stream))
+        # 終了通知は done コールバックで送る（開始前にキャンセルされた場合も届く）
+        task.add_done_callback(lambda _: self._queue.put_nowait((name, _DONE)))
+        self._tasks[name] = task
+
+    def cancel(self, name: str) -> bool:
+        """
+        実行中のストリームを1つだけキャンセル
+
+        キャンセルしたストリームも、終了時には (name, None) が届きます。
+        is_cancelled() で通常の終了と区別できます。
+
+        Args:
+            name: キャンセルするストリーム名
+
+        Returns:
+            bool: キャンセルした場合 True（既に終了していた場合は False）
+        """
+        task = self._tasks.get(name)
+        if task is None or task.done():
+            return False
+        self._cancelled.add(name)
+        task.cancel()
+        return True
+
+    def is_cancelled(self, name: str) -> bool:
+        """ストリームが cancel() で中断されたか"""
+        return name in self._cancelled
+
+    def is_running(self, name: str) -> bool:
+        """ストリームが実行中か"""
+        task = self._tasks.get(name)
+        return task is not None and not task.done()
+
+    def pending(self) -> int:
+        """届いていて、まだ取り出していないイベント（終了通知を含む）の数"""
+        return self._queue.qsize()
+
+    async def _pump(self, name: str, stream: AsyncIterator[dict]) -> None:
+        """ストリームのイベントを Queue に転送する"""
+        try:
+            async for event in stream:
+                await self._queue.put((name, event))
+        except Exception as e:
+            # 例外は呼び出し側で再送出する
+            await self._queue.put((name, e))
+        finally:
+            # キャンセル時も元のジェネレータを確実に閉じる
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def __aiter__(self) -> AsyncGenerator[tuple[str, dict | None], None]:
+        """
+        合流したイベントを到着順に返す
+
+        Yields:
+            tuple: (ストリーム名, イベント辞書)
+                - イベントが None の場合は、そのストリームの終了を表す
+        """
+        while self._active:
+            name, item = await self._queue.get()
+            if item is _DONE:
+                self._active -= 1
+                yield name, None
+            elif isinstance(item, Exception):
+                await self.aclose()
+                raise item
+            else:
+                yield name, item
+
+    async def aclose(self) -> None:
+        """未完了のストリームをすべてキャンセルして終了を待つ"""
+        pending = [task for task in self._tasks.values() if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._active = 0
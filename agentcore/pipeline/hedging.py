@@ -0,0 +1,343 @@
+# =============================================================================
+# hedging.py - ヘッジリクエスト（遅いモデル呼び出しの重複発行）
+# =============================================================================
+#
+# 判定モードのレイテンシは、3ペルソナ（＋JUDGE）のうち最も遅い呼び出しで
+# 決まります。たまに遅い呼び出し（テールレイテンシ）を救うため、
+# 最初のトークンが一定時間内に届かない場合に同じリクエストをもう1本発行し、
+# 先に最初のトークンを返した方を採用して、もう一方をキャンセルします。
+#
+# 主要コンポーネント:
+# - HedgePolicy: ヘッジを発行するまでの待ち時間の決め方（パーセンタイル）
+# - HedgeBudget: リクエスト単位のヘッジ予算（発行できる重複リクエストの数）
+# - TTFTTracker: 最近の TTFT（最初のトークンまでの時間）の記録
+# - StreamTimer: 1本のストリームの TTFT の計測（リミッターの待ち時間を除く）
+# - hedged_stream(): ヘッジ付きでモデルのストリームを実行
+#
+# 待ち時間（ヘッジ遅延）:
+#   最近の TTFT の p パーセンタイル（デフォルト p95）を使います。
+#   「普段なら95%の呼び出しは最初のトークンが届いている時間」を過ぎても
+#   届かない場合だけヘッジするため、重複リクエストは全体の数%に収まります。
+#   サンプルが少ないうちは default_delay を使います。
+#
+# リミッターとの関係:
+#   HedgedModel は LimitedModel の外側にあるため、ストリームの開始から測ると
+#   TTFT にリミッターの待ち時間が入り、混雑時にパーセンタイルが膨らんだり、
+#   ローカルの待ち行列が原因でヘッジしたりしてしまいます（AIMD が上限を
+#   下げている最中に負荷を倍にする）。そのため、
+#   - TTFT とヘッジ遅延は LimitedModel が実行枠を確保した時点から数え
+#     （StreamTimer を invocation_state 経由で渡す）、
+#   - リミッターの枠が埋まっている間（saturated）はヘッジしません。
+#
+# 予算:
+#   HedgeBudget はリクエスト（invoke 1回）ごとに作り、全ペルソナで共有します。
+#   予算を使い切った後はヘッジせずに元の呼び出しを待ちます
+#   （トークン料金が倍にならないようにするため）。
+#
+# 仕組み:
+#   MAGIAgent.analyze_stream(question, hedge=budget) などで指定すると、
+#   budget が Strands の invocation_state 経由でモデルに渡り、
+#   agents/models.py の HedgedModel がここの hedged_stream() を使います。
+#
+#   primary ──[TTFT 待ち]──×（遅い）─────→ キャンセル
+#                 │ ヘッジ遅延を超過
+#   hedge   ──────┴──[最初のトークン]──→ 採用
+#
+# 設定（環境変数）:
+#   MAGI_HEDGE_BUDGET: 1リクエストあたりのヘッジ数の上限（デフォルト: 1）
+#   MAGI_HEDGE_PERCENTILE: ヘッジ遅延に使うパーセンタイル 0〜1（デフォルト: 0.95）
+#   MAGI_HEDGE_DEFAULT_DELAY: サンプル不足時のヘッジ遅延・秒（デフォルト: 2.0）
+#   MAGI_HEDGE_MIN_DELAY: ヘッジ遅延の下限・秒（デフォルト: 0.2）
+#   MAGI_HEDGE_MAX_DELAY: ヘッジ遅延の上限・秒（デフォルト: 10.0）
+#
+# =============================================================================
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncGenerator, AsyncIterator, Callable
+
+
+# invocation_state に HedgeBudget を入れるときのキー
+HEDGE_STATE_KEY = "magi_hedge"
+
+# invocation_state に StreamTimer を入れるときのキー（ストリーム1本ごと）
+STREAM_TIMER_STATE_KEY = "magi_stream_timer"
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """
+    ヘッジ遅延の決め方
+
+    Attributes:
+        percentile: 最近の TTFT の何パーセンタイルを待つか（0〜1）
+        min_samples: パーセンタイルを使うのに必要なサンプル数
+        default_delay: サンプル不足時のヘッジ遅延（秒）
+        min_delay: ヘッジ遅延の下限（秒）
+        max_delay: ヘッジ遅延の上限（秒）
+    """
+    percentile: float = 0.95
+    min_samples: int = 20
+    default_delay: float = 2.0
+    min_delay: float = 0.2
+    max_delay: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "HedgePolicy":
+        """環境変数から設定を読み込む"""
+        return cls(
+            percentile=float(os.environ.get("MAGI_HEDGE_PERCENTILE", "0.95")),
+            default_delay=float(os.environ.get("MAGI_HEDGE_DEFAULT_DELAY", "2.0")),
+            min_delay=float(os.environ.get("MAGI_HEDGE_MIN_DELAY", "0.2")),
+            max_delay=float(os.environ.get("MAGI_HEDGE_MAX_DELAY", "10.0")),
+        )
+
+
+class HedgeBudget:
+    """
+    リクエスト単位のヘッジ予算
+
+    1つの invoke（問いかけ1件）の全ペルソナで共有し、
+    発行できる重複リクエストの数を制限します。
+
+    Attributes:
+        max_hedges: 発行できるヘッジの数
+        policy: ヘッジ遅延の決め方
+        used: 発行したヘッジの数
+        won: ヘッジ側が先に最初のトークンを返した数
+    """
+
+    def __init__(self, max_hedges: int = 1, policy: HedgePolicy | None = None):
+        self.max_hedges = max_hedges
+        self.policy = policy or HedgePolicy()
+        self.used = 0
+        self.won = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "HedgeBudget":
+        """環境変数から予算とポリシーを読み込む"""
+        return cls(
+            max_hedges=int(os.environ.get("MAGI_HEDGE_BUDGET", "1")),
+            policy=HedgePolicy.from_env()
+        )
+
+    def try_spend(self) -> bool:
+        """予算が残っていれば1つ使って True を返す"""
+        with self._lock:
+            if self.used >= self.max_hedges:
+                return False
+            self.used += 1
+            return True
+
+    def stats(self) -> dict:
+        """{"max_hedges", "used", "won"}"""
+        return {"max_hedges": self.max_hedges, "used": self.used, "won": self.won}
+
+
+class TTFTTracker:
+    """
+    最近の TTFT（最初のトークンまでの時間）を記録し、パーセンタイルを返す
+
+    Attributes:
+        window: 保持するサンプル数（古いものから捨てる）
+    """
+
+    def __init__(self, window: int = 256):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        """p パーセンタイル（サンプルがなければ None）"""
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(p * len(ordered)) - 1))
+        return ordered[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def hedge_delay(self, policy: HedgePolicy) -> float:
+        """ポリシーに従ったヘッジ遅延（秒）"""
+        delay = policy.default_delay
+        if len(self) >= policy.min_samples:
+            delay = self.percentile(policy.percentile) or policy.default_delay
+        return min(policy.max_delay, max(policy.min_delay, delay))
+
+
+class StreamTimer:
+    """
+    1本のストリームの TTFT を測るタイマー
+
+    リミッターを通るストリームは queued=True で作り、LimitedModel が実行枠を
+    確保した時点で slot_acquired() を呼びます。以降の elapsed() は
+    枠の確保からの経過時間になり、リミッターの待ち時間を含みません。
+
+    Attributes:
+        started_at: 計測の開始時刻（perf_counter）
+        queued: 実行枠の確保を待っているか
+    """
+
+    __slots__ = ("started_at", "queued")
+
+    def __init__(self, queued: bool = False):
+        self.started_at = time.perf_counter()
+        self.queued = queued
+
+    def slot_acquired(self) -> None:
+        """実行枠を確保した（ここから計測し直す）"""
+        self.started_at = time.perf_counter()
+        self.queued = False
+
+    def elapsed(self) -> float:
+        """計測開始からの経過時間（秒）"""
+        return time.perf_counter() - self.started_at
+
+
+# =============================================================================
+# ストリームの実行
+# =============================================================================
+
+def _is_token(event: dict) -> bool:
+    """最初のトークン（テキスト・ツール入力などのデルタ）か"""
+    return "contentBlockDelta" in event
+
+
+async def _until_first_token(stream: AsyncIterator[dict]) -> list[dict]:
+    """
+    最初のトークンが届くまでのイベントを集める
+
+    Returns:
+        list[dict]: 最初のトークンまでのイベント（ストリームが先に終われば全イベント）
+    """
+    buffered: list[dict] = []
+    async for event in stream:
+        buffered.append(event)
+        if _is_token(event):
+            break
+    return buffered
+
+
+async def _discard(task: asyncio.Task, stream: AsyncGenerator[dict, None]) -> None:
+    """負けた方のストリームをキャンセルして閉じる"""
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await stream.aclose()
+
+
+async def timed_stream(
+    stream: AsyncGenerator[dict, None],
+    timer: StreamTimer,
+    tracker: TTFTTracker
+) -> AsyncGenerator[dict, None]:
+    """
+    ヘッジなしでストリームを転送し、TTFT だけを記録する
+
+    ヘッジを使わない呼び出しの TTFT もパーセンタイルの計算に使うため、
+    常に HedgedModel はこの関数か hedged_stream() を通します。
+    """
+    recorded = False
+    async for event in stream:
+        if not recorded and _is_token(event):
+            tracker.record(timer.elapsed())
+            recorded = True
+        yield event
+
+
+async def _wait_hedge_delay(task: asyncio.Task, timer: StreamTimer, delay: float) -> bool:
+    """
+    最初のトークンを、実行枠の確保からヘッジ遅延まで待つ
+
+    Returns:
+        bool: 期限内に最初のトークンが届いた（またはストリームが終わった）か
+    """
+    while True:
+        # 実行枠の待ち行列にいる間は、確保されるまで数え始めない
+        timeout = delay if timer.queued else delay - timer.elapsed()
+        if timeout <= 0:
+            return task.done()
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        if done:
+            return True
+
+
+async def hedged_stream(
+    start: Callable[[], tuple[AsyncGenerator[dict, None], StreamTimer]],
+    tracker: TTFTTracker,
+    budget: HedgeBudget,
+    saturated: Callable[[], bool] | None = None
+) -> AsyncGenerator[dict, None]:
+    """
+    ヘッジ付きでモデルのストリームを実行
+
+    実行枠の確保からヘッジ遅延までに最初のトークンが届かなければ
+    （予算が残っていて、リミッターの枠が空いていれば）start() でもう1本
+    ストリームを開始し、先に最初のトークンを返した方を採用します。
+
+    Args:
+        start: モデルのストリームとそのタイマーを返す関数（呼ぶたびに新しいリクエスト）
+        tracker: TTFT の記録
+        budget: リクエスト単位のヘッジ予算
+        saturated: リミッターの枠が埋まっているか（True の間はヘッジしない）
+
+    Yields:
+        dict: 採用したストリームのイベント
+    """
+    primary, primary_timer = start()
+    primary_task = asyncio.ensure_future(_until_first_token(primary))
+    delay = tracker.hedge_delay(budget.policy)
+
+    try:
+        done = await _wait_hedge_delay(primary_task, primary_timer, delay)
+    except BaseException:
+        await _discard(primary_task, primary)
+        raise
+
+    winner, winner_task, winner_timer = primary, primary_task, primary_timer
+    if not done and not (saturated is not None and saturated()) and budget.try_spend():
+        hedge, hedge_timer = start()
+        hedge_task = asyncio.ensure_future(_until_first_token(hedge))
+        contenders = {primary_task: primary, hedge_task: hedge}
+        try:
+            while True:
+                done, _ = await asyncio.wait(contenders, return_when=asyncio.FIRST_COMPLETED)
+                # 例外で終わった方は、もう一方がまだ走っていればそちらを待つ
+                succeeded = [task for task in done if task.exception() is None]
+                if succeeded or len(done) == len(contenders):
+                    winner_task = succeeded[0] if succeeded else next(iter(done))
+                    break
+                for task in done:
+                    await contenders.pop(task).aclose()
+        except BaseException:
+            for task, stream in contenders.items():
+                await _discard(task, stream)
+            raise
+        winner = contenders.pop(winner_task)
+        for task, stream in contenders.items():
+            await _discard(task, stream)
+        if winner is hedge:
+            winner_timer = hedge_timer
+            budget.won += 1
+
+    try:
+        buffered = await winner_task
+        if buffered and _is_token(buffered[-1]):
+            tracker.record(winner_timer.elapsed())
+        for event in buffered:
+            yield event
+        async for event in winner:
+            yield event
+    finally:
+        # 最初のトークン待ちの途中で閉じられた場合もタスクごと止める
+        await _discard(winner_task, winner)
@@ -0,0 +1,294 @@
+# =============================================================================
+# limiter.py - Bedrock 呼び出しの適応型同時実行数制御（AIMD）
+# =============================================================================
+#
+# トラフィックが急増すると、リクエストごとに無制限に行われるモデル呼び出し
+# （MAGIAgent.analyze_stream や JUDGE）が Bedrock のスロットリングに当たり、
+# 全リクエストが一斉に遅くなります。
+#
+# このモジュールは、プロセス全体のモデル呼び出しを制御する入場制御
+# （アドミッションコントローラ）を提供します。
+#
+# 主要コンポーネント:
+# - AdaptiveLimiter: AIMD で同時実行数の上限（ウィンドウ）を調整するリミッター
+# - LimiterQueueFullError: 待ち行列が上限に達したときの例外
+# - get_limiter(): 環境変数の設定に従ったプロセス共有リミッター
+#
+# 全モデル呼び出しへの適用は agents/models.py の LimitedModel が行います。
+#
+# AIMD（Additive Increase / Multiplicative Decrease）:
+#   - 成功: limit += increase / limit（ウィンドウ1周分の成功で +increase）
+#   - スロットリング・タイムアウト: limit *= decrease（例: 半分）
+#   - その他のエラー・キャンセル: 上限は変えない
+#
+#   limit ▲     ／|      ／|
+#         │   ／  |    ／  |    ／
+#         │ ／    |__／    |__／
+#         └──────────────────────→ 時間
+#               ↑ スロットリング
+#
+# 待ち行列:
+#   上限に達している間の呼び出しは FIFO で待機します。
+#   待機数が max_queue を超えた呼び出しは LimiterQueueFullError で即座に失敗します。
+#   待ち時間は acquire() の戻り値と stats() で確認できます。
+#
+# スレッドと複数イベントループ:
+#   同期版（run_judge_mode_parallel）ではスレッドごとに別のイベントループで
+#   エージェントが動くため、状態は threading.Lock で保護し、待機者は
+#   自分のイベントループの Future で起こします（call_soon_threadsafe）。
+#
+# =============================================================================
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+
+# 呼び出し結果（release() に渡す）
+OUTCOME_SUCCESS = "success"
+OUTCOME_THROTTLED = "throttled"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_ERROR = "error"
+OUTCOME_CANCELLED = "cancelled"
+
+
+class LimiterQueueFullError(Exception):
+    """待ち行列が上限に達し、呼び出しを受け付けられない"""
+
+
+class _Waiter:
+    """待機中の呼び出し（待機者のイベントループと Future）"""
+
+    __slots__ = ("loop", "future", "granted")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        # 枠が割り当て済みか（_wake_waiters() で True になる）
+        self.granted = False
+
+
+class AdaptiveLimiter:
+    """
+    AIMD で同時実行数の上限を調整するリミッター
+
+    Attributes:
+        min_limit: 上限の最小値
+        max_limit: 上限の最大値
+        increase: 成功時の加算量（ウィンドウ1周あたり）
+        decrease: スロットリング・タイムアウト時の乗算係数（0〜1）
+        max_queue: 待ち行列の最大長
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        max_queue: int = 256
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.max_queue = max_queue
+
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._waiters: deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+        # 統計
+        self._acquired = 0
+        self._rejected = 0
+        self._throttled = 0
+        self._timeouts = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+
+    @property
+    def limit(self) -> int:
+        """現在の同時実行数の上限"""
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def saturated(self) -> bool:
+        """枠が埋まっているか（今 acquire() すると待ち行列に入る）"""
+        with self._lock:
+            return bool(self._waiters) or self._in_flight >= self.limit
+
+    async def acquire(self) -> float:
+        """
+        実行枠を1つ確保（空きがなければ待機）
+
+        Returns:
+            float: 待ち時間（秒）
+
+        Raises:
+            LimiterQueueFullError: 待ち行列が上限に達している場合
+        """
+        started_at = time.perf_counter()
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                self._record_acquire(0.0)
+                return 0.0
+            if len(self._waiters) >= self.max_queue:
+                self._rejected += 1
+                raise LimiterQueueFullError(
+                    f"モデル呼び出しの待ち行列が上限（{self.max_queue}）に達しました"
+                )
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._waiters.append(waiter)
+
+        try:
+            await waiter.future
+        except BaseException:
+            with self._lock:
+                if waiter.granted:
+                    # 枠を受け取った直後にキャンセルされた → 返却
+                    self._in_flight -= 1
+                    self._wake_waiters()
+                else:
+                    self._waiters.remove(waiter)
+            raise
+
+        wait = time.perf_counter() - started_at
+        with self._lock:
+            self._record_acquire(wait)
+        return wait
+
+    def release(self, outcome: str = OUTCOME_SUCCESS) -> None:
+        """
+        実行枠を返却し、呼び出し結果に応じて上限を調整
+
+        Args:
+            outcome: "success" | "throttled" | "timeout" | "error" | "cancelled"
+        """
+        with self._lock:
+            self._in_flight -= 1
+            if outcome == OUTCOME_SUCCESS:
+                self._limit = min(float(self.max_limit), self._limit + self.increase / max(self._limit, 1.0))
+            elif outcome in (OUTCOME_THROTTLED, OUTCOME_TIMEOUT):
+                if outcome == OUTCOME_THROTTLED:
+                    self._throttled += 1
+                else:
+                    self._timeouts += 1
+                self._limit = max(float(self.min_limit), self._limit * self.decrease)
+            self._wake_waiters()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[float]:
+        """
+        実行枠を確保するコンテキストマネージャ（成功/例外で自動的に release）
+
+        スロットリング・タイムアウトの判定が必要な場合は、
+        acquire() / release() を直接使ってください（agents/models.py の LimitedModel）。
+
+        Yields:
+            float: 待ち時間（秒）
+        """
+        wait = await self.acquire()
+        outcome = OUTCOME_ERROR
+        try:
+            yield wait
+            outcome = OUTCOME_SUCCESS
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = OUTCOME_CANCELLED
+            raise
+        finally:
+            self.release(outcome)
+
+    def _record_acquire(self, wait: float) -> None:
+        """統計の更新（ロック内で呼ぶ）"""
+        self._acquired += 1
+        self._queue_wait_total += wait
+        self._queue_wait_max = max(self._queue_wait_max, wait)
+
+    def _wake_waiters(self) -> None:
+        """空いた枠の分だけ待機者を起こす（ロック内で呼ぶ）"""
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self._in_flight += 1
+            waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+
+    def stats(self) -> dict:
+        """
+        リミッターの統計情報
+
+        Returns:
+            dict: {"limit", "in_flight", "queued", "max_queue", "acquired", "rejected",
+                   "throttled", "timeouts", "queue_wait_avg", "queue_wait_max"}
+        """
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "queued": len(self._waiters),
+                "max_queue": self.max_queue,
+                "acquired": self._acquired,
+                "rejected": self._rejected,
+                "throttled": self._throttled,
+                "timeouts": self._timeouts,
+                "queue_wait_avg": round(self._queue_wait_total / self._acquired, 6) if self._acquired else 0.0,
+                "queue_wait_max": round(self._queue_wait_max, 6),
+            }
+
+
+def _resolve(future: asyncio.Future) -> None:
+    """待機者の Future を完了させる（待機者のイベントループ上で実行）"""
+    if not future.done():
+        future.set_result(None)
+
+
+# =============================================================================
+# プロセス共有リミッター
+# =============================================================================
+#
+# 設定（環境変数）:
+#   MAGI_LIMITER: on | off（デフォルト: on）
+#   MAGI_LIMITER_INITIAL: 同時実行数の初期上限（デフォルト: 16）
+#   MAGI_LIMITER_MIN: 上限の最小値（デフォルト: 1）
+#   MAGI_LIMITER_MAX: 上限の最大値（デフォルト: 64）
+#   MAGI_LIMITER_MAX_QUEUE: 待ち行列の最大長（デフォルト: 256）
+# =============================================================================
+
+_limiter: AdaptiveLimiter | None = None
+_limiter_loaded = False
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> AdaptiveLimiter | None:
+    """
+    環境変数の設定に従ったプロセス共有リミッターを取得
+
+    Returns:
+        AdaptiveLimiter | None: MAGI_LIMITER=off の場合は None
+    """
+    global _limiter, _limiter_loaded
+    with _limiter_lock:
+        if not _limiter_loaded:
+            if os.environ.get("MAGI_LIMITER", "on").lower() in ("1", "true", "yes", "on"):
+                _limiter = AdaptiveLimiter(
+                    initial_limit=int(os.environ.get("MAGI_LIMITER_INITIAL", "16")),
+                    min_limit=int(os.environ.get("MAGI_LIMITER_MIN", "1")),
+                    max_limit=int(os.environ.get("MAGI_LIMITER_MAX", "64")),
+                    max_queue=int(os.environ.get("MAGI_LIMITER_MAX_QUEUE", "256"))
+                )
+            _limiter_loaded = True
+        return _limiter
+
+
+def set_limiter(limiter: AdaptiveLimiter | None) -> None:
+    """プロセス共有リミッターを差し替える（テスト・シミュレーション用）"""
+    global _limiter, _limiter_loaded
+    with _limiter_lock:
+        _limiter = limiter
+        _limiter_loaded = True
@@ -0,0 +1,167 @@
+# =============================================================================
+# metrics.py - モデル呼び出しごとのレイテンシ・トークン数の計測
+# =============================================================================
+#
+# どのペルソナ（または JUDGE）が遅いのか、トークンをどれだけ使っているのかを
+# 見えるようにするため、エージェントの呼び出し（stream_async 1回）ごとに
+# 次を計測して metrics イベントとして送ります。
+#
+#   - queue_wait_ms: リミッターの実行枠を待った時間
+#   - ttft_ms: 最初のトークン（テキスト・推論・ツール入力）までの時間
+#   - latency_ms: 呼び出し全体の時間
+#   - input_tokens / output_tokens / reasoning_tokens: トークン数
+#   - cache_read_tokens / cache_write_tokens: プロンプトキャッシュのトークン数
+#   - tokens_per_second: 最初のトークン以降の出力トークンの速度
+#
+# 主要コンポーネント:
+# - CallMetrics: 1回の呼び出しの計測値（invocation_state でモデルに渡す）
+# - aggregate_metrics(): 複数の metrics イベントの data を集計
+# - attach_metrics(): ストリームの metrics イベントを集計し、
+#   final / chat_response イベントに "metrics" として付ける
+#
+# 仕組み:
+#   MAGIAgent.analyze_stream()
+#     └─ CallMetrics を invocation_state に入れて stream_async()
+#          ├─ LimitedModel: 実行枠の待ち時間を add_queue_wait()
+#          └─ analyze_stream: イベントごとに observe()（最初のトークン・文字数）
+#     └─ result → {"type": "metrics", "agent": ..., "data": CallMetrics.to_dict(usage)}
+#
+#   attach_metrics(): metrics ──集計──→ final / chat_response の "metrics"
+#
+# 計測は時刻の取得と数値の加算だけなので、常時有効にしています。
+# reasoning_tokens は Bedrock の usage に内訳がないため、出力トークン数を
+# 推論テキストと通常テキストの文字数の比で按分した推定値です。
+#
+# =============================================================================
+
+import time
+from typing import AsyncGenerator, AsyncIterator
+
+
+# invocation_state に CallMetrics を入れるときのキー
+CALL_METRICS_STATE_KEY = "magi_call_metrics"
+
+# 集計結果を付けるイベント
+_RESULT_TYPES = ("final", "chat_response")
+
+# 合計するトークン数のフィールド
+_TOKEN_FIELDS = ("input_tokens", "output_tokens", "reasoning_tokens", "cache_read_tokens", "cache_write_tokens")
+
+
+def _ms(seconds: float | None) -> float | None:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class CallMetrics:
+    """
+    エージェントの呼び出し1回分の計測値
+
+    Attributes:
+        started_at: 呼び出し開始時刻（time.perf_counter()）
+        queue_wait: リミッターの実行枠を待った時間の合計（秒、ヘッジ分も含む）
+        first_token_at: 最初のトークンが届いた時刻（未着なら None）
+        text_chars: 通常テキストの文字数
+        reasoning_chars: 推論テキストの文字数
+    """
+
+    __slots__ = ("started_at", "queue_wait", "first_token_at", "text_chars", "reasoning_chars")
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.queue_wait = 0.0
+        self.first_token_at: float | None = None
+        self.text_chars = 0
+        self.reasoning_chars = 0
+
+    def add_queue_wait(self, seconds: float) -> None:
+        """リミッターの待ち時間を加算（agents/models.py の LimitedModel から呼ばれる）"""
+        self.queue_wait += seconds
+
+    def observe(self, event: dict) -> None:
+        """
+        Strands のストリームイベントを1つ記録
+
+        Args:
+            event: stream_async() のイベント
+        """
+        if "data" in event:
+            self.text_chars += len(event["data"])
+        elif "reasoningText" in event:
+            self.reasoning_chars += len(event["reasoningText"])
+        elif "current_tool_use" not in event:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def to_dict(self, usage: dict) -> dict:
+        """
+        metrics イベントの data を作る
+
+        Args:
+            usage: Strands の Usage（inputTokens, outputTokens, cacheReadInputTokens など）
+
+        Returns:
+            dict: 計測値（時間はミリ秒）
+        """
+        finished_at = time.perf_counter()
+        output_tokens = usage.get("outputTokens", 0)
+        chars = self.text_chars + self.reasoning_chars
+        reasoning_tokens = round(output_tokens * self.reasoning_chars / chars) if chars else 0
+
+        ttft = self.first_token_at - self.started_at if self.first_token_at is not None else None
+        generating = finished_at - (self.first_token_at or self.started_at)
+        return {
+            "queue_wait_ms": _ms(self.queue_wait),
+            "ttft_ms": _ms(ttft),
+            "latency_ms": _ms(finished_at - self.started_at),
+            "input_tokens": usage.get("inputTokens", 0),
+            "output_tokens": output_tokens,
+            "reasoning_tokens": reasoning_tokens,
+            "cache_read_tokens": usage.get("cacheReadInputTokens", 0),
+            "cache_write_tokens": usage.get("cacheWriteInputTokens", 0),
+            "tokens_per_second": round(output_tokens / generating, 1) if generating > 0 else None,
+        }
+
+
+def aggregate_metrics(metrics: dict[str, dict]) -> dict:
+    """
+    エージェントごとの計測値を集計
+
+    Args:
+        metrics: {エージェント名 / "JUDGE": metrics イベントの data}
+
+    Returns:
+        dict: トークン数の合計、待ち時間の合計、TTFT・レイテンシの最大値、
+              最も遅かったエージェント（slowest）
+    """
+    summary = {field: sum(m.get(field) or 0 for m in metrics.values()) for field in _TOKEN_FIELDS}
+    summary["calls"] = len(metrics)
+    summary["queue_wait_ms"] = round(sum(m.get("queue_wait_ms") or 0 for m in metrics.values()), 1)
+    summary["max_ttft_ms"] = max((m["ttft_ms"] for m in metrics.values() if m.get("ttft_ms") is not None), default=None)
+    summary["max_latency_ms"] = max((m.get("latency_ms") or 0 for m in metrics.values()), default=None)
+    summary["slowest"] = max(metrics, key=lambda name: metrics[name].get("latency_ms") or 0, default=None)
+    return summary
+
+
+async def attach_metrics(stream: AsyncIterator[dict]) -> AsyncGenerator[dict, None]:
+    """
+    metrics イベントを集計し、final / chat_response イベントに付けて転送する
+
+    最終結果より後に届いた metrics（クォーラムで待たなかったエージェントなど）は
+    集計に含まれません。キャッシュから再生した結果には metrics がないため、
+    "metrics" も付けません。
+
+    Args:
+        stream: 1件分（1つの問いかけ）のイベントストリーム
+
+    Yields:
+        dict: 元のイベント（final / chat_response には "metrics" を追加）
+    """
+    collected: dict[str, dict] = {}
+    async for event in stream:
+        event_type = event.get("type")
+        if event_type == "metrics":
+            collected[event.get("agent", "")] = event["data"]
+        elif event_type in _RESULT_TYPES and collected:
+            event = {**event, "metrics": aggregate_metrics(collected)}
+        yield event
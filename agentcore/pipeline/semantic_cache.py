@@ -0,0 +1,425 @@
+# =============================================================================
+# semantic_cache.py - 類似質問キャッシュ（MinHash / LSH）
+# =============================================================================
+#
+# 完全一致のキャッシュ（pipeline/cache.py）では、
+#   「AIを業務に導入すべきか？」と「業務にAIを導入すべきでしょうか」
+# のような言い換えを拾えません。このモジュールは、過去の問いかけとの
+# 類似度をローカル（オフライン）で計算し、閾値以上の問いかけの
+# 判定結果を返すキャッシュ層を提供します。
+#
+# 主要コンポーネント:
+# - normalize_for_similarity(): 類似度計算用の正規化（記号・空白・文末表現の除去）
+# - negation_key(): 否定表現（ない・ず・否・not など）の出現回数
+# - MinHashLSHIndex: 文字n-gram の MinHash と LSH による近傍検索インデックス
+# - SemanticResultCache: インデックスを使った類似質問キャッシュ（LRU + TTL）
+# - get_semantic_cache(): 環境変数の設定に従ったプロセス共有キャッシュ
+#
+# 仕組み:
+#   1. 問いかけを正規化し、1〜2文字の n-gram の集合にする
+#      （日本語は単語の区切りがないため、形態素解析ではなく文字n-gramを使う。
+#        1文字の n-gram を含めると語順の入れ替えに強くなる）
+#   2. num_perm 個のハッシュ関数で MinHash 署名を作る
+#      （2つの署名の一致率 ≒ n-gram 集合の Jaccard 係数）
+#   3. 署名を bands 個の帯（1帯 8 個）に分け、帯ごとのハッシュでバケットに登録（LSH）
+#      （Jaccard 係数 0.8 の組は約95%が候補になり、0.4 以下の組はほとんど候補にならない）
+#      → 検索時は同じバケットに入った候補だけを比較するため、
+#        件数が増えても検索コストはほぼ一定（サブミリ秒）
+#   4. 候補ごとに n-gram 集合の Jaccard 係数を正確に計算し直し、
+#      閾値以上かつ最大のものを返す（MinHash の推定値だけでは誤差が大きく、
+#      「教育に導入すべきか」のような別の話題も閾値を超えることがある）
+#   5. 否定表現の数が異なる問いかけ同士は、文字がほとんど同じでも判定が
+#      逆になるためマッチさせない（「導入すべきか」と「導入すべきでない」）
+#
+#   計測値（bench/semantic_cache_check.py、20文字前後の問いかけ）:
+#   署名の計算は1件あたり約0.15ms、10万件を登録した状態の検索は約0.2ms
+#
+# 設定（環境変数）:
+#   MAGI_SEMANTIC_CACHE: on | off（デフォルト: off）
+#   MAGI_SEMANTIC_CACHE_THRESHOLD: n-gram 集合の Jaccard 係数の閾値 0.0〜1.0（デフォルト: 0.8）
+#   MAGI_SEMANTIC_CACHE_MAX_ENTRIES: 最大件数（デフォルト: 100000）
+#   MAGI_SEMANTIC_CACHE_TTL: 有効期間・秒（デフォルト: 3600）
+#
+# =============================================================================
+
+import copy
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+from pipeline.cache import normalize_question
+
+
+# =============================================================================
+# 正規化
+# =============================================================================
+
+# 文末の問いかけ表現（意味を変えずに言い換えられやすい部分）
+_QUESTION_SUFFIXES = ("でしょうか", "ですか", "ますか", "だろうか", "か")
+
+
+def normalize_for_similarity(question: str) -> str:
+    """
+    類似度計算用に問いかけを正規化
+
+    - normalize_question()（NFKC・空白統一・小文字化）
+    - 空白・句読点・記号を除去
+    - 文末の問いかけ表現（「でしょうか」「ですか」「か」など）を除去
+
+    Args:
+        question: 元の問いかけ
+
+    Returns:
+        正規化した文字列
+    """
+    text = normalize_question(question)
+    text = "".join(
+        ch for ch in text
+        if not ch.isspace() and unicodedata.category(ch)[0] not in ("P", "S")
+    )
+    for suffix in _QUESTION_SUFFIXES:
+        if text.endswith(suffix) and len(text) > len(suffix):
+            text = text[:-len(suffix)]
+            break
+    return text
+
+
+# 否定表現（出現回数が異なる問いかけ同士はマッチさせない）
+_NEGATION_MARKERS = ("ない", "ません", "ず", "否")
+_NEGATION_PATTERN = re.compile(r"\b(?:not|no|never)\b|n't\b")
+
+
+def negation_key(question: str) -> str:
+    """
+    問いかけの否定表現の出現回数
+
+    「AIを業務に導入すべきか」と「AIを業務に導入すべきでない」は n-gram が
+    ほとんど同じでも判定が逆になるため、類似質問キャッシュでは
+    このキーが同じ問いかけ同士だけを比較します。
+    「必ず」の「ず」のような否定ではない表現も数えますが、
+    マッチしにくくなる（キャッシュを使わない）方向にしか働きません。
+
+    Args:
+        question: 元の問いかけ
+
+    Returns:
+        str: 否定表現ごとの出現回数（例: "0,0,0,0,0"）
+    """
+    text = normalize_question(question)
+    counts = [text.count(marker) for marker in _NEGATION_MARKERS]
+    counts.append(len(_NEGATION_PATTERN.findall(text)))
+    return ",".join(map(str, counts))
+
+
+# =============================================================================
+# MinHash / LSH インデックス
+# =============================================================================
+
+
+class MinHashLSHIndex:
+    """
+    文字n-gram の MinHash と LSH による近傍検索インデックス
+
+    キーごとに MinHash 署名を保持し、類似した署名を持つキーを検索します。
+    scope（モード・プロンプト等のハッシュ）が異なるキー同士はマッチしません。
+    LSH で絞り込んだ候補は、n-gram 集合の Jaccard 係数を正確に計算して比較します。
+
+    Attributes:
+        num_perm: MinHash のハッシュ関数の数（署名の長さ）
+        bands: LSH の帯の数（num_perm を割り切れること）
+        ngram: 文字n-gram の最大の n（1〜ngram 文字の n-gram を使う）
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, ngram: int = 2, seed: int = 1):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm は bands で割り切れる必要があります")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.ngram = ngram
+        # ハッシュ関数の種（n-gram の前に付ける）
+        self._salt = seed.to_bytes(8, "little")
+        # 署名の各要素は 16bit（最上位ビットは要素ごとの比較に使うため 15bit の値）
+        self._digest_size = num_perm * 2
+        self._value_mask = int.from_bytes(b"\xff\x7f" * num_perm, "little")
+        self._guard_mask = int.from_bytes(b"\x00\x80" * num_perm, "little")
+
+        # キー → (scope, 署名, バケットキーのリスト, 正規化した文字列)
+        self._entries: dict[str, tuple[str, array, list[int], str]] = {}
+        # バケットキー → キーのリスト
+        self._buckets: dict[int, list[str]] = {}
+
+    def shingles(self, text: str) -> set[str]:
+        """1〜ngram 文字の n-gram の集合（空文字列なら {""}）"""
+        grams: set[str] = set()
+        for n in range(1, self.ngram + 1):
+            grams.update(text[i:i + n] for i in range(len(text) - n + 1))
+        return grams or {text}
+
+    def signature(self, text: str) -> array:
+        """
+        MinHash 署名を計算
+
+        n-gram ごとに SHAKE128 で num_perm 個分のハッシュ値を1回で作り、
+        num_perm 個の要素を並べた1つの整数として扱います。要素ごとの最小値は
+        整数の演算（SWAR）でまとめて取るため、ハッシュ関数ごとの Python の
+        ループはありません（n-gram 1つあたり整数演算6回）。
+
+        Args:
+            text: normalize_for_similarity() 済みの文字列
+
+        Returns:
+            array: 長さ num_perm の署名（15bit の値）
+        """
+        salt, size = self._salt, self._digest_size
+        low, guard = self._value_mask, self._guard_mask
+        sig = None
+        for gram in self.shingles(text):
+            value = int.from_bytes(hashlib.shake_128(salt + gram.encode("utf-8")).digest(size), "little") & low
+            if sig is None:
+                sig = value
+                continue
+            # 各要素の最上位ビットを立ててから引くと、sig >= value の要素だけ最上位ビットが残る
+            # → その要素だけ 0x7fff のマスクにして value に置き換える（要素間の繰り下がりは起きない）
+            ge = ((sig | guard) - value) & guard
+            sig ^= (sig ^ value) & (ge - (ge >> 15))
+        return array("H", sig.to_bytes(size, "little"))
+
+    @staticmethod
+    def jaccard(shingles_a: set[str], shingles_b: set[str]) -> float:
+        """2つの n-gram 集合の Jaccard 係数（正確な値）"""
+        return len(shingles_a & shingles_b) / len(shingles_a | shingles_b)
+
+    def _bucket_keys(self, scope: str, sig: array) -> list[int]:
+        """署名を帯に分けてバケットキーを作る"""
+        rows = self.rows
+        return [
+            hash((scope, band, tuple(sig[band * rows:(band + 1) * rows])))
+            for band in range(self.bands)
+        ]
+
+    @staticmethod
+    def similarity(sig_a: array, sig_b: array) -> float:
+        """2つの署名の一致率（Jaccard 係数の推定値）"""
+        same = sum(1 for a, b in zip(sig_a, sig_b) if a == b)
+        return same / len(sig_a)
+
+    def add(self, key: str, scope: str, text: str) -> None:
+        """
+        キーを登録（同じキーがあれば置き換え）
+
+        Args:
+            key: エントリのキー
+            scope: 検索範囲（異なる scope 同士はマッチしない）
+            text: normalize_for_similarity() 済みの文字列
+        """
+        self.remove(key)
+        sig = self.signature(text)
+        bucket_keys = self._bucket_keys(scope, sig)
+        for bucket_key in bucket_keys:
+            self._buckets.setdefault(bucket_key, []).append(key)
+        self._entries[key] = (scope, sig, bucket_keys, text)
+
+    def remove(self, key: str) -> None:
+        """キーを削除（なければ何もしない）"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for bucket_key in entry[2]:
+            bucket = self._buckets.get(bucket_key)
+            if bucket is None:
+                continue
+            bucket.remove(key)
+            if not bucket:
+                del self._buckets[bucket_key]
+
+    def query(self, scope: str, text: str, threshold: float) -> tuple[str, float] | None:
+        """
+        最も類似したキーを検索
+
+        Args:
+            scope: 検索範囲
+            text: normalize_for_similarity() 済みの文字列
+            threshold: 類似度（n-gram 集合の Jaccard 係数）の閾値
+
+        Returns:
+            tuple: (キー, 類似度)。閾値以上の候補がなければ None
+        """
+        sig = self.signature(text)
+        candidates: set[str] = set()
+        for bucket_key in self._bucket_keys(scope, sig):
+            bucket = self._buckets.get(bucket_key)
+            if bucket:
+                candidates.update(bucket)
+
+        best: tuple[str, float] | None = None
+        shingles = self.shingles(text)
+        for key in candidates:
+            entry_scope, _, _, entry_text = self._entries[key]
+            if entry_scope != scope:
+                continue
+            score = self.jaccard(shingles, self.shingles(entry_text))
+            if score >= threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# =============================================================================
+# 類似質問キャッシュ
+# =============================================================================
+
+class SemanticResultCache:
+    """
+    類似質問キャッシュ（LRU + TTL）
+
+    完全一致キャッシュの後段に置き、言い換えられた問いかけに対して
+    過去の判定結果を返します。否定表現の数が異なる問いかけ
+    （negation_key()）同士はマッチしません。
+
+    Attributes:
+        threshold: 類似度（n-gram 集合の Jaccard 係数）の閾値（0.0〜1.0）
+        max_entries: 最大件数（超えたら最も古く使われたものから削除）
+        ttl: 有効期間（秒）
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        max_entries: int = 100_000,
+        ttl: float = 3600.0,
+        index: MinHashLSHIndex | None = None
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.index = index or MinHashLSHIndex()
+
+        # キー → (有効期限, 元の問いかけ, イベントリスト)
+        self._entries: OrderedDict[str, tuple[float, str, list[dict]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, question: str, scope: str) -> tuple[list[dict], float, str] | None:
+        """
+        類似した問いかけの結果を取得
+
+        Args:
+            question: 問いかけ
+            scope: 検索範囲（pipeline/cache.py の make_cache_scope()）
+
+        Returns:
+            tuple: (イベントリスト, 類似度, 一致した元の問いかけ)。なければ None
+        """
+        text = normalize_for_similarity(question)
+        with self._lock:
+            match = self.index.query(self._index_scope(question, scope), text, self.threshold)
+            if match is not None:
+                key, score = match
+                expires_at, matched_question, events = self._entries[key]
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(events), score, matched_question
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def set(self, question: str, scope: str, events: list[dict]) -> None:
+        """
+        問いかけと結果を登録
+
+        Args:
+            question: 問いかけ
+            scope: 検索範囲
+            events: 結果イベントリスト
+        """
+        text = normalize_for_similarity(question)
+        key = f"{scope}:{text}"
+        with self._lock:
+            self.index.add(key, self._index_scope(question, scope), text)
+            self._entries[key] = (time.monotonic() + self.ttl, question, copy.deepcopy(events))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    @staticmethod
+    def _index_scope(question: str, scope: str) -> str:
+        """インデックスの検索範囲（否定表現の数が異なる問いかけは別の範囲にする）"""
+        return f"{scope}:{negation_key(question)}"
+
+    def _remove(self, key: str) -> None:
+        """エントリとインデックスから削除（ロック内で呼ぶ）"""
+        self._entries.pop(key, None)
+        self.index.remove(key)
+
+    def clear(self) -> None:
+        """キャッシュをすべて削除"""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """
+        キャッシュの統計情報
+
+        Returns:
+            dict: {"entries", "hits", "misses", "threshold", "max_entries", "ttl"}
+        """
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "threshold": self.threshold,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+        }
+
+
+# =============================================================================
+# プロセス共有キャッシュ
+# =============================================================================
+
+_semantic_cache: SemanticResultCache | None = None
+_semantic_cache_loaded = False
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticResultCache | None:
+    """
+    環境変数の設定に従ったプロセス共有の類似質問キャッシュを取得
+
+    Returns:
+        SemanticResultCache | None: MAGI_SEMANTIC_CACHE=off（デフォルト）の場合は None
+    """
+    global _semantic_cache, _semantic_cache_loaded
+    with _semantic_cache_lock:
+        if not _semantic_cache_loaded:
+            if os.environ.get("MAGI_SEMANTIC_CACHE", "off").lower() in ("1", "true", "yes", "on"):
+                _semantic_cache = SemanticResultCache(
+                    threshold=float(os.environ.get("MAGI_SEMANTIC_CACHE_THRESHOLD", "0.8")),
+                    max_entries=int(os.environ.get("MAGI_SEMANTIC_CACHE_MAX_ENTRIES", "100000")),
+                    ttl=float(os.environ.get("MAGI_SEMANTIC_CACHE_TTL", "3600"))
+                )
+            _semantic_cache_loaded = True
+        return _semantic_cache
+
+
+def set_semantic_cache(cache: SemanticResultCache | None) -> None:
+    """プロセス共有の類似質問キャッシュを差し替える（テスト用）"""
+    global _semantic_cache, _semantic_cache_loaded
+    with _semantic_cache_lock:
+        _semantic_cache = cache
+        _semantic_cache_loaded = True
@@ -0,0 +1,493 @@
+# =============================================================================
+# sessions.py - 会話モードのセッション（サーバー側の会話履歴）
+# =============================================================================
+#
+# 会話モードのエージェントはプールから借りて返却時に履歴を消すため、
+# そのままでは複数ターンの会話を覚えていません。クライアントから
+# 履歴を毎回送り直すと payload が膨らむため、payload の "session_id" ごとに
+# 各ペルソナ（chat_agent）と JUDGE の会話履歴をサーバー側で保持します。
+#
+# 主要コンポーネント:
+# - SessionStore: セッションの保存先（LRU + TTL、上限超過時はディスクへ退避）
+# - get_session_store(): 環境変数の設定に従ったプロセス共有ストア
+#
+# 保持する内容:
+#   セッションID → {エージェント名 / "JUDGE": Strands のメッセージリスト}
+#
+# 上限と削除:
+#   - 1セッションあたり max_session_bytes を超えたら、古いターン
+#     （ユーザーの発言から次の発言の手前まで）から切り詰める
+#   - 全体で max_total_bytes / max_sessions を超えたら、最も古く使われた
+#     セッションから追い出す（spill_dir 指定時はディスクへ退避）
+#   - 最後の使用から ttl 秒を過ぎたセッションは破棄（退避したものも同様）
+#   - 退避先は、退避のたびに（最短でも _SWEEP_INTERVAL 秒おきに）走査し、
+#     ttl を過ぎたファイルを削除する。合計が max_spill_bytes を超えたら
+#     最も古く使われたファイルから削除する（ストア生成時にも走査するため、
+#     前回のプロセスが残したファイルも消える）
+#
+#   リクエスト ─→ get(session_id) ─→ メモリ ─(なし)→ spill_dir ─(なし)→ 新規
+#                                                         │ 読み込んだらメモリへ戻す
+#   完了時     ─→ put(session_id) ─→ メモリ ─(上限超過)→ LRU を spill_dir へ
+#
+# 同じセッションへの同時リクエストは lock() で1つずつ処理します
+# （同時に書き込むと、片方のターンが失われるため）。
+#
+# イベントループからは aget() / aput() を使います。退避先の読み書きや、
+# 上限に収めるための JSON 化はワーカースレッドで行い、ループを止めません。
+#
+# 設定（環境変数）:
+#   MAGI_SESSION_MAX_SESSIONS: メモリに保持するセッション数の上限（デフォルト: 1000）
+#   MAGI_SESSION_MAX_BYTES: 1セッションあたりの上限・バイト（デフォルト: 262144）
+#   MAGI_SESSION_TOTAL_BYTES: 全セッション合計の上限・バイト（デフォルト: 67108864）
+#   MAGI_SESSION_TTL: 最後の使用からの有効期間・秒（デフォルト: 1800）
+#   MAGI_SESSION_SPILL_DIR: 追い出したセッションの退避先ディレクトリ（デフォルト: なし = 破棄）
+#   MAGI_SESSION_SPILL_BYTES: 退避先の合計の上限・バイト（デフォルト: 268435456）
+#
+# =============================================================================
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+
+# JUDGE の会話履歴を保持するときのキー
+JUDGE_KEY = "JUDGE"
+
+# 退避先の期限切れファイルを走査する最短の間隔（秒）
+_SWEEP_INTERVAL = 60.0
+
+
+def _json_size(value) -> int:
+    """JSON 化した UTF-8 のバイト数"""
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def _size_of(conversations: dict[str, list[dict]]) -> int:
+    """会話履歴のおおよそのサイズ（JSON 化した UTF-8 のバイト数）"""
+    return _json_size(conversations)
+
+
+def _entry_size(key: str, message_sizes: list[int]) -> int:
+    """
+    会話履歴1つ分のサイズ（_size_of() の JSON のうち '"key": [...]' の部分）
+
+    JSON の区切りは ", " / ": " なので、メッセージごとのサイズの合計から
+    JSON 化し直さずに求められます。
+    """
+    return _json_size(key) + 2 + 2 + sum(message_sizes) + 2 * max(len(message_sizes) - 1, 0)
+
+
+def _total_size(sizes: dict[str, int]) -> int:
+    """キーごとの _entry_size() から、_size_of() と同じ全体のサイズを求める"""
+    return 2 + sum(sizes.values()) + 2 * max(len(sizes) - 1, 0)
+
+
+def _is_turn_start(message: dict) -> bool:
+    """ターンの先頭（ツール結果ではないユーザーの発言）か"""
+    if message.get("role") != "user":
+        return False
+    return not any("toolResult" in block for block in message.get("content", []))
+
+
+def _drop_oldest_turn(messages: list[dict]) -> list[dict]:
+    """
+    最も古いターンを削除する
+
+    ターンの途中（toolUse と toolResult の間など）で切ると履歴が
+    不正になるため、次のターンの先頭から後ろだけを残します。
+    """
+    for index in range(1, len(messages)):
+        if _is_turn_start(messages[index]):
+            return messages[index:]
+    return []
+
+
+class _Session:
+    """メモリ上のセッション"""
+
+    __slots__ = ("conversations", "size", "used_at")
+
+    def __init__(self, conversations: dict[str, list[dict]], size: int):
+        self.conversations = conversations
+        self.size = size
+        self.used_at = time.time()
+
+
+class SessionStore:
+    """
+    会話モードのセッションの保存先（LRU + TTL + ディスク退避）
+
+    スレッドセーフです。値（メッセージリスト）は保存後に変更しない前提で
+    そのまま保持するため、エージェントに戻すときは呼び出し側でコピーします
+    （agents/base.py の import_chat_history() を参照）。
+
+    Attributes:
+        max_sessions: メモリに保持するセッション数の上限
+        max_session_bytes: 1セッションあたりの上限（バイト）
+        max_total_bytes: 全セッション合計の上限（バイト）
+        ttl: 最後の使用からの有効期間（秒）
+        spill_dir: 追い出したセッションの退避先（None なら破棄）
+        max_spill_bytes: 退避先の合計の上限（バイト）
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        max_session_bytes: int = 256 * 1024,
+        max_total_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 1800.0,
+        spill_dir: str | None = None,
+        max_spill_bytes: int = 256 * 1024 * 1024
+    ):
+        self.max_sessions = max_sessions
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.ttl = ttl
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._session_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+        # 退避先の合計サイズ（走査の間は書き込み・削除の分だけ更新する見積もり）
+        self._spill_bytes = 0
+        self._swept_at = 0.0
+
+        # 統計情報
+        self.hits = 0
+        self.misses = 0
+        self.restored = 0
+        self.spilled = 0
+        self.evicted = 0
+        self.trimmed = 0
+        self.spill_removed = 0
+
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            # 前回のプロセスが残した期限切れのファイルを削除し、合計サイズを数える
+            self.sweep_spilled()
+
+    # -------------------------------------------------------------------------
+    # 公開インターフェース
+    # -------------------------------------------------------------------------
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """
+        セッション単位のロックを取得
+
+        使用例:
+            async with store.lock(session_id):
+                history = await store.aget(session_id)
+                ...
+                await store.aput(session_id, updated)
+        """
+        with self._lock:
+            lock = self._session_locks.get(session_id)
+            if lock is None:
+                lock = asyncio.Lock()
+                self._session_locks[session_id] = lock
+            return lock
+
+    def get(self, session_id: str) -> dict[str, list[dict]] | None:
+        """
+        セッションの会話履歴を取得（なければ None）
+
+        メモリになければ退避先を探し、見つかればメモリへ戻します。
+
+        Returns:
+            dict | None: {エージェント名 / "JUDGE": メッセージリスト}
+        """
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                if now - session.used_at <= self.ttl:
+                    session.used_at = now
+                    self._sessions.move_to_end(session_id)
+                    self.hits += 1
+                    return session.conversations
+                self._remove(session_id)
+
+        conversations = self._load_spilled(session_id, now)
+        if conversations is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        self.put(session_id, conversations)
+        with self._lock:
+            self.hits += 1
+            self.restored += 1
+        return conversations
+
+    def put(self, session_id: str, conversations: dict[str, list[dict]]) -> None:
+        """
+        セッションの会話履歴を保存
+
+        1セッションの上限を超える分は古いターンから切り詰め、
+        全体の上限を超えたら最も古く使われたセッションを追い出します。
+
+        Args:
+            session_id: セッションID
+            conversations: {エージェント名 / "JUDGE": メッセージリスト}
+        """
+        conversations, size = self._fit(conversations)
+        spill: list[tuple[str, _Session]] = []
+        with self._lock:
+            self._remove(session_id)
+            self._sessions[session_id] = _Session(conversations, size)
+            self._total_bytes += size
+            while len(self._sessions) > 1 and (
+                len(self._sessions) > self.max_sessions or self._total_bytes > self.max_total_bytes
+            ):
+                oldest_id, oldest = self._sessions.popitem(last=False)
+                self._total_bytes -= oldest.size
+                self.evicted += 1
+                spill.append((oldest_id, oldest))
+
+        # ディスクへの書き込みはロックの外で行う
+        for oldest_id, oldest in spill:
+            self._spill(oldest_id, oldest)
+
+    async def aget(self, session_id: str) -> dict[str, list[dict]] | None:
+        """get() をイベントループを止めずに実行（退避先の読み込みはスレッドで行う）"""
+        return await asyncio.to_thread(self.get, session_id)
+
+    async def aput(self, session_id: str, conversations: dict[str, list[dict]]) -> None:
+        """put() をイベントループを止めずに実行（切り詰め・退避はスレッドで行う）"""
+        await asyncio.to_thread(self.put, session_id, conversations)
+
+    def delete(self, session_id: str) -> None:
+        """セッションを削除（退避したものも含む）"""
+        with self._lock:
+            self._remove(session_id)
+        path = self._spill_path(session_id)
+        if path:
+            self._remove_spilled(path)
+
+    def sweep_spilled(self) -> int:
+        """
+        退避先から期限切れのファイルを削除し、合計を max_spill_bytes 以下に収める
+
+        ファイルの更新時刻はセッションの最終使用時刻にそろえてあるため（_spill()）、
+        更新時刻の古い順に、ttl を過ぎたもの・合計が上限を超えている分を削除します。
+        書き込み途中の一時ファイルは、ttl を過ぎた（中断された）ものだけ削除します。
+
+        Returns:
+            int: 削除したファイルの数
+        """
+        if not self.spill_dir:
+            return 0
+        now = time.time()
+        files: list[tuple[float, int, str, bool]] = []
+        with os.scandir(self.spill_dir) as entries:
+            for entry in entries:
+                is_tmp = entry.name.endswith(".tmp")
+                if not (is_tmp or entry.name.endswith(".json")):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path, is_tmp))
+
+        files.sort()
+        total = sum(size for _, size, _, _ in files)
+        removed = 0
+        for used_at, size, path, is_tmp in files:
+            expired = now - used_at > self.ttl
+            if not (expired or (total > self.max_spill_bytes and not is_tmp)):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self._spill_bytes = total
+            self._swept_at = now
+            self.spill_removed += removed
+        return removed
+
+    def clear(self) -> None:
+        """メモリ上のセッションをすべて削除"""
+        with self._lock:
+            self._sessions.clear()
+            self._total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> dict:
+        """
+        ストアの統計情報
+
+        Returns:
+            dict: {"sessions", "bytes", "hits", "misses", "restored", "spilled", "evicted", "trimmed", ...}
+        """
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "restored": self.restored,
+                "spilled": self.spilled,
+                "evicted": self.evicted,
+                "trimmed": self.trimmed,
+                "spill_bytes": self._spill_bytes,
+                "spill_removed": self.spill_removed,
+                "max_sessions": self.max_sessions,
+                "max_session_bytes": self.max_session_bytes,
+                "max_total_bytes": self.max_total_bytes,
+                "ttl": self.ttl,
+            }
+
+    # -------------------------------------------------------------------------
+    # 内部ヘルパー
+    # -------------------------------------------------------------------------
+
+    def _remove(self, session_id: str) -> None:
+        """メモリからセッションを削除（ロック取得済みで呼ぶ）"""
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._total_bytes -= session.size
+
+    def _fit(self, conversations: dict[str, list[dict]]) -> tuple[dict[str, list[dict]], int]:
+        """
+        1セッションの上限に収まるまで、最も大きい会話の古いターンから切り詰める
+
+        メッセージごとのサイズを最初に1回だけ計算し、ターンを削るたびに
+        削った分を差し引きます（全体を JSON 化し直さない）。
+        """
+        conversations = {key: list(messages) for key, messages in conversations.items()}
+        message_sizes = {
+            key: [_json_size(message) for message in messages] for key, messages in conversations.items()
+        }
+        sizes = {key: _entry_size(key, message_sizes[key]) for key in conversations}
+        size = _total_size(sizes)
+        trimmed = 0
+        while size > self.max_session_bytes and any(conversations.values()):
+            key = max((key for key in sizes if conversations[key]), key=sizes.__getitem__)
+            remaining = _drop_oldest_turn(conversations[key])
+            del message_sizes[key][:len(conversations[key]) - len(remaining)]
+            conversations[key] = remaining
+            sizes[key] = _entry_size(key, message_sizes[key])
+            size = _total_size(sizes)
+            trimmed += 1
+        if trimmed:
+            with self._lock:
+                self.trimmed += trimmed
+        return conversations, size
+
+    def _spill_path(self, session_id: str) -> str | None:
+        if not self.spill_dir:
+            return None
+        name = hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, f"{name}.json")
+
+    def _spill(self, session_id: str, session: _Session) -> None:
+        """
+        セッションを退避先に書き出す（退避先がなければ破棄）
+
+        一時ファイルは書き込みごとに別の名前で作るため、同じセッションの
+        退避が重なっても互いのファイルを壊しません（後から置き換えた方が残る）。
+        ファイルの更新時刻はセッションの最終使用時刻にそろえます（sweep_spilled() が使う）。
+        """
+        path = self._spill_path(session_id)
+        if path is None:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.spill_dir, prefix=os.path.basename(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"used_at": session.used_at, "conversations": session.conversations},
+                    f, ensure_ascii=False, default=str
+                )
+            os.utime(tmp_path, (session.used_at, session.used_at))
+            size = os.path.getsize(tmp_path)
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            self.spilled += 1
+            self._spill_bytes += size - replaced
+            sweep = (
+                self._spill_bytes > self.max_spill_bytes
+                or time.time() - self._swept_at >= min(self.ttl, _SWEEP_INTERVAL)
+            )
+        if sweep:
+            self.sweep_spilled()
+
+    def _remove_spilled(self, path: str) -> None:
+        """退避したファイルを削除（なければ何もしない）"""
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._spill_bytes = max(0, self._spill_bytes - size)
+
+    def _load_spilled(self, session_id: str, now: float) -> dict[str, list[dict]] | None:
+        """退避先からセッションを読み込む（読み込んだファイルは削除）"""
+        path = self._spill_path(session_id)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self._remove_spilled(path)
+        except (OSError, ValueError):
+            return None
+        if now - data.get("used_at", 0) > self.ttl:
+            return None
+        return data.get("conversations")
+
+
+# =============================================================================
+# プロセス共有ストア
+# =============================================================================
+
+_session_store: SessionStore | None = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """環境変数の設定に従ったプロセス共有ストアを取得"""
+    global _session_store
+    with _session_store_lock:
+        if _session_store is None:
+            _session_store = SessionStore(
+                max_sessions=int(os.environ.get("MAGI_SESSION_MAX_SESSIONS", "1000")),
+                max_session_bytes=int(os.environ.get("MAGI_SESSION_MAX_BYTES", str(256 * 1024))),
+                max_total_bytes=int(os.environ.get("MAGI_SESSION_TOTAL_BYTES", str(64 * 1024 * 1024))),
+                ttl=float(os.environ.get("MAGI_SESSION_TTL", "1800")),
+                spill_dir=os.environ.get("MAGI_SESSION_SPILL_DIR") or None,
+                max_spill_bytes=int(os.environ.get("MAGI_SESSION_SPILL_BYTES", str(256 * 1024 * 1024))),
+            )
+        return _session_store
+
+
+def set_session_store(store: SessionStore | None) -> None:
+    """プロセス共有ストアを差し替える（テスト用、None で環境変数から作り直す）"""
+    global _session_store
+    with _session_store_lock:
+        _session_store = store
@@ -0,0 +1,166 @@
+# =============================================================================
+# singleflight.py - 実行中の同一リクエストの合流（シングルフライト）
+# =============================================================================
+#
+# Streamlit の再実行や、待ちきれないユーザーの再送信によって、
+# 1回目の実行がストリーミング中に同じ問いかけが再び届くことがあります。
+# このモジュールは、同じ payload のリクエストを実行中のパイプラインに
+# 合流させ、Bedrock 呼び出しを1セットだけにします。
+#
+# 主要コンポーネント:
+# - make_flight_key(): payload から合流用のキーを生成
+# - SingleFlight: キーごとに実行中のストリームを共有するクラス
+#
+# 仕組み:
+#   最初のリクエスト（リーダー）が来ると、パイプラインをバックグラウンドの
+#   asyncio.Task で実行し、イベントをバッファに記録します。
+#   後から来た同じキーのリクエストは、バッファの先頭から（既に送信済みの
+#   イベントも含めて）再生し、その後は新しいイベントを順に受け取ります。
+#
+#   リクエストA ─→ ┌───────────┐ ─→ イベント全体
+#                  │ Task       │
+#   リクエストB ─→ │ + バッファ │ ─→ 送信済みイベント + 以降のイベント
+#                  └───────────┘
+#
+#   - 購読者が1人でも残っていればパイプラインは続行します
+#     （リーダーが切断しても、後から来た購読者には最後まで届く）
+#   - 全員が切断した場合はパイプラインをキャンセルします
+#   - 完了したキーは削除され、次の同じリクエストは新しく実行されます
+#     （完了済みの結果の再利用は結果キャッシュの役割）
+#
+# =============================================================================
+
+import asyncio
+import hashlib
+import json
+from typing import AsyncGenerator, AsyncIterator, Callable
+
+from pipeline.cache import normalize_question
+
+
+def make_flight_key(payload: dict) -> str:
+    """
+    payload から合流用のキーを生成
+
+    問いかけは正規化（pipeline/cache.py の normalize_question()）してから
+    キーに含めるため、空白や全角/半角の違いだけのリクエストも合流します。
+
+    Args:
+        payload: invoke() に渡された payload
+
+    Returns:
+        SHA-256 の16進文字列
+    """
+    material = dict(payload)
+    material["question"] = normalize_question(str(payload.get("question", "")))
+    text = json.dumps(material, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """
+    実行中のパイプライン1本分（イベントのバッファと購読者の管理）
+    """
+
+    def __init__(self, stream: AsyncIterator[dict]):
+        self.events: list[dict] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._run(stream))
+
+    async def _run(self, stream: AsyncIterator[dict]) -> None:
+        """パイプラインを駆動し、イベントをバッファに記録する"""
+        try:
+            async for event in stream:
+                self.events.append(event)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self.done = True
+            self._notify()
+
+    def _notify(self) -> None:
+        """待機中の購読者を起こす"""
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncGenerator[dict, None]:
+        """
+        バッファの先頭から再生し、以降のイベントを順に返す
+
+        購読者数は SingleFlight.stream() で先に数えておく
+        （最初のイテレーション前にリーダーが切断しても止まらないように）。
+
+        Yields:
+            dict: イベント辞書
+        """
+        index = 0
+        try:
+            while True:
+                while index < len(self.events):
+                    yield self.events[index]
+                    index += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            # 全員が切断したらパイプラインを止める
+            if self.subscribers == 0 and not self.task.done():
+                self.task.cancel()
+
+
+class SingleFlight:
+    """
+    キーごとに実行中のストリームを共有する
+
+    使用例:
+        flights = SingleFlight()
+        async for event in flights.stream(key, lambda: run_pipeline(payload)):
+            yield event
+    """
+
+    def __init__(self):
+        self._flights: dict[str, _Flight] = {}
+
+    def stream(
+        self,
+        key: str,
+        factory: Callable[[], AsyncIterator[dict]]
+    ) -> AsyncGenerator[dict, None]:
+        """
+        キーに対応する実行中のストリームに合流（なければ新しく開始）
+
+        Args:
+            key: 合流用のキー（make_flight_key() を参照）
+            factory: パイプラインのストリームを生成する関数（リーダーのときのみ呼ばれる）
+
+        Returns:
+            AsyncGenerator: イベントを返す非同期ジェネレータ
+        """
+        flight = self._flights.get(key)
+        if flight is None or flight.task.done() or flight.task.cancelling():
+            flight = _Flight(factory())
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._discard(key, flight))
+        flight.subscribers += 1
+        return flight.subscribe()
+
+    def _discard(self, key: str, flight: _Flight) -> None:
+        """完了したフライトを削除（同じキーで新しく始まったものは残す）"""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def __len__(self) -> int:
+        return len(self._flights)
@@ -0,0 +1,286 @@
+# =============================================================================
+# startup.py - コールドスタートの短縮（遅延インポート・ウォームアップ・計測）
+# =============================================================================
+#
+# スケールアウト直後のコンテナでは、最初のリクエストの前に
+# Strands・boto3・pydantic の読み込みと共有モデル（bedrock-runtime クライアント）の
+# 生成が必要で、最初のリクエストが数秒遅くなっていました。
+#
+# このモジュールでは次の4つを行います。
+#
+#   1. 遅延インポート: backend.py はエージェント（agents.*、つまり Strands）を
+#      モジュールの読み込み時にインポートしない。サーバーは先に待ち受けを始め、
+#      エージェントは load_agents() で初めて読み込む
+#   2. ウォームアップ（MAGI_WARMUP=on）: サーバーの起動時に別スレッドで
+#      load_agents() とエージェントプールの事前生成を行い、最初のリクエストが
+#      来る前に済ませる（ヘルスチェック /ping はその間も応答する）
+#   3. 計測（MAGI_STARTUP_PROFILE=on）: インポート・初期化の段階ごとの時間を記録し、
+#      ウォームアップ完了時と最初のリクエストの完了時に標準エラー出力へ表示する
+#   4. キープアライブ（MAGI_KEEPALIVE_INTERVAL > 0）: リクエストがない間、一定間隔で
+#      共有クライアントの接続を温め直す（agents/models.py の warm_connections()、
+#      LLM は呼び出さない）。アイドル後の最初のリクエストで DNS・TLS・認証情報の
+#      取得を待たずに済む
+#
+#   プロセス開始 ─ import backend（Starlette / AgentCore のみ）─ 待ち受け開始
+#                         │ MAGI_WARMUP=on                │
+#                         └─ [別スレッド] load_agents() → プール事前生成
+#   最初のリクエスト ─ ensure_agents_loaded()（済んでいなければスレッドで読み込み）
+#
+# 主要コンポーネント:
+# - StartupProfile / startup_profile: 段階ごとの時間の記録
+# - load_agents(): エージェントの読み込みと共有モデルの生成（1回だけ）
+# - ensure_agents_loaded(): イベントループを止めずに load_agents() を待つ
+# - agents_ready(): エージェントが読み込み済みか
+# - start_warm_up(): MAGI_WARMUP=on ならウォームアップのスレッドを開始
+# - mark_activity(): リクエストの開始を記録（キープアライブはアイドル中だけ動く）
+# - start_keep_alive() / stop_keep_alive(): キープアライブのスレッドの開始・停止
+# - keep_alive_stats(): キープアライブの実行状況
+#
+# 設定（環境変数）:
+#   MAGI_WARMUP: on | off（デフォルト: off）
+#   MAGI_WARMUP_POOL: ウォームアップで事前生成する1種類あたりの数（デフォルト: MAGI_POOL_SIZE まで）
+#   MAGI_STARTUP_PROFILE: on | off（デフォルト: off）
+#   MAGI_KEEPALIVE_INTERVAL: キープアライブの間隔・秒（デフォルト: 0 = 無効）
+#   MAGI_KEEPALIVE_CONNECTIONS: キープアライブで温める接続の数（デフォルト: 1）
+#
+# =============================================================================
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+def _env_on(name: str) -> bool:
+    return os.environ.get(name, "off").lower() in ("1", "true", "yes", "on")
+
+
+class StartupProfile:
+    """
+    インポート・初期化の段階ごとの時間
+
+    Attributes:
+        started_at: 計測の起点（このモジュールの読み込み時刻、time.perf_counter()）
+        phases: [(段階名, 所要時間ms, 起点からの終了時刻ms)]
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: list[tuple[str, float, float]] = []
+        self._lock = threading.Lock()
+        self._reported: set[str] = set()
+        self._first_request_done = False
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """with ブロックの時間を段階 name として記録"""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started_at)
+
+    def record(self, name: str, seconds: float) -> None:
+        """段階 name の時間を記録"""
+        with self._lock:
+            self.phases.append((
+                name, round(seconds * 1000, 1), round((time.perf_counter() - self.started_at) * 1000, 1)
+            ))
+
+    def first_request(self, seconds: float) -> None:
+        """最初のリクエストの時間を記録して表示（2件目以降は何もしない）"""
+        with self._lock:
+            if self._first_request_done:
+                return
+            self._first_request_done = True
+        self.record("request:first", seconds)
+        self.emit("first_request")
+
+    def report(self) -> dict:
+        """
+        記録した時間
+
+        Returns:
+            dict: {"phases": [{"name", "ms", "at_ms"}], "uptime_ms": 起点からの経過時間}
+        """
+        with self._lock:
+            phases = [{"name": name, "ms": ms, "at_ms": at_ms} for name, ms, at_ms in self.phases]
+        return {"phases": phases, "uptime_ms": round((time.perf_counter() - self.started_at) * 1000, 1)}
+
+    def emit(self, reason: str) -> None:
+        """MAGI_STARTUP_PROFILE=on なら記録を1回だけ標準エラー出力に表示"""
+        if not _env_on("MAGI_STARTUP_PROFILE"):
+            return
+        with self._lock:
+            if reason in self._reported:
+                return
+            self._reported.add(reason)
+        print(json.dumps({"startup_profile": reason, **self.report()}, ensure_ascii=False), file=sys.stderr, flush=True)
+
+
+# プロセス共有の記録（起点は backend.py がこのモジュールを読み込んだ時刻）
+startup_profile = StartupProfile()
+
+
+# =============================================================================
+# エージェントの遅延読み込み
+# =============================================================================
+
+_loaded = threading.Event()
+_load_lock = threading.Lock()
+
+
+def load_agents() -> None:
+    """
+    エージェント（Strands）を読み込み、共有モデルを生成する（プロセスで1回だけ）
+
+    同期処理です。イベントループからは ensure_agents_loaded() を使ってください。
+    """
+    if _loaded.is_set():
+        return
+    with _load_lock:
+        if _loaded.is_set():
+            return
+        with startup_profile.phase("import:agents"):
+            from agents.models import get_shared_model
+            import agents.pool  # noqa: F401  Strands / boto3 / pydantic モデルの読み込み
+        with startup_profile.phase("init:shared_model"):
+            get_shared_model()
+        _loaded.set()
+
+
+def agents_ready() -> bool:
+    """エージェントが読み込み済みか"""
+    return _loaded.is_set()
+
+
+async def ensure_agents_loaded() -> None:
+    """
+    エージェントが読み込まれるまで待つ
+
+    読み込み（数百ミリ秒）はスレッドで行い、その間もイベントループ
+    （他のリクエストのストリーミングや /ping）を止めません。
+    """
+    if not _loaded.is_set():
+        await asyncio.to_thread(load_agents)
+
+
+# =============================================================================
+# ウォームアップ
+# =============================================================================
+
+def warm_up(pool_size: int | None = None) -> None:
+    """
+    エージェントの読み込みとエージェントプールの事前生成
+
+    Args:
+        pool_size: 事前生成する1種類あたりの数（省略時はプールの上限まで）
+    """
+    load_agents()
+    from agents.pool import get_agent_pool
+
+    with startup_profile.phase("init:agent_pool"):
+        get_agent_pool().prewarm(pool_size)
+    startup_profile.emit("warm_up")
+
+
+def start_warm_up() -> threading.Thread | None:
+    """
+    MAGI_WARMUP=on ならウォームアップを別スレッドで開始
+
+    Returns:
+        threading.Thread | None: 開始したスレッド（無効なら None）
+    """
+    if not _env_on("MAGI_WARMUP"):
+        return None
+    pool_size = os.environ.get("MAGI_WARMUP_POOL")
+    thread = threading.Thread(
+        target=warm_up,
+        args=(int(pool_size) if pool_size else None,),
+        name="magi-warm-up",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+# =============================================================================
+# キープアライブ
+# =============================================================================
+
+# 最後にリクエストが始まった時刻（time.monotonic()）
+_last_activity = time.monotonic()
+
+_keep_alive_stop = threading.Event()
+_keep_alive_state = {"interval_s": 0.0, "connections": 0, "runs": 0, "last": None}
+_keep_alive_lock = threading.Lock()
+
+
+def mark_activity() -> None:
+    """リクエストの開始を記録（リクエストが流れている間は接続も温まっている）"""
+    global _last_activity
+    _last_activity = time.monotonic()
+
+
+def keep_alive_stats() -> dict:
+    """
+    キープアライブの実行状況
+
+    Returns:
+        dict: {"interval_s"（0 なら無効）, "connections", "runs", "last"（最後の warm_connections() の結果）,
+               "idle_s"（最後のリクエストからの秒数）}
+    """
+    with _keep_alive_lock:
+        stats = dict(_keep_alive_state)
+    stats["idle_s"] = round(time.monotonic() - _last_activity, 1)
+    return stats
+
+
+def _keep_alive_loop(interval: float, connections: int) -> None:
+    while not _keep_alive_stop.wait(interval):
+        # 直近 interval 秒以内にリクエストがあれば、接続は使われているので何もしない
+        if time.monotonic() - _last_activity < interval:
+            continue
+        try:
+            load_agents()
+            from agents.models import warm_connections
+
+            result = warm_connections(connections)
+        except Exception as e:  # キープアライブの失敗でスレッドを止めない
+            result = {"warmed": False, "status": type(e).__name__}
+        with _keep_alive_lock:
+            _keep_alive_state["runs"] += 1
+            _keep_alive_state["last"] = result
+
+
+def start_keep_alive() -> threading.Thread | None:
+    """
+    MAGI_KEEPALIVE_INTERVAL > 0 ならキープアライブを別スレッドで開始
+
+    Returns:
+        threading.Thread | None: 開始したスレッド（無効なら None）
+    """
+    interval = float(os.environ.get("MAGI_KEEPALIVE_INTERVAL", "0"))
+    if interval <= 0:
+        return None
+    connections = int(os.environ.get("MAGI_KEEPALIVE_CONNECTIONS", "1"))
+    with _keep_alive_lock:
+        _keep_alive_state.update(interval_s=interval, connections=connections)
+    _keep_alive_stop.clear()
+    thread = threading.Thread(
+        target=_keep_alive_loop,
+        args=(interval, connections),
+        name="magi-keep-alive",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def stop_keep_alive() -> None:
+    """キープアライブのスレッドを止める（サーバーの終了時）"""
+    _keep_alive_stop.set()
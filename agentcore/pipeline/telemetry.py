@@ -0,0 +1,228 @@
+# =============================================================================
+# telemetry.py - MAGI パイプラインの OpenTelemetry スパン・ヒストグラム
+# =============================================================================
+#
+# バックエンドは opentelemetry-instrument の下で動きますが、自動計装だけでは
+# invoke 1回が1つのスパンにしか見えません。このモジュールは、パイプラインの
+# 各段階にスパンを作り、TTFT と全体のレイテンシをヒストグラムに記録します。
+#
+# スパン:
+#   magi.request（_dispatch 1回、mode / parallel / batch_size）
+#     ├─ magi.agent.analyze / magi.agent.respond（エージェント1つ、magi.agent）
+#     ├─ magi.judge.vote_count（多数決、賛成・反対の票数）
+#     ├─ magi.judge.integrate / magi.judge.chat（JUDGE の統合）
+#     ├─ magi.serialize（data の Pydantic モデルを辞書に変換、magi.event_type）
+#     └─ （Strands の invoke_agent / chat などのスパン）
+#
+#   エージェント・JUDGE のスパンには metrics イベントの値
+#   （TTFT・レイテンシ・トークン数）を属性として付けます。
+#
+# ヒストグラム:
+#   magi.ttft（ms）: エージェントの呼び出しごとの TTFT（magi.mode, magi.agent）
+#   magi.request.duration（ms）: リクエスト全体の時間（magi.mode, magi.outcome）
+#
+# カウンター:
+#   magi.cancelled: 最後まで読まれずにキャンセルされた数（クライアントの切断など）
+#     magi.scope=request（リクエスト、magi.mode）| model（モデル呼び出し、agents/models.py）
+#
+# 主要コンポーネント:
+# - trace_request(): リクエスト全体のスパン（現在のスパンにする）とヒストグラムの記録
+# - traced_stream(): イベントストリーム1本分のスパン
+# - span(): 同期処理のスパン
+# - recording(): 現在のスパンが記録中か（細かいスパンを省略する判定に使う）
+# - configure_local_telemetry(): コンソール / メモリへのエクスポーター（テスト・ローカル用）
+#
+# プロバイダーを設定していない場合、API は何もしない実装（NoOp）になるため
+# 常に有効にしています。エクスポーター（opentelemetry-sdk）は
+# configure_local_telemetry() を呼んだときだけ読み込みます。
+#
+# 設定（環境変数）:
+#   MAGI_OTEL_EXPORTER: console | memory（デフォルト: なし = opentelemetry-instrument などの設定に従う）
+#
+# =============================================================================
+
+import os
+import time
+from contextlib import contextmanager
+from typing import AsyncGenerator, AsyncIterator, Iterator
+
+from opentelemetry import context as otel_context
+from opentelemetry import metrics, trace
+from opentelemetry.trace import Status, StatusCode
+
+
+_tracer = trace.get_tracer("magi")
+_meter = metrics.get_meter("magi")
+
+TTFT_HISTOGRAM = _meter.create_histogram(
+    "magi.ttft", unit="ms", description="エージェントの呼び出しごとの最初のトークンまでの時間"
+)
+REQUEST_DURATION_HISTOGRAM = _meter.create_histogram(
+    "magi.request.duration", unit="ms", description="リクエスト全体（最後のイベントまで）の時間"
+)
+CANCELLED_COUNTER = _meter.create_counter(
+    "magi.cancelled", unit="{call}", description="最後まで読まれずにキャンセルされたリクエスト・モデル呼び出しの数"
+)
+
+# スパンの属性にする metrics イベントの値
+_SPAN_METRIC_FIELDS = ("queue_wait_ms", "ttft_ms", "latency_ms", "input_tokens", "output_tokens")
+
+
+def recording() -> bool:
+    """
+    現在のスパンが記録中か
+
+    プロバイダー未設定（NoOp）やサンプリング対象外のリクエストでは False。
+    イベントごとに作る細かいスパン（magi.serialize）は、False なら作りません
+    （NoOp でもスパン1つあたり数マイクロ秒かかるため）。
+    """
+    return trace.get_current_span().is_recording()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[trace.Span]:
+    """
+    同期処理のスパン（現在のスパンの子）
+
+    ※ with の中で yield（非同期ジェネレータの中断）をまたがないこと
+
+    使用例:
+        with span("magi.judge.vote_count") as current:
+            current.set_attribute("magi.approve", approve_count)
+    """
+    with _tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+async def traced_stream(name: str, stream: AsyncIterator[dict], **attributes) -> AsyncGenerator[dict, None]:
+    """
+    イベントストリーム1本分のスパン
+
+    並列実行ではストリームが別々のタスクで読まれるため、このスパンは
+    現在のスパンにしません（親はストリーム開始時の現在のスパン）。
+    metrics イベントの値はスパンの属性として記録します。
+
+    Args:
+        name: スパン名
+        stream: 元のイベントストリーム
+        **attributes: スパンの属性
+
+    Yields:
+        dict: 元のイベント
+    """
+    current = _tracer.start_span(name, attributes=attributes)
+    try:
+        async for event in stream:
+            if event.get("type") == "metrics":
+                for field in _SPAN_METRIC_FIELDS:
+                    if event["data"].get(field) is not None:
+                        current.set_attribute(f"magi.{field}", event["data"][field])
+            yield event
+    except BaseException as e:
+        if isinstance(e, Exception):
+            current.record_exception(e)
+            current.set_status(Status(StatusCode.ERROR, str(e)))
+        else:
+            current.set_attribute("magi.cancelled", True)
+        raise
+    finally:
+        current.end()
+
+
+async def trace_request(stream: AsyncIterator[dict], mode: str, **attributes) -> AsyncGenerator[dict, None]:
+    """
+    リクエスト全体のスパンとヒストグラム
+
+    スパンを現在のスパンにしてからストリームを読むため、この中で作られる
+    スパン・タスク（エージェントの並列実行など）はこのスパンの子になります。
+    各エージェントの TTFT は metrics イベントから magi.ttft に、
+    全体の時間は終了時に magi.request.duration に記録します。
+
+    Args:
+        stream: _dispatch のイベントストリーム
+        mode: judge | chat | batch
+        **attributes: スパンの属性
+
+    Yields:
+        dict: 元のイベント
+    """
+    started_at = time.perf_counter()
+    current = _tracer.start_span("magi.request", attributes={"magi.mode": mode, **attributes})
+    token = otel_context.attach(trace.set_span_in_context(current))
+    outcome = "error"
+    try:
+        async for event in stream:
+            if event.get("type") == "metrics" and event["data"].get("ttft_ms") is not None:
+                TTFT_HISTOGRAM.record(
+                    event["data"]["ttft_ms"], {"magi.mode": mode, "magi.agent": event.get("agent", "")}
+                )
+            yield event
+        outcome = "success"
+    except BaseException as e:
+        if isinstance(e, Exception):
+            current.record_exception(e)
+            current.set_status(Status(StatusCode.ERROR, str(e)))
+        else:
+            outcome = "cancelled"
+            CANCELLED_COUNTER.add(1, {"magi.scope": "request", "magi.mode": mode})
+        raise
+    finally:
+        elapsed_ms = (time.perf_counter() - started_at) * 1000
+        REQUEST_DURATION_HISTOGRAM.record(elapsed_ms, {"magi.mode": mode, "magi.outcome": outcome})
+        current.set_attribute("magi.outcome", outcome)
+        current.end()
+        otel_context.detach(token)
+
+
+# =============================================================================
+# ローカル用エクスポーター
+# =============================================================================
+
+def configure_local_telemetry(exporter: str = "memory"):
+    """
+    スパンとメトリクスをコンソール / メモリに出力するプロバイダーを設定
+
+    テスト・ローカル確認用です。プロバイダーはプロセスで1度しか設定できないため、
+    opentelemetry-instrument で起動した場合は呼ばないでください。
+
+    Args:
+        exporter: console（標準出力）| memory（InMemorySpanExporter / InMemoryMetricReader）
+
+    Returns:
+        tuple: (スパンのエクスポーター, メトリクスのリーダー)
+            memory の場合は get_finished_spans() / get_metrics_data() で結果を取得できる
+
+    Raises:
+        ValueError: 未知のエクスポーターの場合
+    """
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import (
+        ConsoleMetricExporter,
+        InMemoryMetricReader,
+        PeriodicExportingMetricReader
+    )
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter, SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    if exporter == "memory":
+        span_exporter = InMemorySpanExporter()
+        metric_reader = InMemoryMetricReader()
+    elif exporter == "console":
+        span_exporter = ConsoleSpanExporter()
+        metric_reader = PeriodicExportingMetricReader(ConsoleMetricExporter())
+    else:
+        raise ValueError(f"MAGI_OTEL_EXPORTER は console | memory のいずれかです: {exporter}")
+
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+    trace.set_tracer_provider(tracer_provider)
+    metrics.set_meter_provider(MeterProvider(metric_readers=[metric_reader]))
+    return span_exporter, metric_reader
+
+
+def configure_telemetry_from_env() -> None:
+    """MAGI_OTEL_EXPORTER が指定されていればローカル用エクスポーターを設定"""
+    exporter = os.environ.get("MAGI_OTEL_EXPORTER")
+    if exporter:
+        configure_local_telemetry(exporter.lower())
@@ -0,0 +1,226 @@
+# =============================================================================
+# wire.py - イベントストリームの送信形式（まとめ送り・差分）
+# =============================================================================
+#
+# invoke() が返すイベントは、AgentCore Runtime によって1つずつ
+# SSE（data: {JSON}）に変換されて送信されます。既定の形式は冗長で、
+# イベントごとに "type" / "agent" などのキーを繰り返し、
+# final は verdict イベントで送信済みの agent_verdicts を丸ごと繰り返します。
+#
+# このモジュールは、payload で指定された送信形式にイベントを変換します。
+#
+# 主要コンポーネント:
+# - delta_events(): final の agent_verdicts を送信済み verdict への参照に置き換える
+# - PackedEncoder / FrameDecoder: まとめ送りのフレーム化と復元
+# - encode_stream(): payload の指定に従ってイベントストリームを変換
+#
+# 送信形式（payload の "encoding"）:
+#   - "json"（デフォルト）: これまでどおりイベント辞書をそのまま送る
+#   - "packed": 送信時点で届いているイベントを1フレーム（JSON 配列）にまとめ、
+#     各イベントをキーを除いた値の配列（行）にする。キーの並び（スキーマ）は
+#     レスポンス内で初めて現れたときに1度だけ [~番号, キー...] の行で送り、
+#     以降の行は [番号, 値...] でそれを参照する
+#
+#     まとめるのは「すでに届いているイベント」だけで、イベントを待つことはないため、
+#     最初のイベントまでの時間は json と変わりません。
+#
+#   data: {"type": "thinking", "agent": "MELCHIOR-1", "content": "..."}       ← json
+#   data: [[-1, "type", "agent", "content"], [0, "thinking", "MELCHIOR-1", "..."],
+#          [0, "thinking", "CASPER-3", "..."]]                                ← packed
+#
+#   AgentCore Runtime は yield した値を必ず JSON として SSE に載せるため、
+#   バイナリ（MessagePack など）や圧縮（deflate）は base64 の文字列にする必要が
+#   あります。計測では deflate はバイト数を減らす一方で復元時間が約2倍になったため、
+#   JSON のまま冗長さ（キーの繰り返し・フレーム数）を減らすこの形式を採用しています。
+#
+# 差分モード（payload の "delta": true）:
+#   final の agent_verdicts のうち、送信済みの verdict と同じ内容のものを
+#   {"verdict_ref": "<agent>"} に置き換えます（バッチモードでは index ごと）。
+#   クライアントは受信した verdict を覚えておき、参照を元に戻します。
+#
+# 計測（bench/wire_format.py、並列実行・FakeModel・80トークン）では、json に比べて
+# packed + delta はバイト数・復元時間ともに減りました。
+#   - thinking をまとめる場合（50ms）: バイト数 -7〜13%、復元時間 -20〜26%
+#   - thinking をまとめない場合: バイト数 -31%、復元時間 0〜-24%（1フレームあたり約2イベント）
+# フロントエンドは packed + delta で受け取ります。
+#
+# クライアント側の復元は frontend/frontend.py の WireDecoder が行います
+# （フロントエンドは別コンテナのため、同じ処理をそちらにも持っています）。
+#
+# =============================================================================
+
+import json
+from typing import AsyncGenerator, AsyncIterator
+
+from pipeline.fanout import StreamMerger
+
+
+# 対応する送信形式
+ENCODINGS = ("json", "packed")
+
+# 差分モードで final の agent_verdicts に入る参照のキー
+VERDICT_REF_KEY = "verdict_ref"
+
+
+async def delta_events(stream: AsyncIterator[dict]) -> AsyncGenerator[dict, None]:
+    """
+    final の agent_verdicts を送信済み verdict への参照に置き換える
+
+    送信済みの verdict と内容が一致しないもの（キャッシュの差し替えなど）は
+    そのまま残すため、参照を解決できない final にはなりません。
+
+    Args:
+        stream: 元のイベントストリーム
+
+    Yields:
+        dict: イベント辞書（final のみ差分に変換）
+    """
+    sent: dict[tuple, dict] = {}  # (index, agent) → verdict の data
+    async for event in stream:
+        kind = event.get("type")
+        if kind == "verdict" and "agent" in event:
+            sent[(event.get("index"), event["agent"])] = event["data"]
+        elif kind == "final" and sent:
+            index = event.get("index")
+            by_content = {
+                json.dumps(data, sort_keys=True, ensure_ascii=False): agent
+                for (i, agent), data in sent.items() if i == index
+            }
+            verdicts = []
+            for verdict in event["data"].get("agent_verdicts", []):
+                agent = by_content.get(json.dumps(verdict, sort_keys=True, ensure_ascii=False))
+                verdicts.append({VERDICT_REF_KEY: agent} if agent else verdict)
+            event = {**event, "data": {**event["data"], "agent_verdicts": verdicts}}
+        yield event
+
+
+class PackedEncoder:
+    """
+    まとめ送りのフレームを作る（1レスポンスにつき1つ）
+
+    スキーマ（キーの並び）の番号はレスポンス全体で共有するため、
+    フレームはレスポンス内の順番どおりに送る必要があります。
+    """
+
+    def __init__(self):
+        self._schemas: dict[tuple, int] = {}
+
+    def encode(self, events: list[dict]) -> list[list]:
+        """
+        イベントのリストを1フレーム（行の配列）にする
+
+        Args:
+            events: 送信するイベント（届いた順）
+
+        Returns:
+            list[list]: 新しいスキーマの行 [~番号, キー...] とイベントの行 [番号, 値...]
+        """
+        rows = []
+        for event in events:
+            keys = tuple(event)
+            schema_id = self._schemas.get(keys)
+            if schema_id is None:
+                schema_id = self._schemas[keys] = len(self._schemas)
+                rows.append([~schema_id, *keys])
+            rows.append([schema_id, *event.values()])
+        return rows
+
+
+class FrameDecoder:
+    """
+    PackedEncoder のフレームと差分モードの final を復元する
+
+    ベンチマーク（bench/wire_format.py, bench/http_load.py）とバックエンド側の検証用です。
+    フロントエンドは同じ処理を frontend.py の WireDecoder で行います。
+    """
+
+    def __init__(self):
+        self._schemas: list[list[str]] = []
+        self._verdicts: dict[tuple, dict] = {}
+
+    def decode(self, value) -> list[dict]:
+        """
+        SSE から取り出した値（json.loads 済み）をイベントのリストにする
+
+        Args:
+            value: まとめ送りのフレーム（list）またはイベント辞書
+
+        Returns:
+            list[dict]: 復元したイベント
+        """
+        if isinstance(value, list):
+            events = self._unpack(value)
+        else:
+            events = [value]
+        return [self._resolve(event) for event in events]
+
+    def _unpack(self, rows: list[list]) -> list[dict]:
+        events = []
+        for row in rows:
+            schema_id = row[0]
+            if schema_id < 0:
+                self._schemas.append(row[1:])
+                continue
+            values = iter(row)
+            next(values)  # スキーマの番号を読み飛ばす
+            events.append(dict(zip(self._schemas[schema_id], values)))
+        return events
+
+    def _resolve(self, event: dict) -> dict:
+        kind = event.get("type")
+        if kind == "verdict" and "agent" in event:
+            self._verdicts[(event.get("index"), event["agent"])] = event["data"]
+        elif kind == "final":
+            index = event.get("index")
+            event["data"]["agent_verdicts"] = [
+                self._verdicts[(index, verdict[VERDICT_REF_KEY])]
+                if isinstance(verdict, dict) and VERDICT_REF_KEY in verdict else verdict
+                for verdict in event["data"].get("agent_verdicts", [])
+            ]
+        return event
+
+
+async def encode_stream(
+    stream: AsyncIterator[dict],
+    encoding: str = "json",
+    delta: bool = False
+) -> AsyncGenerator[dict | list, None]:
+    """
+    イベントストリームを指定の送信形式に変換する
+
+    packed では元のストリームを別タスクで読み進め、フレームを送るたびに
+    その時点で届いているイベントをすべて1フレームにまとめます。
+
+    Args:
+        stream: 元のイベントストリーム
+        encoding: "json" または "packed"
+        delta: final を差分（送信済み verdict への参照）にするか
+
+    Yields:
+        dict | list: イベント辞書（json）またはまとめ送りのフレーム（packed）
+
+    Raises:
+        ValueError: 未対応の送信形式の場合
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"未対応の encoding です: {encoding}（{' / '.join(ENCODINGS)}）")
+
+    if delta:
+        stream = delta_events(stream)
+    if encoding == "json":
+        async for event in stream:
+            yield event
+        return
+
+    encoder = PackedEncoder()
+    batch: list[dict] = []
+    # 抜けたとき（切断・例外を含む）は元のストリームごとキャンセルされる
+    async with StreamMerger() as merger:
+        merger.add("events", stream)
+        async for _, event in merger:
+            if event is not None:
+                batch.append(event)
+            # 次のイベントがまだ届いていなければ、たまった分を送る
+            if batch and not merger.pending():
+                yield encoder.encode(batch)
+                batch = []
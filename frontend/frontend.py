@@ -6,6 +6,7 @@ Streamlit UI for the MAGI decision-making system
 import streamlit as st
 import boto3
 import json
+import uuid
 from typing import Generator
 
 # ページ設定
@@ -205,6 +206,9 @@ def init_session_state():
     """セッション状態の初期化"""
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "session_id" not in st.session_state:
+        # 会話モードでバックエンドに会話履歴を保持してもらうためのID
+        st.session_state.session_id = uuid.uuid4().hex
     if "magi_results" not in st.session_state:
         st.session_state.magi_results = {
             "melchior": None,
@@ -330,7 +334,92 @@ def render_final_verdict(final_data: dict):
 
 
 
-def invoke_magi_agent(question: str, runtime_arn: str, mode: str = "judge", format: str = "explicit") -> Generator:
+class WireDecodeError(ValueError):
+    """まとめ送り・差分モードの復元に失敗した（壊れたフレーム、解決できない参照など）"""
+
+
+class WireDecoder:
+    """
+    バックエンドの送信形式（まとめ送り・差分モード）を元のイベントに戻す
+
+    agentcore/pipeline/wire.py の PackedEncoder / delta_events に対応します。
+    - 配列の値: まとめ送りのフレーム（[~番号, キー...] はスキーマ、[番号, 値...] はイベント）
+    - 辞書の値: そのままのイベント（encoding="json" や Runtime のエラーイベント）
+    - final の agent_verdicts 内の {"verdict_ref": agent}: 受信済みの verdict に置き換える
+    """
+
+    def __init__(self):
+        self._schemas = []
+        self._verdicts = {}
+
+    def decode(self, value) -> list:
+        """
+        SSE から取り出した値（json.loads 済み）をイベントのリストにする
+
+        Raises:
+            WireDecodeError: フレームが壊れている、または参照先のスキーマ・verdict を受信していない場合
+                （スキーマはレスポンス全体で共有するため、以降のフレームも復元できない）
+        """
+        try:
+            return self._decode(value)
+        except (IndexError, KeyError, TypeError) as e:
+            raise WireDecodeError(f"{type(e).__name__}: {e}") from e
+
+    def _decode(self, value) -> list:
+        if isinstance(value, list):
+            events = []
+            for row in value:
+                if row[0] < 0:
+                    self._schemas.append(row[1:])
+                    continue
+                values = iter(row)
+                next(values)  # スキーマの番号を読み飛ばす
+                events.append(dict(zip(self._schemas[row[0]], values)))
+        else:
+            events = [value]
+
+        for event in events:
+            if not isinstance(event, dict):
+                continue  # 辞書でない値はそのまま返す
+            if event.get("type") == "verdict" and "agent" in event:
+                self._verdicts[(event.get("index"), event["agent"])] = event["data"]
+            elif event.get("type") == "final":
+                index = event.get("index")
+                event["data"]["agent_verdicts"] = [
+                    self._verdicts[(index, v["verdict_ref"])] if isinstance(v, dict) and "verdict_ref" in v else v
+                    for v in event["data"].get("agent_verdicts", [])
+                ]
+        return events
+
+
+def _decode_sse_line(decoder: WireDecoder, line: str) -> list:
+    """
+    SSE の1行（"data: {...}" または JSON）をイベントのリストにする
+
+    JSON でない行は {"type": "text"} として返します。
+
+    Raises:
+        WireDecodeError: WireDecoder.decode() を参照
+    """
+    json_str = line[6:] if line.startswith("data: ") else line  # "data: " を除去
+    try:
+        value = json.loads(json_str)
+    except json.JSONDecodeError:
+        # JSONでない場合はテキストとして返す
+        return [{"type": "text", "content": json_str}]
+    return decoder.decode(value)
+
+
+def invoke_magi_agent(
+    question: str,
+    runtime_arn: str,
+    mode: str = "judge",
+    format: str = "explicit",
+    parallel: bool = True,
+    encoding: str = "packed",
+    delta: bool = True,
+    session_id: str | None = None
+) -> Generator:
     """
     AgentCore Runtimeを呼び出してMAGIエージェントを実行
     ストリーミングレスポンスを返す
@@ -341,6 +430,11 @@ def invoke_magi_agent(question: str, runtime_arn: str, mode: str = "judge", form
             例: arn:aws:bedrock-agentcore:ap-northeast-1:262152767881:runtime/backend-bLxzrQ5K5B
         mode: 動作モード（"judge" = 判定モード, "chat" = 会話モード）
         format: 会話モード時の回答形式（"explicit" = 明示的, "natural" = 自然な統合）
+        parallel: 3エージェントを同時に実行するか（イベントは "agent" で判別）
+        encoding: 送信形式（"json" = 1イベントずつ, "packed" = 届いているイベントをまとめたフレーム）
+            packed は受信バイト数・復元時間ともに json より少ない（agentcore/bench/wire_format.py）
+        delta: final の agent_verdicts を送信済み verdict への参照で受け取るか
+        session_id: 会話モードで前回までの会話履歴を引き継ぐためのID（バックエンドが保持）
 
     Yields:
         dict: イベント辞書（agent_start, thinking, verdict, final など）
@@ -350,11 +444,17 @@ def invoke_magi_agent(question: str, runtime_arn: str, mode: str = "judge", form
 
     try:
         # ペイロードをJSON → bytes に変換
-        payload = json.dumps({
+        body = {
             "question": question,
             "mode": mode,
-            "format": format
-        }).encode('utf-8')
+            "format": format,
+            "parallel": parallel,
+            "encoding": encoding,
+            "delta": delta
+        }
+        if session_id:
+            body["session_id"] = session_id
+        payload = json.dumps(body).encode('utf-8')
 
         # AgentCore Runtime を呼び出し
         response = client.invoke_agent_runtime(
@@ -367,6 +467,7 @@ def invoke_magi_agent(question: str, runtime_arn: str, mode: str = "judge", form
         # StreamingBodyからデータを読み取り
         # AgentCoreはストリーミングレスポンスを返す
         streaming_body = response.get('response')
+        decoder = WireDecoder()  # まとめ送り・差分モードの復元
         if streaming_body:
             # ストリーミングデータを行単位で処理
             # バイト列バッファ（UTF-8マルチバイト文字の分割対策）
@@ -396,22 +497,14 @@ def invoke_magi_agent(question: str, runtime_arn: str, mode: str = "judge", form
                     if not line:
                         continue
 
-                    # SSE形式: "data: {...}" からJSONを抽出
-                    if line.startswith("data: "):
-                        json_str = line[6:]  # "data: " を除去
-                        try:
-                            event = json.loads(json_str)
-                            yield event
-                        except json.JSONDecodeError:
-                            # JSONでない場合はテキストとしてyield
-                            yield {"type": "text", "content": json_str}
-                    else:
-                        # data: で始まらない場合はそのままJSONを試行
-                        try:
-                            event = json.loads(line)
-                            yield event
-                        except json.JSONDecodeError:
-                            yield {"type": "text", "content": line}
+                    # SSE形式: "data: {...}" からJSONを抽出（data: で始まらない場合はそのままJSONを試行）
+                    try:
+                        events = _decode_sse_line(decoder, line)
+                    except WireDecodeError as e:
+                        # 壊れたフレーム以降は復元できないため、エラーを表示して打ち切る
+                        yield {"type": "error", "message": f"受信データの復元に失敗しました: {e}"}
+                        return
+                    yield from events
 
             # 残りのバッファを処理
             if byte_buffer:
@@ -421,21 +514,12 @@ def invoke_magi_agent(question: str, runtime_arn: str, mode: str = "judge", form
                     pass  # デコードできない残りは無視
 
             if text_buffer.strip():
-                line = text_buffer.strip()
-                # SSE形式: "data: {...}" からJSONを抽出
-                if line.startswith("data: "):
-                    json_str = line[6:]
-                    try:
-                        event = json.loads(json_str)
-                        yield event
-                    except json.JSONDecodeError:
-                        yield {"type": "text", "content": json_str}
-                else:
-                    try:
-                        event = json.loads(line)
-                        yield event
-                    except json.JSONDecodeError:
-                        yield {"type": "text", "content": line}
+                try:
+                    events = _decode_sse_line(decoder, text_buffer.strip())
+                except WireDecodeError as e:
+                    yield {"type": "error", "message": f"受信データの復元に失敗しました: {e}"}
+                    return
+                yield from events
 
     except Exception as e:
         yield {"type": "error", "message": f"エラーが発生しました: {str(e)}"}
@@ -740,7 +824,8 @@ def main():
                     # -----------------------------------------------------
                     # モードに応じてAPIを呼び出し
                     api_mode = "judge" if is_judge_mode else "chat"
-                    for event in invoke_magi_agent(question, runtime_arn, mode=api_mode):
+                    session_id = st.session_state.session_id if api_mode == "chat" else None
+                    for event in invoke_magi_agent(question, runtime_arn, mode=api_mode, session_id=session_id):
                         event_type = event.get("type")
 
                         if event_type == "agent_start":
@@ -752,21 +837,33 @@ def main():
                                 status_placeholder.info(f"💬 {current_agent} 回答作成中...")
 
                         elif event_type == "thinking":
-                            if current_agent:
-                                agent_thinking[current_agent] += event.get("content", "")
+                            # 並列実行時はイベントが交互に届くため "agent" で判別
+                            event_agent = event.get("agent", current_agent)
+                            if event_agent:
+                                agent_thinking[event_agent] = agent_thinking.get(event_agent, "") + event.get("content", "")
 
                         elif event_type == "verdict":
                             # 判定モード: エージェントの判定結果
-                            if current_agent:
-                                agent_verdicts[current_agent] = event.get("data", {})
+                            event_agent = event.get("agent", current_agent)
+                            if event_agent:
+                                agent_verdicts[event_agent] = event.get("data", {})
 
                         elif event_type == "response":
                             # 会話モード: エージェントの回答
-                            if current_agent:
-                                agent_responses[current_agent] = event.get("data", {})
+                            event_agent = event.get("agent", current_agent)
+                            if event_agent:
+                                agent_responses[event_agent] = event.get("data", {})
 
                         elif event_type == "agent_complete":
-                            current_agent = None
+                            if event.get("agent") == current_agent:
+                                current_agent = None
+
+                        elif event_type == "agent_timeout":
+                            # 期限切れのエージェントは判定なしで続行（揃った判定で集計）
+                            st.warning(f"⏱️ {event.get('agent')} が制限時間内に応答しませんでした")
+
+                        elif event_type == "judge_timeout":
+                            st.warning("⏱️ JUDGE が制限時間内に応答しなかったため、多数決のみで判定しました")
 
                         elif event_type == "judge_start":
                             if is_judge_mode: